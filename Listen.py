@@ -2,59 +2,325 @@
 #
 # This module provides voice recognition capabilities for the RawWick assistant.
 # It handles continuous listening for voice commands and converts speech to text
-# using Google's speech recognition service.
+# using a pluggable recognition backend: Google's speech recognition service by
+# default, or an offline engine (Vosk, whisper.cpp) running locally on the CPU.
+#
+# The backend is chosen per deployment with the RAWWICK_SPEECH_BACKEND
+# environment variable ("google", "vosk" or "whisper").
 
-import speech_recognition as sr
+from collections import deque
+import asyncio
 import threading
 import queue
 import time
+import json
+import os
+from utils.startup_profile import profiler
+from utils.voice_activity import VoiceActivityDetector, WakeWordGate
+from core.scheduler import CommandScheduler
+from utils import tracing
+from utils.tracing import tracer
 
-# Create a recognizer instance with optimized settings
-recognizer = sr.Recognizer()
-recognizer.energy_threshold = 300  # Lower threshold for better sensitivity
-recognizer.pause_threshold = 0.8   # Shorter pause to detect end of speech faster
+# speech_recognition (and PyAudio behind it) is imported on first use, and
+# the shared recognizer is built by get_recognizer(), not at import time.
+sr = None
+recognizer = None
 dynamic_energy_adjustment = True   # Dynamically adjust for ambient noise
 
 # Lock for thread safety when adjusting recognizer settings
 recognizer_lock = threading.Lock()
+_init_lock = threading.Lock()
+_calibrated = False
+
+def load_speech_recognition():
+    """Import speech_recognition on first use and return the module."""
+    global sr
+    with _init_lock:
+        if sr is None:
+            with profiler.measure("speech_recognition", "import"):
+                import speech_recognition
+            sr = speech_recognition
+        return sr
+
+def get_recognizer():
+    """The shared recognizer, created with optimized settings on first use."""
+    global recognizer
+    if recognizer is None:
+        load_speech_recognition()
+        with _init_lock:
+            if recognizer is None:
+                with profiler.measure("recognizer", "init"):
+                    instance = sr.Recognizer()
+                    instance.energy_threshold = 300  # Lower threshold for better sensitivity
+                    instance.pause_threshold = 0.8   # Shorter pause to detect end of speech faster
+                    instance.dynamic_energy_threshold = dynamic_energy_adjustment
+                recognizer = instance
+    return recognizer
+
+def calibrate(source, duration=0.5):
+    """Measure ambient noise once to set the initial energy threshold.
+    
+    After this, the recognizer keeps adapting the threshold on its own while
+    it waits for speech (dynamic_energy_threshold), so there is no need to
+    recalibrate before every utterance.
+    """
+    global _calibrated
+    active = get_recognizer()
+    with recognizer_lock:
+        active.adjust_for_ambient_noise(source, duration=duration)
+        _calibrated = True
+
+class RecognizerBackend:
+    """Base class for speech-to-text engines.
+    
+    Subclasses implement _transcribe(); transcribe() wraps it to measure the
+    latency of every utterance. Like recognize_google, _transcribe() raises
+    sr.UnknownValueError when nothing was understood and sr.RequestError when
+    the engine itself fails.
+    """
+    name = "base"
+    
+    def __init__(self, latency_window=100):
+        self.latencies = deque(maxlen=latency_window)
+        self.last_latency = None
+        self._stats_lock = threading.Lock()
+    
+    def _transcribe(self, audio, on_partial=None):
+        raise NotImplementedError
+    
+    def transcribe(self, audio, on_partial=None):
+        """Convert an utterance to text.
+        
+        Args:
+            audio: The captured sr.AudioData.
+            on_partial: Optional callback receiving partial transcripts as the
+                       engine produces them (streaming backends only).
+        
+        Returns:
+            The recognized text.
+        """
+        load_speech_recognition()
+        started = time.perf_counter()
+        try:
+            return self._transcribe(audio, on_partial)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.last_latency = elapsed
+                self.latencies.append(elapsed)
+    
+    def stats(self):
+        """Latency of recent utterances in seconds."""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"backend": self.name, "utterances": 0}
+        return {
+            "backend": self.name,
+            "utterances": len(latencies),
+            "last": self.last_latency,
+            "avg": sum(latencies) / len(latencies),
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        }
+
+class GoogleBackend(RecognizerBackend):
+    """Google's web speech API (network round trip, no partial results)."""
+    name = "google"
+    
+    def __init__(self, language="en-US", **kwargs):
+        super().__init__(**kwargs)
+        self.language = language
+    
+    def _transcribe(self, audio, on_partial=None):
+        return get_recognizer().recognize_google(audio, language=self.language)
+
+class VoskBackend(RecognizerBackend):
+    """Offline Kaldi-based recognition with Vosk.
+    
+    Audio is fed to the recognizer in small chunks, so partial transcripts
+    are available while the utterance is still being decoded.
+    """
+    name = "vosk"
+    sample_rate = 16000
+    chunk_bytes = 8000  # 0.25s of 16kHz 16-bit mono
+    
+    def __init__(self, model_path=None, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("The vosk backend requires the 'vosk' package (pip install vosk)")
+        vosk.SetLogLevel(-1)
+        model_path = model_path or os.environ.get("VOSK_MODEL_PATH")
+        self._vosk = vosk
+        self.model = vosk.Model(model_path) if model_path else vosk.Model(lang="en-us")
+    
+    def _transcribe(self, audio, on_partial=None):
+        engine = self._vosk.KaldiRecognizer(self.model, self.sample_rate)
+        data = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        # Vosk ends a segment at every pause it detects; each finished segment
+        # is only returned by Result() right then, not by FinalResult()
+        segments = []
+        for offset in range(0, len(data), self.chunk_bytes):
+            if engine.AcceptWaveform(data[offset:offset + self.chunk_bytes]):
+                segments.append(json.loads(engine.Result()).get("text", ""))
+            elif on_partial:
+                partial = json.loads(engine.PartialResult()).get("partial", "")
+                if partial:
+                    on_partial(" ".join(segments + [partial]).strip())
+        segments.append(json.loads(engine.FinalResult()).get("text", ""))
+        text = " ".join(segment for segment in segments if segment)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+    
+    def keyword_spotter(self, words):
+        """Build a wake-word spotter restricted to a small grammar.
+        
+        Decoding against just the wake words is much cheaper than full
+        recognition, so it can screen segments before they reach the
+        recognizer (see WakeWordGate).
+        """
+        words = [w.lower() for w in words]
+        grammar = json.dumps(words + ["[unk]"])
+        
+        def spot(audio):
+            engine = self._vosk.KaldiRecognizer(self.model, self.sample_rate, grammar)
+            engine.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+            text = json.loads(engine.FinalResult()).get("text", "")
+            return any(word in text for word in words)
+        
+        return spot
+
+class WhisperBackend(RecognizerBackend):
+    """Offline recognition with whisper.cpp through the pywhispercpp bindings.
+    
+    Partial results are reported per decoded segment.
+    """
+    name = "whisper"
+    sample_rate = 16000
+    
+    def __init__(self, model_name=None, threads=None, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            from pywhispercpp.model import Model
+            import numpy
+        except ImportError:
+            raise RuntimeError("The whisper backend requires 'pywhispercpp' and 'numpy'")
+        self._numpy = numpy
+        self.model = Model(model_name or os.environ.get("WHISPER_MODEL", "base.en"),
+                           n_threads=threads or os.cpu_count() or 4,
+                           print_progress=False, print_realtime=False)
+        # whisper.cpp contexts are not safe to share between concurrent calls
+        self._model_lock = threading.Lock()
+    
+    def _transcribe(self, audio, on_partial=None):
+        data = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        samples = self._numpy.frombuffer(data, dtype=self._numpy.int16).astype(self._numpy.float32) / 32768.0
+        
+        def segment_callback(segment):
+            if on_partial and segment.text.strip():
+                on_partial(segment.text.strip())
+        
+        try:
+            with self._model_lock:
+                segments = self.model.transcribe(samples, new_segment_callback=segment_callback)
+        except Exception as e:
+            raise sr.RequestError(f"whisper.cpp failed: {e}")
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "whisper": WhisperBackend,
+}
+
+def get_backend(name=None, **kwargs):
+    """Create a recognition backend.
+    
+    Args:
+        name: One of BACKENDS; defaults to $RAWWICK_SPEECH_BACKEND, then "google".
+        **kwargs: Passed to the backend's constructor.
+    """
+    name = (name or os.environ.get("RAWWICK_SPEECH_BACKEND") or "google").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+_default_backend = None
+_backend_lock = threading.Lock()
+
+def default_backend():
+    """The process-wide backend used when none is passed explicitly."""
+    global _default_backend
+    with _backend_lock:
+        if _default_backend is None:
+            _default_backend = get_backend()
+        return _default_backend
+
+def recognize(audio, backend=None, on_partial=None):
+    """Convert captured audio to text.
+    
+    Recognition runs without holding recognizer_lock, so several utterances
+    can be recognized at once.
+    
+    Args:
+        audio: The captured sr.AudioData.
+        backend: The RecognizerBackend to use; defaults to default_backend().
+        on_partial: Optional callback for partial transcripts.
+    
+    Returns:
+        The recognized text, "" if nothing was understood, or an error message.
+    """
+    load_speech_recognition()
+    try:
+        text = (backend or default_backend()).transcribe(audio, on_partial=on_partial)
+        return text.strip()
+        
+    except sr.UnknownValueError:
+        # Speech was detected but couldn't be recognized
+        return ""
+        
+    except sr.RequestError as e:
+        # API error
+        print(f"❌ API Error: {e}")
+        return "Speech recognition failed."
+        
+    except Exception as e:
+        # Unexpected error
+        print(f"⚠️ Error: {e}")
+        return "Unexpected error."
 
 def listen():
     """Listen for speech input and convert to text.
     
     This function is designed to be non-blocking and efficient when used in a threaded context.
     It will attempt to recognize speech once, and return the result or an error message.
+    Ambient noise is only measured on the first call.
     """
+    load_speech_recognition()
     with sr.Microphone() as source:
-        # Use a shorter duration for ambient noise adjustment to be more responsive
-        with recognizer_lock:
-            recognizer.adjust_for_ambient_noise(source, duration=0.3)
+        if not _calibrated:
+            calibrate(source, duration=0.3)
         
         try:
             # Set a reasonable phrase_time_limit to prevent hanging
-            audio = recognizer.listen(source, timeout=2, phrase_time_limit=10)
-            
-            # Use Google's speech recognition service
-            with recognizer_lock:
-                text = recognizer.recognize_google(audio, language='en-US')
-            return text.strip()
+            audio = get_recognizer().listen(source, timeout=2, phrase_time_limit=10)
             
         except sr.WaitTimeoutError:
             # No speech detected within timeout period
             return ""
             
-        except sr.UnknownValueError:
-            # Speech was detected but couldn't be recognized
-            return ""
-            
-        except sr.RequestError as e:
-            # API error
-            print(f"❌ API Error: {e}")
-            return "Speech recognition failed."
-            
         except Exception as e:
             # Unexpected error
             print(f"⚠️ Error: {e}")
             return "Unexpected error."
+            
+    return recognize(audio)
 
 # Function for continuous listening with retry logic
 def continuous_listen():
@@ -65,31 +331,159 @@ def continuous_listen():
             return result
         # If no valid speech was detected, try again without any message
 
+class AudioSource:
+    """Where ContinuousListener gets its speech segments from.
+    
+    segments() yields (audio, label) pairs until the source is exhausted or
+    is_active() returns False. Live sources drop the oldest queued segment
+    when recognition falls behind; lossless sources wait instead.
+    """
+    lossless = False
+    
+    def segments(self, is_active):
+        raise NotImplementedError
+
+class MicrophoneSource(AudioSource):
+    """Live input: one persistent microphone stream, calibrated once."""
+    
+    def __init__(self, calibration_duration=0.5, phrase_time_limit=10, device_index=None):
+        self.calibration_duration = calibration_duration
+        self.phrase_time_limit = phrase_time_limit
+        self.device_index = device_index
+    
+    def segments(self, is_active):
+        load_speech_recognition()
+        active = get_recognizer()
+        with sr.Microphone(device_index=self.device_index) as source:
+            calibrate(source, duration=self.calibration_duration)
+            print("🎙️ Listening... (say 'exit' to quit)")
+            
+            while is_active():
+                try:
+                    audio = active.listen(source, timeout=1,
+                                          phrase_time_limit=self.phrase_time_limit)
+                except sr.WaitTimeoutError:
+                    # No speech yet; loop to re-check is_active
+                    continue
+                yield audio, None
+
+class FileAudioSource(AudioSource):
+    """Replays recorded utterances, so the voice path runs without audio hardware.
+    
+    Each WAV/AIFF/FLAC file is one utterance; a directory is replayed in
+    sorted order. With speed=1.0 every segment is released only after its
+    own duration has elapsed, as if it were being spoken; higher values
+    replay faster, and speed=0 releases segments as fast as they are read.
+    """
+    lossless = True
+    extensions = (".wav", ".flac", ".aif", ".aiff")
+    
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+    
+    def files(self):
+        if os.path.isdir(self.path):
+            return [os.path.join(self.path, name) for name in sorted(os.listdir(self.path))
+                    if name.lower().endswith(self.extensions)]
+        return [self.path]
+    
+    def segments(self, is_active):
+        load_speech_recognition()
+        for path in self.files():
+            if not is_active():
+                return
+            with sr.AudioFile(path) as source:
+                audio = sr.Recognizer().record(source)
+            if self.speed > 0:
+                duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+                time.sleep(duration / self.speed)
+            yield audio, path
+
 class ContinuousListener:
     """A class that handles continuous voice command listening in a separate thread.
     
     This class is the core of RawWick's voice recognition system. It:
     1. Continuously listens for voice commands in the background
-    2. Converts speech to text using Google's speech recognition
+    2. Converts speech to text using the configured recognition backend
     3. Processes commands through the AI system
     4. Manages a queue of commands for orderly processing
     
-    The threading design allows the voice recognition to run without blocking
-    the main application, creating a responsive user experience.
+    Capture and recognition are pipelined. A single capture thread reads
+    utterances from the audio source (by default one persistent, once-
+    calibrated microphone stream) into a bounded audio queue; a pool of
+    recognizer threads turns them into text.
+    The mic keeps listening while earlier utterances are being recognized,
+    and commands are still delivered in the order they were spoken.
+    
+    Before recognition, each segment goes through a local voice-activity
+    check and, if wake words are configured, a wake-word gate, so noise and
+    background conversation don't cost a recognition call or reach the AI.
     """
-    def __init__(self, on_command_received=None):
+    def __init__(self, on_command_received=None, recognizer_workers=2,
+                 audio_queue_size=8, calibration_duration=0.5, phrase_time_limit=10,
+                 backend=None, on_partial_result=None, vad=True,
+                 wake_words=None, wake_window=8.0, wake_spotter=None,
+                 audio_source=None, on_transcript=None, coalesce_window=3.0):
         """Initialize the continuous listener.
         
         Args:
             on_command_received: Optional callback function that will be called
                                 when a new command is received.
+            recognizer_workers: Number of threads running speech recognition.
+            audio_queue_size: Maximum number of utterances waiting for
+                             recognition; the oldest is dropped when full.
+            calibration_duration: Seconds of ambient noise measured once when
+                                 the microphone is opened.
+            phrase_time_limit: Maximum length of a single utterance in seconds.
+            backend: RecognizerBackend instance or backend name; defaults to
+                    the deployment's configured backend.
+            on_partial_result: Optional callback receiving partial transcripts
+                              from streaming backends.
+            vad: True for the default VoiceActivityDetector, a detector
+                instance, or False to send every segment to the recognizer.
+            wake_words: Optional phrases that must be said before a command.
+            wake_window: Seconds commands are accepted after a wake word.
+            wake_spotter: Optional callable checking a segment for a wake
+                         word before recognition (e.g.
+                         VoskBackend.keyword_spotter(wake_words)).
+            audio_source: AudioSource to read from; defaults to the microphone.
+                         The listener stops once a finite source runs out.
+            on_transcript: Optional callback(label, text, captured_at) called
+                          in capture order for every segment, including
+                          rejected ones (text "").
+            coalesce_window: Seconds within which a repeated command is
+                            merged into the queued or running one.
         """
         self.listening_active = False
-        self.command_queue = queue.Queue()
+        # Priority queue: "stop"/"cancel" jump ahead and cancel pending work,
+        # and repeats of a queued or running command are merged
+        self.command_queue = CommandScheduler(coalesce_window=coalesce_window)
+        self.audio_queue = queue.Queue(maxsize=audio_queue_size)
         self.on_command_received = on_command_received
+        self.recognizer_workers = recognizer_workers
+        self.calibration_duration = calibration_duration
+        self.phrase_time_limit = phrase_time_limit
+        self.audio_source = audio_source or MicrophoneSource(calibration_duration, phrase_time_limit)
+        self.on_transcript = on_transcript
+        self.dropped_utterances = 0
+        self.backend = get_backend(backend) if isinstance(backend, str) else backend or default_backend()
+        self.on_partial_result = on_partial_result
+        self.vad = VoiceActivityDetector() if vad is True else (vad or None)
+        self.wake_gate = WakeWordGate(wake_words, wake_window, wake_spotter) if wake_words else None
+        self.gate_counts = {"segments": 0, "rejected_vad": 0, "rejected_wake_word": 0, "recognized": 0}
+        self._counts_lock = threading.Lock()
         self._listener_thread = None
+        self._recognizer_threads = []
         self._processor_thread = None
         
+        # Results are re-ordered by capture sequence number before delivery
+        self._order_lock = threading.Lock()
+        self._pending_results = {}
+        self._next_delivery = 0
+        self._exit_delivered = False
+        self._async_queues = []
+        
     def start_listening(self, process_commands=True, processor_func=None):
         """Start the listening thread.
         
@@ -101,7 +495,14 @@ class ContinuousListener:
         """
         self.listening_active = True
         
-        # Start the listener thread
+        # Start the recognizer workers, then the capture thread feeding them
+        self._recognizer_threads = []
+        for _ in range(self.recognizer_workers):
+            worker = threading.Thread(target=self._recognizer_loop)
+            worker.daemon = True
+            worker.start()
+            self._recognizer_threads.append(worker)
+        
         self._listener_thread = threading.Thread(target=self._listener_loop)
         self._listener_thread.daemon = True
         self._listener_thread.start()
@@ -125,10 +526,24 @@ class ContinuousListener:
         if self._listener_thread:
             self._listener_thread.join(timeout=1.0)
             
+        for worker in self._recognizer_threads:
+            worker.join(timeout=1.0)
+            
         if self._processor_thread:
             self._processor_thread.join(timeout=1.0)
             
         return self
+    
+    def wait_until_done(self, timeout=None):
+        """Wait for a finite audio source to be fully recognized and processed.
+        
+        Args:
+            timeout: Maximum seconds to wait for each stage.
+        """
+        for thread in [self._listener_thread, *self._recognizer_threads, self._processor_thread]:
+            if thread:
+                thread.join(timeout=timeout)
+        return self
             
     def get_next_command(self, timeout=0.5):
         """Get the next command from the queue.
@@ -144,6 +559,31 @@ class ContinuousListener:
         except queue.Empty:
             return None
     
+    def async_queue(self, loop=None):
+        """Get an asyncio.Queue that receives every recognized command.
+        
+        Commands (including the exit command) are handed to the queue's
+        event loop thread-safely, so async code can await them directly
+        instead of polling command_queue from a thread.
+        
+        Args:
+            loop: The event loop the queue is used on; defaults to the running loop.
+        """
+        loop = loop or asyncio.get_running_loop()
+        commands = asyncio.Queue()
+        with self._order_lock:
+            self._async_queues.append((loop, commands))
+        return commands
+    
+    async def commands(self):
+        """Async iterator over recognized commands, ending at an exit command."""
+        commands = self.async_queue()
+        while True:
+            command = await commands.get()
+            if self.is_exit_command(command):
+                return
+            yield command
+    
     def is_exit_command(self, command):
         """Check if a command is an exit command.
         
@@ -156,27 +596,149 @@ class ContinuousListener:
         return command.lower() in ("exit", "quit", "stop")
             
     def _listener_loop(self):
-        """The main listener loop that runs in a separate thread."""
-        while self.listening_active:
-            print("🎙️ Listening... (say 'exit' to quit)")
-            user_input = continuous_listen().strip().lower()
+        """The capture loop that runs in a separate thread.
+        
+        Pushes each utterance from the audio source onto the audio queue
+        without waiting for it to be recognized.
+        """
+        sequence = 0
+        try:
+            for audio, label in self.audio_source.segments(lambda: self.listening_active):
+                captured_at = time.monotonic()
+                # The utterance's task_id follows it through recognition and into the agent
+                task_id = tracing.new_task_id()
+                frame_data = getattr(audio, "frame_data", b"")
+                bytes_per_second = getattr(audio, "sample_rate", 0) * getattr(audio, "sample_width", 0)
+                duration = len(frame_data) / bytes_per_second if bytes_per_second else 0.0
+                tracer.record("audio_capture", duration, task_id=task_id, label=label)
+                self._enqueue_audio(sequence, audio, captured_at, label, task_id)
+                sequence += 1
+        except Exception as e:
+            print(f"⚠️ Error: {e}")
+        # The source is exhausted (or failed); let the workers drain the queue
+        self.listening_active = False
+    
+    def _enqueue_audio(self, sequence, audio, captured_at, label=None, task_id=None):
+        """Queue an utterance for recognition.
+        
+        If the queue is full, live sources drop the oldest utterance while
+        lossless sources wait for a recognizer to catch up.
+        """
+        item = (sequence, audio, captured_at, label, task_id)
+        if self.audio_source.lossless:
+            self.audio_queue.put(item)
+            return
+        while True:
+            try:
+                self.audio_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    dropped, _, dropped_at, dropped_label, _ = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped_utterances += 1
+                self._deliver_result(dropped, "", dropped_at, dropped_label)
+    
+    def _recognizer_loop(self):
+        """A recognizer worker that turns queued audio into commands."""
+        while self.listening_active or not self.audio_queue.empty():
+            try:
+                sequence, audio, captured_at, label, task_id = self.audio_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            tracer.record("recognition_queue", time.monotonic() - captured_at, task_id=task_id)
             
-            if user_input:
-                print(f"📝 Command received: {user_input}")
-                
-                # Check for exit command
-                if self.is_exit_command(user_input):
-                    self.listening_active = False
-                    self.command_queue.put(user_input)  # Put exit command in queue
-                    print("👋 Exiting system agent. Bye!")
-                    break
-                
-                # Add command to the queue for processing
-                self.command_queue.put(user_input)
-                
-                # Call the callback if provided
-                if self.on_command_received:
-                    self.on_command_received(user_input)
+            with tracer.span("speech_gate", task_id=task_id) as span:
+                rejection = self._gate_audio(audio, captured_at)
+                span.attrs["rejected"] = rejection
+            if rejection:
+                self._count(rejection)
+                self._deliver_result(sequence, "", captured_at, label)
+                continue
+            
+            self._count("recognized")
+            with tracer.span("recognition", task_id=task_id, backend=self.backend.name) as span:
+                text = recognize(audio, self.backend, self.on_partial_result)
+                span.attrs["chars"] = len(text)
+            self._deliver_result(sequence, text, captured_at, label, task_id)
+    
+    def _gate_audio(self, audio, captured_at):
+        """Decide whether a segment should be recognized.
+        
+        Returns:
+            None to recognize it, otherwise the name of the rejection counter.
+        """
+        self._count("segments")
+        if self.vad is not None:
+            try:
+                if not self.vad.is_speech(audio):
+                    return "rejected_vad"
+            except Exception as e:
+                # Never lose a command because the detector failed
+                print(f"⚠️ VAD error: {e}")
+        if self.wake_gate is not None and not self.wake_gate.admit_audio(audio, captured_at):
+            return "rejected_wake_word"
+        return None
+    
+    def _count(self, name):
+        with self._counts_lock:
+            self.gate_counts[name] += 1
+    
+    def gate_stats(self):
+        """Counts of segments captured, rejected before recognition, and recognized."""
+        with self._counts_lock:
+            return dict(self.gate_counts)
+    
+    def _deliver_result(self, sequence, text, captured_at=None, label=None, task_id=None):
+        """Release recognition results in the order their audio was captured."""
+        with self._order_lock:
+            self._pending_results[sequence] = (text, captured_at, label, task_id)
+            while self._next_delivery in self._pending_results:
+                text, captured_at, label, task_id = self._pending_results.pop(self._next_delivery)
+                self._next_delivery += 1
+                if self.on_transcript:
+                    self.on_transcript(label, text, captured_at)
+                if text in ("", "Speech recognition failed.", "Unexpected error."):
+                    continue
+                command = text.strip().lower()
+                if self.wake_gate is not None:
+                    command = self.wake_gate.filter(command, captured_at)
+                    if command is None:
+                        self._count("rejected_wake_word")
+                        continue
+                self._handle_command(command, task_id)
+    
+    def _handle_command(self, user_input, task_id=None):
+        """Queue a recognized command and notify the callback."""
+        if not user_input or self._exit_delivered:
+            return
+            
+        print(f"📝 Command received: {user_input}")
+        for loop, commands in self._async_queues:
+            loop.call_soon_threadsafe(commands.put_nowait, user_input)
+        
+        # Check for exit command
+        if self.is_exit_command(user_input):
+            self._exit_delivered = True
+            self.listening_active = False
+            self.command_queue.put(user_input)  # Runs after queued work; in-flight work finishes
+            print("👋 Exiting system agent. Bye!")
+            return
+        
+        if self.command_queue.is_cancel(user_input):
+            self.command_queue.put(user_input)
+            print("🛑 Cancelled pending commands.")
+            return
+        
+        # Add command to the queue for processing
+        if self.command_queue.put(user_input, task_id=task_id) is None:
+            print(f"🔁 Already queued or running: {user_input}")
+            return
+        
+        # Call the callback if provided
+        if self.on_command_received:
+            self.on_command_received(user_input)
     
     def _processor_loop(self, processor_func):
         """The main processor loop that runs in a separate thread.
@@ -184,17 +746,25 @@ class ContinuousListener:
         Args:
             processor_func: Function to call to process each command.
         """
-        while self.listening_active or not self.command_queue.empty():
+        while (self.listening_active or not self.command_queue.empty()
+               or any(worker.is_alive() for worker in self._recognizer_threads)):
             try:
                 # Get command with a timeout to allow checking the listening_active flag
-                user_input = self.command_queue.get(timeout=0.5)
+                entry = self.command_queue.get_entry(timeout=0.5)
+                user_input = entry.command
                 
                 if self.is_exit_command(user_input):
                     break
+                if self.command_queue.is_cancel(user_input):
+                    continue
                     
                 print(f"🧠 Processing command: {user_input}")
-                processor_func(user_input)
-                self.command_queue.task_done()
+                tracer.record("command_queue", entry.wait or 0.0, task_id=entry.task_id)
+                # system_agent returns a Future; tracking it lets later
+                # repeats merge into it and "cancel" stop it. process_query
+                # picks up the utterance's task_id from the tracing context.
+                with tracing.task(entry.task_id):
+                    self.command_queue.track(entry, processor_func(user_input))
                 
             except queue.Empty:
                 # No commands in queue, continue checking
@@ -1,46 +1,239 @@
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+import asyncio
 import threading
 import time
-import uuid
-from models.groq import GroqModel
-from executors.rawwick_executor import RawWickExecutor
-from utils.cache import FixCache
-from Secure.ApiKeys import GROQ_API_KEY
-from core.context_manager import ContextManager
-from rich.live import Live
-from rich.layout import Layout
 import os
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional, Tuple
+from utils.startup_profile import profiler
+from utils import tracing
+from utils.tracing import tracer
+
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
+# Everything heavy (rich, requests, psutil, the caches, the API key) is
+# imported and built on first use, so importing this module is cheap.
+
+
+class StageReporter:
+    """Drives a command's progress bar from real pipeline stage events."""
+
+    def __init__(self, progress: "Progress", lock: threading.Lock, desc: str,
+                 on_stage: Optional[Callable[[str], None]] = None):
+        self.progress = progress
+        self.lock = lock
+        self.on_stage = on_stage
+        self.timings: List[Tuple[str, float]] = []
+        self._stage = "queued"
+        self._stage_start = self._start = time.perf_counter()
+        with self.lock:
+            self.task = self.progress.add_task(description=desc, total=None, desc=desc, stage=self._stage)
+
+    def __call__(self, stage: str):
+        """Close the current stage and start the next one."""
+        with self.lock:
+            now = time.perf_counter()
+            self.timings.append((self._stage, now - self._stage_start))
+            self._stage, self._stage_start = stage, now
+            done = " · ".join(f"{name} {elapsed:.2f}s" for name, elapsed in self.timings[-3:])
+            self.progress.update(self.task, stage=f"{stage} [dim]({done})[/dim]")
+        if self.on_stage is not None:
+            self.on_stage(stage)
+
+    async def awrap_stream(self, chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+        """Pass a response stream through, reporting when its first token arrives."""
+        first = True
+        async for chunk in chunks:
+            if first:
+                self("first token")
+                first = False
+            yield chunk
+
+    def finish(self):
+        self("done")
+        with self.lock:
+            self.progress.remove_task(self.task)
+
+    @property
+    def total_time(self) -> float:
+        return time.perf_counter() - self._start
+
 
 class TaskExecutor:
-    def __init__(self):
-        self.console = Console()
-        self.context_manager = ContextManager()
-        self.ai = GroqModel(api_key=GROQ_API_KEY)
-        self.cache = FixCache()
-        self.executor = RawWickExecutor(
-            ai=self.ai,
-            fix_cache=self.cache,
-            context_manager=self.context_manager
-        )
-        self.thread_pool = ThreadPoolExecutor(max_workers=5)
-        self.progress = Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]{task.fields[desc]}", justify="right"),
-            BarColumn(),
-            TimeElapsedColumn(),
-            transient=True,
-        )
+    """
+    Runs spoken commands through the AI and the executor.
+
+    Components are created on first use rather than in __init__, each timed
+    by the startup profiler; warm_up() builds them all ahead of time.
+
+    Commands run as coroutines on a single event loop thread. Waiting on the
+    API or on shell commands doesn't hold a thread, so concurrency is bounded
+    by semaphores (commands, API requests, executing blocks) instead of a
+    fixed thread pool. process_query() is the synchronous entry point.
+    """
+    COMPONENTS = ("console", "context_manager", "intent_router", "ai", "cache", "response_cache",
+                  "executor", "loop", "progress")
+
+    def __init__(self, stream=True, workspace_budget=600, max_concurrent_queries=256,
+                 max_concurrent_requests=16, max_concurrent_executions=8, race_candidates=1):
+        """
+        Args:
+            stream: Stream responses and run code blocks as they arrive
+            workspace_budget: Characters of workspace summary added to prompts
+            max_concurrent_queries: Commands processed at once; others wait
+            max_concurrent_requests: API requests in flight at once
+            max_concurrent_executions: Code blocks executing at once, across commands
+            race_candidates: Fixes requested at once for a failing block; the first that works wins
+        """
+        self.stream = stream
+        self.workspace_budget = workspace_budget
+        self.max_concurrent_queries = max_concurrent_queries
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_concurrent_executions = max_concurrent_executions
+        self.race_candidates = race_candidates
+        self._query_slots: Optional[asyncio.Semaphore] = None
         self.progress_lock = threading.Lock()
-        self.progress.start()
+        self._components = {}
+        self._init_lock = threading.RLock()
 
-    def process_query(self, query: str):
-        if not query.strip():
-            return
+    def _lazy(self, name: str, load: Callable, build: Callable):
+        """Import (load) and construct (build) a component once, timing both."""
+        component = self._components.get(name)
+        if component is not None:
+            return component
+        with self._init_lock:
+            component = self._components.get(name)
+            if component is None:
+                with profiler.measure(name, "import"):
+                    loaded = load()
+                with profiler.measure(name, "init"):
+                    component = build(loaded)
+                self._components[name] = component
+            return component
+
+    @property
+    def console(self):
+        def load():
+            from rich.console import Console
+            return Console
+        return self._lazy("console", load, lambda Console: Console())
+
+    @property
+    def context_manager(self):
+        def load():
+            from core.context_manager import ContextManager
+            return ContextManager
+        return self._lazy("context_manager", load, lambda ContextManager: ContextManager())
+
+    @property
+    def intent_router(self):
+        """Local handlers for common commands, tried before the LLM."""
+        def load():
+            from core.intent_router import IntentRouter, register_builtin_intents
+            return IntentRouter, register_builtin_intents
+
+        def build(loaded):
+            IntentRouter, register_builtin_intents = loaded
+            router = register_builtin_intents(IntentRouter())
+            router.load_plugins()
+            return router
+        return self._lazy("intent_router", load, build)
+
+    @property
+    def ai(self):
+        def load():
+            from models.groq import GroqModel
+            from Secure.ApiKeys import GROQ_API_KEY
+            return GroqModel, GROQ_API_KEY
+        return self._lazy("ai", load, lambda loaded: loaded[0](
+            api_key=loaded[1], max_concurrent_requests=self.max_concurrent_requests))
+
+    @property
+    def cache(self):
+        def load():
+            from models.groq import platform_fingerprint
+            from utils.cache import FixCache
+            return FixCache, platform_fingerprint
+        return self._lazy("cache", load, lambda loaded: loaded[0](fingerprint=loaded[1]()))
+
+    @property
+    def response_cache(self):
+        def load():
+            from models.groq import platform_fingerprint
+            from utils.response_cache import ResponseCache
+            return ResponseCache, platform_fingerprint
+        return self._lazy("response_cache", load, lambda loaded: loaded[0](fingerprint=loaded[1]()))
+
+    @property
+    def executor(self):
+        def load():
+            from executors.rawwick_executor import RawWickExecutor
+            return RawWickExecutor
+
+        def build(RawWickExecutor):
+            return RawWickExecutor(
+                ai=self.ai,
+                fix_cache=self.cache,
+                context_manager=self.context_manager,
+                max_concurrent_executions=self.max_concurrent_executions,
+                race_candidates=self.race_candidates,
+            )
+        return self._lazy("executor", load, build)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop commands run on, in its own daemon thread."""
+        def build(_):
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="rawwick-agent-loop", daemon=True).start()
+            return loop
+        return self._lazy("loop", lambda: None, build)
+
+    @property
+    def progress(self):
+        def load():
+            from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn
+            return Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn
+
+        def build(loaded):
+            Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn = loaded
+            progress = Progress(
+                SpinnerColumn(),
+                TextColumn("[bold blue]{task.fields[desc]}", justify="right"),
+                BarColumn(),
+                TextColumn("{task.fields[stage]}"),
+                TimeElapsedColumn(),
+                transient=True,
+            )
+            progress.start()
+            return progress
+        return self._lazy("progress", load, build)
+
+    def warm_up(self, components: Iterable[str] = COMPONENTS):
+        """
+        Build components now instead of on the first command.
+
+        Args:
+            components: Names from COMPONENTS to initialize
+        """
+        for name in components:
+            getattr(self, name)
+        return self
+
+    def _build_prompt(self, query: str) -> Tuple[str, str]:
+        """
+        Add workspace and relevant history context to a command.
+
+        Returns:
+            The prompt, and a fingerprint of the context it added for the
+            response cache key
+        """
+        from utils.response_cache import normalize_query
 
         # Update workspace context
-        self.context_manager.update_workspace_state(os.getcwd())
+        cwd = os.getcwd()
+        self.context_manager.update_workspace_state(cwd)
+        prompt = query
 
         # Get relevant history for context
         relevant_history = self.context_manager.get_relevant_history(query)
@@ -48,32 +241,239 @@ class TaskExecutor:
             context_prompt = "\n\nRelevant command history:\n" + \
                 "\n".join(f"- {cmd['command']} ({cmd['success']})" 
                           for cmd in relevant_history)
-            query += context_prompt
+            prompt += context_prompt
 
-        task_id = str(uuid.uuid4())[:6]
-        task_desc = f"Processing: {query[:30]}..."
+        workspace = self.context_manager.get_workspace_summary(self.workspace_budget)
+        if workspace:
+            prompt += "\n\nWorkspace:\n" + workspace
+
+        # Earlier runs of this same command don't change what it asks for,
+        # so they're left out and repeats can still hit the cache
+        spoken = normalize_query(query)
+        related = sorted({normalize_query(cmd["command"]) for cmd in relevant_history} - {spoken})
+        context = "\n".join([cwd, workspace, *related])
+        return prompt, context
+
+    async def aprocess_query(self, query: str, on_stage: Optional[Callable[[str], None]] = None,
+                             task_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Process one command on the event loop.
+
+        Args:
+            query: The command
+            on_stage: Called with the name of each pipeline stage as it starts
+            task_id: Id tying the command's trace spans together (e.g. one
+                     assigned when its audio was captured); generated if omitted
 
-        with self.progress_lock:
-            task = self.progress.add_task(description=task_desc, total=100, desc=task_desc)
+        Returns:
+            A result record (see _result()), or None for an empty command
+        """
+        if not query.strip():
+            return None
+        task_id = task_id or tracing.new_task_id()
+        # Spans recorded anywhere below (including executor threads) carry task_id
+        with tracing.task(task_id), tracer.span("command") as span:
+            result = await self._aprocess_query(query, on_stage, task_id)
+            span.attrs.update(route=result["route"], success=result["success"])
+            tracer.count("commands", route=result["route"].split(":")[0], success=result["success"])
+        return result
+
+    async def _aprocess_query(self, query: str, on_stage: Optional[Callable[[str], None]],
+                              task_id: str) -> dict:
+        if self._query_slots is None:
+            self._query_slots = asyncio.Semaphore(self.max_concurrent_queries)
+        spoken_query = query
 
-        def background_task():
+        # Commands with a local handler skip the queue, the prompt and the API
+        match = self.intent_router.match(query)
+        if match is not None:
+            if on_stage is not None:
+                on_stage(f"intent {match.intent.name}")
+            result = await self._arun_intent(match, query, task_id)
+            if result is not None:
+                return result
+
+        task_desc = f"Processing: {query[:30]}..."
+        route, outputs, error = "llm", [], None
+        submitted = time.perf_counter()
+        async with self._query_slots:
+            wait = time.perf_counter() - submitted
+            tracer.record("query_slot_wait", wait)
+            stages = StageReporter(self.progress, self.progress_lock, task_desc, on_stage)
             try:
-                for _ in range(5):
-                    time.sleep(0.5)
-                    with self.progress_lock:
-                        self.progress.update(task, advance=20)
-                response = self.ai.chat(query)
-                self.executor.process(response)
+                stages("context build")
+                with tracer.span("context_build"):
+                    # Workspace scanning and history lookups touch the disk
+                    query, context = await asyncio.to_thread(self._build_prompt, query)
+
+                with tracer.span("response_cache_lookup") as lookup:
+                    cached = self.response_cache.get(spoken_query, context)
+                    lookup.attrs["hit"] = cached is not None
+                if cached is not None:
+                    route = "cache"
+                    stages("cached response")
+                    outputs = await self.executor.aprocess(cached, on_stage=stages)
+                    if any(self.executor.is_error_output(o) for o in outputs):
+                        self.response_cache.invalidate(spoken_query, context)
+                else:
+                    stages("LLM request sent")
+                    llm = tracer.begin("llm_request", stream=self.stream, prompt_chars=len(query))
+                    usage = {}
+                    if self.stream:
+                        response, outputs = await self.executor.aprocess_stream(
+                            stages.awrap_stream(tracer.atrace_stream(self.ai.astream_chat(query, usage=usage),
+                                                                     llm, usage)),
+                            on_stage=stages
+                        )
+                    else:
+                        try:
+                            response = await self.ai.achat(query, usage=usage)
+                        finally:
+                            tracer.record_usage(llm, usage)
+                            llm.end()
+                        stages("first token")
+                        outputs = await self.executor.aprocess(response, on_stage=stages)
+                    if outputs and not any(self.executor.is_error_output(o) for o in outputs):
+                        self.response_cache.put(spoken_query, response, context)
             except Exception as e:
+                error = str(e)
                 self.console.print(f"[red]Error during task:[/red] {e}")
             finally:
-                with self.progress_lock:
-                    self.progress.remove_task(task)
+                stages.finish()
+        success = error is None and not any(self.executor.is_error_output(o) for o in outputs)
+        return self._result(task_id, spoken_query, route, outputs, success, error,
+                            wait, stages.timings, stages.total_time)
+
+    async def _arun_intent(self, match, query: str, task_id: str) -> Optional[dict]:
+        """Run a matched intent's handler and record it like an executed command.
+
+        Returns None if the handler failed, so the command goes to the LLM.
+        """
+        from executors.rawwick_executor import RawWickExecutor
+
+        start = time.perf_counter()
+        with tracer.span("intent", intent=match.intent.name) as span:
+            output = await asyncio.to_thread(match.run)
+            span.attrs["handled"] = output is not None
+        if output is None:
+            return None
+        elapsed = time.perf_counter() - start
+        if output:
+            self.console.print(output)
+        success = not RawWickExecutor.is_error_output(output)
+        await asyncio.to_thread(self.context_manager.add_command, query, output, success)
+        return self._result(task_id, query, f"intent:{match.intent.name}", [output], success, None,
+                            0.0, [("intent", elapsed)], time.perf_counter() - start)
+
+    @staticmethod
+    def _result(task_id: str, command: str, route: str, outputs: List[str], success: bool,
+                error: Optional[str], wait: float, stages: List[Tuple[str, float]], seconds: float) -> dict:
+        """
+        Build the record describing one processed command.
+
+        Args:
+            task_id: Short id of the command
+            command: The command as received
+            route: "intent:<name>", "cache" or "llm"
+            outputs: Output of each executed block (or of the intent handler)
+            success: No error and no failing output
+            error: The exception message if processing failed
+            wait: Seconds spent waiting for a query slot
+            stages: (stage, seconds) for each pipeline stage
+            seconds: Total processing time after the wait
+
+        Returns:
+            A JSON-serializable dict
+        """
+        return {
+            "task_id": task_id,
+            "command": command,
+            "route": route,
+            "success": success,
+            "error": error,
+            "outputs": outputs,
+            "wait": round(wait, 6),
+            "seconds": round(seconds, 6),
+            "stages": [[stage, round(elapsed, 6)] for stage, elapsed in stages if stage != "queued"],
+        }
+
+    def process_query(self, query: str, task_id: Optional[str] = None) -> Optional[Future]:
+        """
+        Queue a command on the agent's event loop and return immediately.
+
+        Args:
+            query: The command
+            task_id: Trace id for the command; defaults to the caller's
+                     tracing.current_task_id(), else a new one
+
+        Returns:
+            A concurrent.futures.Future that completes when the command is
+            done, or None for an empty command
+        """
+        if not query.strip():
+            return None
+        # Build components on this thread rather than stalling the event loop
+        self.warm_up()
+        task_id = task_id or tracing.current_task_id()
+        return asyncio.run_coroutine_threadsafe(self.aprocess_query(query, task_id=task_id), self.loop)
+
+    def shutdown(self, timeout: float = 5.0) -> bool:
+        """
+        Wait for the commands still running on the event loop (e.g. cancelled
+        ones unwinding and killing their processes), then save the response
+        cache's usage and stop the Python worker pool and the progress
+        display. Components that were never built are left alone.
+
+        Args:
+            timeout: Seconds to wait for running commands
+
+        Returns:
+            False if some were still running when the timeout ran out
+        """
+        idle = True
+        loop = self._components.get("loop")
+        if loop is not None:
+            async def wait_idle():
+                tasks = asyncio.all_tasks() - {asyncio.current_task()}
+                if not tasks:
+                    return True
+                _, pending = await asyncio.wait(tasks, timeout=timeout)
+                return not pending
+            idle = asyncio.run_coroutine_threadsafe(wait_idle(), loop).result()
+        if "response_cache" in self._components:
+            self.response_cache.flush()
+        if "executor" in self._components:
+            self.executor.shutdown()
+        if "progress" in self._components:
+            self.progress.stop()
+        return idle
+
+_assistant = None
+_assistant_lock = threading.Lock()
+
+def get_assistant(**options) -> TaskExecutor:
+    """
+    The shared TaskExecutor, created on first use.
 
-        self.thread_pool.submit(background_task)
+    Args:
+        **options: TaskExecutor arguments, used only by the call that creates it
+    """
+    global _assistant
+    with _assistant_lock:
+        if _assistant is None:
+            _assistant = TaskExecutor(**options)
+        return _assistant
 
-assistant = TaskExecutor()
+def __getattr__(name):
+    # Keep `from core.agent import assistant` working without building it at import
+    if name == "assistant":
+        return get_assistant()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def system_agent(query: str):
-    """Processes a command string using the RawWick AI executor system."""
-    assistant.process_query(query)
\ No newline at end of file
+    """Processes a command string using the RawWick AI executor system.
+    
+    Returns immediately; the returned Future completes when the command has
+    been handled.
+    """
+    return get_assistant().process_query(query)
\ No newline at end of file
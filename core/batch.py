@@ -0,0 +1,224 @@
+"""
+Headless front end: runs text commands through the agent without a microphone.
+
+Commands come from a file or stdin, either one per line (blank lines and
+lines starting with "#" are skipped) or as JSONL objects with a "command"
+key and an optional "id". Each processed command produces one JSONL result
+record with its route, outputs and timings.
+
+    python main.py --batch runbook.txt --concurrency 8 --results results.jsonl
+    cat commands.jsonl | python main.py --batch - --order completion --results -
+"""
+from typing import Dict, IO, Iterable, Iterator, List, Optional
+import asyncio
+import json
+import sys
+import time
+
+ORDERS = ("input", "completion")
+
+
+def iter_commands(lines: Iterable[str], jsonl: Optional[bool] = None) -> Iterator[Dict]:
+    """
+    Parse command lines.
+
+    Args:
+        lines: Lines of text (a file object works)
+        jsonl: Treat every line as JSON; by default a line is JSON if it starts with "{"
+
+    Yields:
+        {"index": n, "command": str, "id": optional id from the JSONL record}
+    """
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line or (line.startswith("#") and not jsonl):
+            continue
+        if jsonl or (jsonl is None and line.startswith("{")):
+            record = json.loads(line)
+            item = {"index": index, "command": str(record["command"])}
+            if "id" in record:
+                item["id"] = record["id"]
+        else:
+            item = {"index": index, "command": line}
+        index += 1
+        yield item
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class BatchRunner:
+    """
+    Feeds commands to a TaskExecutor with bounded concurrency.
+
+    Up to `concurrency` commands are in flight at once; the next command is
+    only read once a slot frees up, so a slow agent throttles a piped stdin
+    instead of buffering it. With order="input" result records are written in
+    the order the commands were given (a finished command waits for the ones
+    before it); with order="completion" they are written as soon as they
+    finish. concurrency=1 also makes execution order deterministic.
+    """
+    def __init__(self, assistant, concurrency: int = 4, order: str = "input",
+                 results: Optional[IO[str]] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            assistant: The TaskExecutor commands go through
+            concurrency: Commands processed at once
+            order: "input" or "completion" order for result records
+            results: Text stream result records are written to as JSONL
+        """
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}, not {order!r}")
+        self.assistant = assistant
+        self.concurrency = max(1, concurrency)
+        self.order = order
+        self.results = results
+        self.records: List[Dict] = []
+        self._pending: Dict[int, Dict] = {}
+        self._next_index = 0
+        self._start = 0.0
+
+    def _emit(self, record: Dict):
+        if self.order == "completion":
+            ready = [record]
+        else:
+            self._pending[record["index"]] = record
+            ready = []
+            while self._next_index in self._pending:
+                ready.append(self._pending.pop(self._next_index))
+                self._next_index += 1
+        for item in ready:
+            self.records.append(item)
+            if self.results is not None:
+                self.results.write(json.dumps(item, default=str) + "\n")
+                self.results.flush()
+
+    async def _run_one(self, item: Dict, slots: asyncio.Semaphore):
+        started = time.perf_counter() - self._start
+        try:
+            result = await self.assistant.aprocess_query(item["command"])
+        except Exception as e:
+            result = {"command": item["command"], "success": False, "error": str(e), "outputs": []}
+        finally:
+            slots.release()
+        finished = time.perf_counter() - self._start
+        record = dict(item)
+        record.update(result or {"command": item["command"], "success": True, "outputs": []})
+        record["started"] = round(started, 6)
+        record["finished"] = round(finished, 6)
+        record["latency"] = round(finished - started, 6)
+        self._emit(record)
+
+    async def arun(self, commands: Iterable[Dict]) -> Dict:
+        """
+        Process every command on the current event loop.
+
+        Args:
+            commands: Items from iter_commands(); read lazily, off the loop
+
+        Returns:
+            The summary (see summary())
+        """
+        self._start = time.perf_counter()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        iterator = iter(commands)
+        while True:
+            await slots.acquire()
+            # Reading stdin blocks, so it happens in a worker thread
+            item = await asyncio.to_thread(next, iterator, None)
+            if item is None:
+                slots.release()
+                break
+            task = asyncio.ensure_future(self._run_one(item, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self.summary(time.perf_counter() - self._start)
+
+    def run(self, commands: Iterable[Dict]) -> Dict:
+        """
+        Process every command on the assistant's event loop, blocking until done.
+
+        Args:
+            commands: Items from iter_commands()
+
+        Returns:
+            The summary (see summary())
+        """
+        self.assistant.warm_up()
+        return asyncio.run_coroutine_threadsafe(self.arun(commands), self.assistant.loop).result()
+
+    def summary(self, wall: float) -> Dict:
+        """
+        Aggregate the records written so far.
+
+        Args:
+            wall: Seconds the batch took
+
+        Returns:
+            Counts, throughput and latency percentiles
+        """
+        latencies = [record["latency"] for record in self.records]
+        routes: Dict[str, int] = {}
+        for record in self.records:
+            route = str(record.get("route", "none")).split(":")[0]
+            routes[route] = routes.get(route, 0) + 1
+        failed = sum(1 for record in self.records if not record.get("success"))
+        return {
+            "commands": len(self.records),
+            "succeeded": len(self.records) - failed,
+            "failed": failed,
+            "routes": routes,
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall, 3),
+            "commands_per_second": round(len(self.records) / wall, 3) if wall else None,
+            "latency_p50": _percentile(latencies, 0.50),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": max(latencies) if latencies else None,
+        }
+
+
+def run_batch(source: str = "-", concurrency: int = 4, order: str = "input",
+              results: Optional[str] = None, assistant=None) -> Dict:
+    """
+    Run a file (or stdin, for "-") of commands through the agent.
+
+    Args:
+        source: Path to a text or JSONL file of commands, or "-" for stdin
+        concurrency: Commands processed at once
+        order: "input" or "completion" order for result records
+        results: Path for JSONL result records, "-" for stdout, or None
+        assistant: TaskExecutor to use; defaults to the shared one
+
+    Returns:
+        The batch summary
+    """
+    if assistant is None:
+        from core.agent import get_assistant
+        assistant = get_assistant()
+
+    if results == "-":
+        # Keep stdout clean for the records; the agent's console goes to stderr
+        for console in (assistant.console, assistant.executor.console, assistant.progress.console):
+            console.file = sys.stderr
+
+    source_file = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    results_file = sys.stdout if results == "-" else (open(results, "w", encoding="utf-8") if results else None)
+    try:
+        jsonl = True if source.endswith(".jsonl") else None
+        runner = BatchRunner(assistant, concurrency=concurrency, order=order, results=results_file)
+        return runner.run(iter_commands(source_file, jsonl=jsonl))
+    finally:
+        if source_file is not sys.stdin:
+            source_file.close()
+        if results_file is not None and results_file is not sys.stdout:
+            results_file.close()
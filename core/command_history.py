@@ -0,0 +1,184 @@
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+
+class HistoryRecord:
+    """
+    One executed command, stored compactly.
+
+    Commands are interned (the same snippets recur a lot), the timestamp is
+    a float, and long results are truncated and zlib-compressed.
+    """
+    __slots__ = ("seq", "timestamp", "command", "_result", "success")
+
+    def __init__(self, seq: int, timestamp: float, command: str, result, success: bool):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.command = sys.intern(command)
+        self._result = result
+        self.success = success
+
+    @property
+    def result(self) -> str:
+        if isinstance(self._result, bytes):
+            return zlib.decompress(self._result).decode("utf-8")
+        return self._result
+
+    def as_dict(self) -> Dict:
+        """
+        Get the record in the dictionary form ContextManager has always returned.
+
+        Returns:
+            A dict with timestamp (ISO string), command, result and success
+        """
+        return {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "command": self.command,
+            "result": self.result,
+            "success": self.success,
+        }
+
+
+class CommandHistory:
+    """
+    Fixed-size in-memory ring of recent commands backed by an append-only log.
+
+    Every record is appended to a JSON-lines log as it is added, and only
+    the most recent `capacity` records are kept in memory. On startup the
+    tail of the log is loaded back, so history survives restarts without
+    the process holding all of it.
+    """
+    def __init__(self, capacity: int = 1000, log_path: Optional[str] = "command_history.jsonl",
+                 max_result_chars: int = 4000, compress_over: int = 512,
+                 max_log_bytes: int = 32 * 1024 * 1024,
+                 on_evict: Optional[Callable[[HistoryRecord], None]] = None):
+        """
+        Initialize the history and reload recent records from the log.
+
+        Args:
+            capacity: Number of records kept in memory
+            log_path: JSON-lines file records are appended to (None disables it)
+            max_result_chars: Results longer than this are truncated
+            compress_over: Results longer than this are kept compressed in memory
+            max_log_bytes: Size at which the log is rotated to <log_path>.1
+            on_evict: Called with each record that drops out of the ring
+        """
+        self.capacity = capacity
+        self.log_path = log_path
+        self.max_result_chars = max_result_chars
+        self.compress_over = compress_over
+        self.max_log_bytes = max_log_bytes
+        self.on_evict = on_evict
+        self._ring: deque = deque()
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        if log_path:
+            self._reload()
+
+    def _pack_result(self, result: str):
+        if len(result) > self.max_result_chars:
+            result = result[:self.max_result_chars] + f"\n... [{len(result) - self.max_result_chars} chars truncated]"
+        if len(result) > self.compress_over:
+            return zlib.compress(result.encode("utf-8"))
+        return result
+
+    def _tail_lines(self) -> List[str]:
+        """Read roughly the last `capacity` lines of the log without reading all of it."""
+        with open(self.log_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = position = f.tell()
+            data = b""
+            while position > 0 and data.count(b"\n") <= self.capacity:
+                step = min(64 * 1024, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        if position > 0:
+            lines = lines[1:]  # First line is probably partial
+        return lines[-self.capacity:] if end else []
+
+    def _reload(self):
+        if not os.path.exists(self.log_path):
+            return
+        try:
+            lines = self._tail_lines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._ring.append(HistoryRecord(
+                self._next_seq, entry["t"], entry["c"], self._pack_result(entry["r"]), entry["s"]
+            ))
+            self._next_seq += 1
+
+    def _write_log(self, record: HistoryRecord, result: str):
+        line = json.dumps({"t": record.timestamp, "c": record.command, "r": result, "s": record.success})
+        try:
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.max_log_bytes:
+                os.replace(self.log_path, f"{self.log_path}.1")
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+    def append(self, command: str, result: str, success: bool) -> HistoryRecord:
+        """
+        Record a command.
+
+        Args:
+            command: The command that was executed
+            result: Its output
+            success: Whether it succeeded
+
+        Returns:
+            The stored record
+        """
+        packed = self._pack_result(result)
+        evicted = None
+        with self._lock:
+            record = HistoryRecord(self._next_seq, time.time(), command, packed, success)
+            self._next_seq += 1
+            self._ring.append(record)
+            if len(self._ring) > self.capacity:
+                evicted = self._ring.popleft()
+            if self.log_path:
+                self._write_log(record, record.result)
+        if evicted is not None and self.on_evict:
+            self.on_evict(evicted)
+        return record
+
+    def get(self, seq: int) -> Optional[HistoryRecord]:
+        """
+        Look up an in-memory record by sequence number.
+
+        Args:
+            seq: The record's sequence number
+
+        Returns:
+            The record, or None if it has left the ring
+        """
+        with self._lock:
+            if not self._ring:
+                return None
+            position = seq - self._ring[0].seq
+            if 0 <= position < len(self._ring):
+                return self._ring[position]
+            return None
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        with self._lock:
+            return iter(list(self._ring))
+
+    def __len__(self) -> int:
+        return len(self._ring)
@@ -1,7 +1,9 @@
 from typing import Dict, List, Optional
-import json
-import os
 from datetime import datetime
+from core.history_index import HistoryIndex
+from core.command_history import CommandHistory
+from core.workspace import WorkspaceScanner
+import threading
 
 class ContextManager:
     """
@@ -11,12 +13,29 @@ class ContextManager:
     contextual information to help the AI provide more relevant and
     personalized responses based on previous interactions.
     """
-    def __init__(self):
+    def __init__(self, history_size: int = 1000, history_path: Optional[str] = "command_history.jsonl"):
         """
-        Initialize the context manager with empty history and context.
+        Initialize the context manager with empty context, reloading recent
+        command history from disk.
+        
+        Args:
+            history_size: Number of recent commands kept in memory
+            history_path: Append-only log older commands are kept in (None disables it)
         """
         
-        self.command_history: List[Dict] = []
+        self.history_index = HistoryIndex()
+        self.history = CommandHistory(
+            capacity=history_size,
+            log_path=history_path,
+            on_evict=lambda record: self.history_index.remove(record.seq),
+        )
+        for record in self.history:
+            self.history_index.add(record.seq, record.command)
+        self._counter_lock = threading.Lock()
+        self.session_commands = 0
+        self.session_successes = 0
+        self.workspace_scanner = WorkspaceScanner()
+        self.workspace_snapshot = None
         self.context_memory: Dict[str, any] = {}
         self.workspace_state: Dict[str, any] = {}
         self.session_start = datetime.now()
@@ -30,51 +49,65 @@ class ContextManager:
             result: The result or output of the command
             success: Whether the command executed successfully
         """
-        self.command_history.append({
-            "timestamp": datetime.now().isoformat(),
-            "command": command,
-            "result": result,
-            "success": success
-        })
+        record = self.history.append(command, result, success)
+        self.history_index.add(record.seq, record.command)
+        with self._counter_lock:
+            self.session_commands += 1
+            self.session_successes += bool(success)
+
+    @property
+    def command_history(self) -> List[Dict]:
+        """
+        The in-memory command history as a list of dictionaries, oldest first.
+        """
+        return [record.as_dict() for record in self.history]
 
     def get_relevant_history(self, query: str, limit: int = 5) -> List[Dict]:
         """
         Find commands from history that are relevant to the current query.
         
-        This method uses a simple word-matching algorithm to find commands
-        that share words with the current query, which helps provide context
-        for the AI to understand related commands.
+        Commands are scored with BM25 against an inverted index that is
+        updated as commands are added, so only commands sharing a word with
+        the query are considered. This helps provide context for the AI to
+        understand related commands.
         
         Args:
             query: The current user query
             limit: Maximum number of relevant history items to return
             
         Returns:
-            A list of the most relevant command history entries
-        """
-        # Simple relevance scoring based on command similarity
-        scored_history = [
-            (entry, len(set(query.lower().split()) & set(entry["command"].lower().split())))
-            for entry in self.command_history
-        ]
-        return [entry for entry, score in sorted(scored_history, key=lambda x: x[1], reverse=True)[:limit]]
+            A list of the most relevant command history entries, best first
+        """
+        records = (self.history.get(seq) for _, seq in self.history_index.search(query, limit))
+        return [record.as_dict() for record in records if record is not None]
 
     def update_workspace_state(self, path: str):
         """
         Update the current workspace information.
         
-        This method scans the current directory to gather information about
-        available files and folders, which helps the AI understand the
-        user's working environment.
+        This method gathers information about available files and folders,
+        which helps the AI understand the user's working environment. The
+        listing is cached and only rescanned when the directory changes.
         
         Args:
             path: The directory path to scan
         """
-        self.workspace_state = {
-            "current_dir": os.path.abspath(path),
-            "files": [f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))],
-            "dirs": [d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d))]
-        }
+        self.workspace_snapshot = self.workspace_scanner.snapshot(path)
+        self.workspace_state = self.workspace_snapshot.as_dict()
+
+    def get_workspace_summary(self, budget: int = 600) -> str:
+        """
+        Describe the current workspace for the AI prompt.
+        
+        Args:
+            budget: Maximum length of the summary in characters
+            
+        Returns:
+            The summary, or an empty string if no workspace was captured yet
+        """
+        if self.workspace_snapshot is None:
+            return ""
+        return self.workspace_snapshot.summary(budget)
 
     def add_context(self, key: str, value: any):
         """
@@ -108,8 +141,10 @@ class ContextManager:
         Returns:
             A dictionary containing session statistics
         """
+        with self._counter_lock:
+            count, successes = self.session_commands, self.session_successes
         return {
             "session_duration": str(datetime.now() - self.session_start),
-            "command_count": len(self.command_history),
-            "success_rate": sum(1 for cmd in self.command_history if cmd["success"]) / len(self.command_history) if self.command_history else 0
+            "command_count": count,
+            "success_rate": successes / count if count else 0
         }
\ No newline at end of file
@@ -0,0 +1,590 @@
+"""
+Long-running agent daemon: many local clients share one warm TaskExecutor.
+
+The AI client pool, FixCache, response cache, intent router and Python
+worker pool are built once at startup, so clients don't pay cold-start
+costs. Commands are submitted over a small JSON HTTP API on a TCP port or
+a Unix socket:
+
+    POST /commands               {"command": "list files", "wait": false}
+    GET  /commands/<id>          status and, once finished, the result record
+    GET  /commands/<id>/events   NDJSON stream of queued/running/stage/done events
+    DELETE /commands/<id>        cancel a queued or running command
+    GET  /health                 queue depth, workers, per-client load, cache stats
+    GET  /metrics                per-stage latency histograms (Prometheus text)
+
+    python main.py --serve 127.0.0.1:8765 --workers 8 --queue-size 64
+    curl --unix-socket /tmp/rawwick.sock localhost/commands \
+        -H 'Content-Type: application/json' -d '{"command": "time"}'
+
+The API runs arbitrary commands, so it only trusts local, non-browser
+clients: requests carrying an Origin header are refused, POST bodies must
+be application/json (which a web page can't send cross-origin without a
+preflight, and preflights aren't answered), and on TCP the Host header must
+name the loopback address, which defeats DNS rebinding. With
+$RAWWICK_DAEMON_TOKEN set every request must also send it in an
+X-RawWick-Token header; binding anything but a loopback address or a Unix
+socket requires a token. Unix sockets are created readable and writable by
+their owner only.
+
+Per-client limits apply to the peer address on TCP and to the peer process
+on a Unix socket, never to anything the client says about itself. A full
+queue answers 503 and a client over its limit answers 429, both with
+Retry-After, instead of buffering without bound.
+"""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import hmac
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from utils.addresses import host_name, is_loopback
+from utils.tracing import tracer
+
+
+class QueueFullError(Exception):
+    """The daemon's work queue is at capacity."""
+
+
+class ClientLimitError(Exception):
+    """A client already has as many commands queued or running as it may."""
+
+
+class Job:
+    """One submitted command and everything that has happened to it."""
+    __slots__ = ("id", "client", "command", "status", "submitted", "events", "record", "task")
+
+    def __init__(self, client: str, command: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.client = client
+        self.command = command
+        self.status = "queued"
+        self.submitted = time.time()
+        self.events: List[Dict] = []
+        self.record: Optional[Dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "client": self.client,
+            "command": self.command,
+            "status": self.status,
+            "submitted": self.submitted,
+            "result": self.record,
+        }
+
+
+class AgentDaemon:
+    """
+    Bounded work queue and worker coroutines in front of a shared TaskExecutor.
+
+    submit() is thread-safe and never blocks: it either admits the command
+    or raises QueueFullError / ClientLimitError. Worker coroutines on the
+    agent's event loop take commands off the queue; each job's progress is
+    recorded as events that HTTP handler threads can poll or stream.
+    """
+    def __init__(self, assistant=None, workers: int = 8, queue_size: int = 64,
+                 client_limit: int = 4, keep_jobs: int = 1000):
+        """
+        Initialize the daemon.
+
+        Args:
+            assistant: The TaskExecutor to share; defaults to the process-wide one
+            workers: Commands processed at once
+            queue_size: Commands waiting beyond those being processed
+            client_limit: Commands one client may have queued or running
+            keep_jobs: Finished jobs kept for polling before the oldest are dropped
+        """
+        if assistant is None:
+            from core.agent import get_assistant
+            assistant = get_assistant()
+        self.assistant = assistant
+        self.workers = workers
+        self.queue_size = queue_size
+        self.client_limit = client_limit
+        self.keep_jobs = keep_jobs
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, int] = {}
+        self._queued = 0
+        self._running = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._cond = threading.Condition()
+        self.stats = {"submitted": 0, "completed": 0, "cancelled": 0,
+                      "rejected_queue_full": 0, "rejected_client_limit": 0}
+
+    def start(self):
+        """Warm every shared component and start the worker coroutines."""
+        self.assistant.warm_up()
+        # Pre-spawn the Python worker processes too
+        self.assistant.executor.worker_pool
+        asyncio.run_coroutine_threadsafe(self._astart(), self.assistant.loop).result()
+        return self
+
+    async def _astart(self):
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        """Stop the worker coroutines, cancelling running and queued commands."""
+        for task in self._worker_tasks:
+            self.assistant.loop.call_soon_threadsafe(task.cancel)
+        with self._cond:
+            queued = [job for job in self.jobs.values() if job.status == "queued"]
+            for job in queued:
+                self._drop(job)
+        for job in queued:
+            self._event(job, "cancelled")
+
+    def _event(self, job: Job, event: str, **fields):
+        with self._cond:
+            fields.update(event=event, at=round(time.time() - job.submitted, 6))
+            job.events.append(fields)
+            self._cond.notify_all()
+
+    def submit(self, client: str, command: str) -> Job:
+        """
+        Admit a command to the work queue.
+
+        Args:
+            client: Client identifier for per-client limits
+            command: The command text
+
+        Returns:
+            The queued job
+
+        Raises:
+            ValueError: The command is empty
+            QueueFullError: The queue is at capacity
+            ClientLimitError: The client is at its limit
+        """
+        if not command.strip():
+            raise ValueError("command is empty")
+        with self._cond:
+            if self._queued >= self.queue_size:
+                self.stats["rejected_queue_full"] += 1
+                raise QueueFullError(f"queue is full ({self.queue_size} waiting)")
+            if self._active.get(client, 0) >= self.client_limit:
+                self.stats["rejected_client_limit"] += 1
+                raise ClientLimitError(f"client {client!r} already has {self.client_limit} commands in flight")
+            job = Job(client, command)
+            self.jobs[job.id] = job
+            self._active[client] = self._active.get(client, 0) + 1
+            self._queued += 1
+            self.stats["submitted"] += 1
+            self._evict()
+        self._event(job, "queued", position=self._queued)
+        self.assistant.loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def _evict(self):
+        excess = len(self.jobs) - self.keep_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:excess]:
+            del self.jobs[job_id]
+
+    def _release(self, job: Job):
+        # Caller holds self._cond
+        self._active[job.client] -= 1
+        if not self._active[job.client]:
+            del self._active[job.client]
+
+    def _drop(self, job: Job):
+        # Caller holds self._cond; the worker skips the job when it comes off the queue
+        job.status = "cancelled"
+        job.record = {"command": job.command, "success": False, "error": "cancelled", "outputs": []}
+        self._queued -= 1
+        self._release(job)
+        self.stats["cancelled"] += 1
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            with self._cond:
+                if job.status == "cancelled":
+                    continue
+                self._queued -= 1
+                self._running += 1
+                job.status = "running"
+                job.task = asyncio.ensure_future(self.assistant.aprocess_query(
+                    job.command, on_stage=lambda stage, job=job: self._event(job, "stage", stage=stage)
+                ))
+            self._event(job, "running")
+            try:
+                # wait() rather than awaiting the task, so cancelling the job
+                # doesn't look like this worker being cancelled
+                await asyncio.wait({job.task})
+                if job.task.cancelled():
+                    record = {"command": job.command, "success": False, "error": "cancelled", "outputs": []}
+                elif job.task.exception() is not None:
+                    record = {"command": job.command, "success": False,
+                              "error": str(job.task.exception()), "outputs": []}
+                else:
+                    record = job.task.result() or {"command": job.command, "success": True, "outputs": []}
+            except asyncio.CancelledError:
+                job.task.cancel()
+                record = {"command": job.command, "success": False, "error": "cancelled", "outputs": []}
+                raise
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._release(job)
+                    job.record = record
+                    if record.get("error") == "cancelled":
+                        job.status = "cancelled"
+                        self.stats["cancelled"] += 1
+                    else:
+                        job.status = "done" if record.get("success") else "failed"
+                        self.stats["completed"] += 1
+                self._event(job, job.status)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a command: a queued one is dropped, a running one has its
+        LLM request and executions cancelled.
+
+        Args:
+            job_id: The job's id
+
+        Returns:
+            The job, or None if there is no such job
+        """
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            if job.status == "queued":
+                self._drop(job)
+                dropped = True
+            else:
+                dropped = False
+                task = job.task
+        if dropped:
+            self._event(job, "cancelled")
+        else:
+            self.assistant.loop.call_soon_threadsafe(task.cancel)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def wait_events(self, job: Job, cursor: int, timeout: float = 15.0) -> Tuple[List[Dict], bool]:
+        """
+        Block until a job has events past `cursor` (or it finishes, or time runs out).
+
+        Args:
+            job: The job
+            cursor: Number of events the caller has already seen
+            timeout: Seconds to wait
+
+        Returns:
+            (new events, whether the job has finished)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(job.events) > cursor or job.finished, timeout)
+            return job.events[cursor:], job.finished
+
+    def wait(self, job: Job, timeout: Optional[float] = None) -> bool:
+        """Block until a job finishes; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: job.finished, timeout)
+
+    def health(self) -> Dict:
+        """
+        Report load and the state of the shared components.
+
+        Returns:
+            Queue, worker and per-client counts plus cache and pool stats
+        """
+        with self._cond:
+            report = {
+                "queued": self._queued,
+                "running": self._running,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "client_limit": self.client_limit,
+                "clients": dict(self._active),
+                "jobs": len(self.jobs),
+                "stats": dict(self.stats),
+            }
+        executor = self.assistant.executor
+        router = self.assistant.intent_router
+        report["worker_pool"] = executor.worker_pool.snapshot()
+        report["intents"] = {"hits": router.hits, "misses": router.misses}
+        report["ai_latency"] = self.assistant.ai.latency_stats()
+        report["stages"] = tracer.snapshot()
+        return report
+
+    def metrics(self) -> str:
+        """
+        Prometheus text: the tracer's per-stage histograms plus queue gauges.
+
+        Returns:
+            The exposition text
+        """
+        with self._cond:
+            gauges = {"queued": self._queued, "running": self._running,
+                      "clients": len(self._active)}
+            stats = dict(self.stats)
+        lines = [tracer.prometheus().rstrip("\n")]
+        for name, value in gauges.items():
+            lines += [f"# TYPE rawwick_daemon_{name} gauge", f"rawwick_daemon_{name} {value}"]
+        lines.append("# TYPE rawwick_daemon_requests_total counter")
+        lines += [f'rawwick_daemon_requests_total{{outcome="{name}"}} {value}' for name, value in stats.items()]
+        return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "RawWick"
+
+    @property
+    def agent_daemon(self) -> AgentDaemon:
+        return self.server.agent_daemon
+
+    def log_message(self, format, *args):
+        # The agent's console is busy with command output
+        pass
+
+    def _authorized(self) -> bool:
+        """Refuse browsers, rebound host names and missing tokens; sends the error."""
+        if self.headers.get("Origin"):
+            self._send_json(403, {"error": "cross-origin requests are not accepted"})
+            return False
+        token = self.server.token
+        if token:
+            if not hmac.compare_digest(self.headers.get("X-RawWick-Token", "").encode(), token.encode()):
+                self._send_json(401, {"error": "missing or wrong X-RawWick-Token"})
+                return False
+        elif isinstance(self.client_address, tuple) and not is_loopback(host_name(self.headers.get("Host", ""))):
+            self._send_json(403, {"error": "Host must be a loopback address"})
+            return False
+        return True
+
+    def _client(self) -> str:
+        """Who a request counts against: its peer address, or its process on a Unix socket."""
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return _peer_process(self.connection)
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job(self, job_id: str) -> Optional[Job]:
+        job = self.agent_daemon.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"no such command {job_id!r}"})
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = [part for part in urlsplit(self.path).path.split("/") if part]
+        if parts == ["health"]:
+            self._send_json(200, self.agent_daemon.health())
+        elif parts == ["metrics"]:
+            data = self.agent_daemon.metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif len(parts) == 2 and parts[0] == "commands":
+            job = self._job(parts[1])
+            if job is not None:
+                self._send_json(200, job.as_dict())
+        elif len(parts) == 3 and parts[0] == "commands" and parts[2] == "events":
+            job = self._job(parts[1])
+            if job is not None:
+                self._stream_events(job)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job: Job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        cursor = 0
+        finished = False
+        try:
+            while not finished:
+                events, finished = self.agent_daemon.wait_events(job, cursor)
+                cursor += len(events)
+                for event in events:
+                    self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write((json.dumps({"event": "result", "result": job.record}, default=str) + "\n").encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if not self._authorized():
+            return
+        if url.path.rstrip("/") != "/commands":
+            self._send_json(404, {"error": "not found"})
+            return
+        # Only JSON: a text/plain or form POST is a "simple" request a web page could forge
+        if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+            self._send_json(415, {"error": "body must be application/json"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        wait = parse_qs(url.query).get("wait", ["0"])[0].lower() in ("1", "true", "yes")
+        try:
+            payload = json.loads(body or "{}")
+        except ValueError:
+            self._send_json(400, {"error": "body must be a JSON object"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "body must be a JSON object"})
+            return
+        command = str(payload.get("command", ""))
+        wait = wait or bool(payload.get("wait"))
+
+        try:
+            job = self.agent_daemon.submit(self._client(), command)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        except ClientLimitError as e:
+            self._send_json(429, {"error": str(e)}, {"Retry-After": "1"})
+            return
+
+        if wait:
+            self.agent_daemon.wait(job)
+            self._send_json(200, job.as_dict())
+        else:
+            self._send_json(202, job.as_dict(), {"Location": f"/commands/{job.id}"})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = [part for part in urlsplit(self.path).path.split("/") if part]
+        if len(parts) != 2 or parts[0] != "commands":
+            self._send_json(404, {"error": "not found"})
+            return
+        job = self.agent_daemon.cancel(parts[1])
+        if job is None:
+            self._send_json(404, {"error": f"no such command {parts[1]!r}"})
+        else:
+            self._send_json(202, job.as_dict())
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Owner-only from the moment the socket file appears
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+
+def _peer_process(connection: socket.socket) -> str:
+    """The process on the other end of a Unix socket, where the platform reports it."""
+    try:
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    except (AttributeError, OSError):
+        return "local"
+    pid, _, _ = struct.unpack("3i", credentials)
+    return f"pid:{pid}"
+
+
+def _tcp_host(address: str, token: Optional[str]) -> str:
+    """The host to bind for a "host:port" address, refusing exposed binds without a token."""
+    host = host_name(address.rpartition(":")[0]) or "127.0.0.1"
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to serve on non-loopback address {host!r} without "
+                         "a token (set RAWWICK_DAEMON_TOKEN)")
+    return host
+
+
+def make_server(daemon: AgentDaemon, address: str = "127.0.0.1:8765", token: Optional[str] = None):
+    """
+    Create the HTTP server for a daemon.
+
+    Args:
+        daemon: The started AgentDaemon
+        address: "host:port", ":port" or "unix:/path/to.sock"
+        token: Secret clients must send in X-RawWick-Token; required
+               unless address is a loopback address or a Unix socket
+
+    Returns:
+        A socketserver server; call serve_forever() on it
+
+    Raises:
+        ValueError: A non-loopback address was given without a token
+    """
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = _UnixHTTPServer(path, _Handler)
+    else:
+        server = ThreadingHTTPServer((_tcp_host(address, token), int(address.rpartition(":")[2])), _Handler)
+    server.agent_daemon = daemon
+    server.token = token
+    return server
+
+
+def serve(address: str = "127.0.0.1:8765", workers: int = 8, queue_size: int = 64,
+          client_limit: int = 4, assistant=None, token: Optional[str] = None):
+    """
+    Start the daemon and serve its API until interrupted.
+
+    Args:
+        address: "host:port", ":port" or "unix:/path/to.sock"
+        workers: Commands processed at once
+        queue_size: Commands waiting beyond those being processed
+        client_limit: Commands one client may have queued or running
+        assistant: TaskExecutor to share; defaults to the process-wide one
+        token: Secret clients must send; defaults to $RAWWICK_DAEMON_TOKEN
+    """
+    token = token or os.environ.get("RAWWICK_DAEMON_TOKEN") or None
+    # Checked before the agent warms up, so a refused address fails fast
+    if not address.startswith("unix:"):
+        _tcp_host(address, token)
+    daemon = AgentDaemon(assistant, workers=workers, queue_size=queue_size,
+                         client_limit=client_limit).start()
+    server = make_server(daemon, address, token)
+    print(f"RawWick daemon listening on {address} ({workers} workers, queue {queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if address.startswith("unix:"):
+            try:
+                os.unlink(address[len("unix:"):])
+            except OSError:
+                pass
@@ -0,0 +1,117 @@
+from collections import Counter
+from typing import Dict, Hashable, List, Tuple
+import heapq
+import math
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text: The text to split
+
+    Returns:
+        The tokens in order
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+class HistoryIndex:
+    """
+    Incrementally maintained inverted index with BM25 scoring.
+
+    Each document's term frequencies are recorded once when it is added, so
+    a search only touches the postings of the query's terms instead of
+    re-tokenizing the whole history, and only documents sharing at least one
+    term with the query are scored.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_terms: Dict[Hashable, Counter] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def add(self, doc_id: Hashable, text: str):
+        """
+        Index a document.
+
+        Args:
+            doc_id: Identifier returned by searches
+            text: The document's text
+        """
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            self.doc_terms[doc_id] = terms
+            self.doc_lengths[doc_id] = sum(terms.values())
+            self.total_length += self.doc_lengths[doc_id]
+            for term, freq in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = freq
+
+    def remove(self, doc_id: Hashable):
+        """
+        Remove a document from the index if present.
+
+        Args:
+            doc_id: The document's identifier
+        """
+        with self._lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, Hashable]]:
+        """
+        Find the documents most relevant to a query.
+
+        Args:
+            query: The query text
+            limit: Maximum number of results
+
+        Returns:
+            (score, doc_id) pairs with a positive score, best first
+        """
+        terms = set(tokenize(query))
+        scores: Dict[Hashable, float] = {}
+        with self._lock:
+            doc_count = len(self.doc_terms)
+            if not doc_count:
+                return []
+            avg_length = self.total_length / doc_count or 1.0
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, freq in posting.items():
+                    length = self.doc_lengths[doc_id]
+                    norm = freq * (self.k1 + 1) / (freq + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        return heapq.nlargest(limit, ((score, doc_id) for doc_id, score in scores.items()),
+                              key=lambda item: item[0])
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
@@ -0,0 +1,297 @@
+from typing import Callable, Dict, Iterable, List, Optional, Union
+import importlib
+import os
+import re
+import time
+from utils.response_cache import FILLER_WORDS, normalize_query
+
+_SLOT_RE = re.compile(r"\{(\w+)\}")
+_TRAILING_PUNCTUATION = ".!?,;: "
+# Characters normalize_query would drop that can only belong to a slot value
+# ("ls ~", "read /etc/hosts"), so such commands skip the exact-phrase lookup
+_SLOT_CHARACTERS = re.compile(r"[^\w\s',.!?;:-]")
+
+
+class Intent:
+    """A named command with the phrasings that trigger it and its handler."""
+    __slots__ = ("name", "handler", "patterns", "priority", "validate")
+
+    def __init__(self, name: str, handler: Callable[..., str], priority: int = 0,
+                 validate: Optional[Callable[..., bool]] = None):
+        self.name = name
+        self.handler = handler
+        self.patterns: List[re.Pattern] = []
+        self.priority = priority
+        self.validate = validate
+
+    def accepts(self, slots: Dict[str, str]) -> bool:
+        """Whether the captured slots are plausible values for this intent."""
+        if self.validate is None:
+            return True
+        try:
+            return bool(self.validate(**slots))
+        except Exception:
+            return False
+
+
+class IntentMatch:
+    """An intent matched against a command, with the slot values it captured."""
+    __slots__ = ("intent", "slots")
+
+    def __init__(self, intent: Intent, slots: Dict[str, str]):
+        self.intent = intent
+        self.slots = slots
+
+    def run(self) -> Optional[str]:
+        """
+        Call the intent's handler with the captured slots.
+
+        Returns:
+            The handler's output, or None if it raised: the phrase matched
+            but the command wasn't what the intent handles, so it should go
+            to the LLM instead
+        """
+        try:
+            return str(self.intent.handler(**self.slots))
+        except Exception:
+            return None
+
+
+def compile_phrase(phrase: str) -> re.Pattern:
+    """
+    Compile a command phrase into a regex.
+
+    Words match case-insensitively with any whitespace between them, and
+    "{name}" captures a slot, e.g. "read file {path}".
+
+    Args:
+        phrase: The phrase
+
+    Returns:
+        The compiled pattern, anchored at both ends
+    """
+    parts = []
+    position = 0
+    for slot in _SLOT_RE.finditer(phrase):
+        parts.append(r"\s+".join(re.escape(word) for word in phrase[position:slot.start()].split()))
+        parts.append(f"(?P<{slot.group(1)}>.+?)")
+        position = slot.end()
+    parts.append(r"\s+".join(re.escape(word) for word in phrase[position:].split()))
+    regex = r"\s*".join(part for part in parts if part)
+    regex = regex.replace(r"\s*(?P<", r"\s+(?P<").replace(r">.+?)\s*", r">.+?)\s+")
+    return re.compile(f"^{regex}$", re.IGNORECASE)
+
+
+class IntentRouter:
+    """
+    Deterministic fast path for common commands, ahead of the LLM.
+
+    Phrases without slots are stored under their normalized form (see
+    normalize_query), so "Please, list files!" is a single dict lookup.
+    Phrases with slots are compiled to anchored regexes and indexed by their
+    first word, so a command is only tried against the handful of patterns
+    that could match it. A miss returns None and the command goes to the LLM.
+
+    Handlers are plain callables taking the slots as keyword arguments and
+    returning the text to show; a handler that raises hands the command on
+    to the LLM. An intent's optional validator sees the slots first, so a
+    catch-all phrase like "read {path}" only claims "read notes.txt" when
+    the file exists, not "read me a joke". Plugins are modules with a
+    register(router) function, listed in $RAWWICK_INTENT_PLUGINS or passed
+    to load_plugins().
+    """
+    def __init__(self):
+        """
+        Initialize an empty router.
+        """
+        self.intents: Dict[str, Intent] = {}
+        self._exact: Dict[str, Intent] = {}
+        self._by_first_word: Dict[str, List[tuple]] = {}
+        self._leading_slot: List[tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name: str, phrases: Union[str, Iterable[str]],
+                 handler: Callable[..., str], priority: int = 0,
+                 validate: Optional[Callable[..., bool]] = None) -> Intent:
+        """
+        Register an intent.
+
+        Args:
+            name: Unique intent name (registering it again adds phrases)
+            phrases: Phrase or phrases that trigger it; "{slot}" captures a value
+            handler: Called with the slots as keyword arguments
+            priority: Higher wins when several slot patterns match
+            validate: Called with the slots; a false result (or an
+                      exception) rejects the match
+
+        Returns:
+            The intent
+        """
+        intent = self.intents.get(name)
+        if intent is None:
+            intent = self.intents[name] = Intent(name, handler, priority, validate)
+        else:
+            intent.handler = handler
+            if validate is not None:
+                intent.validate = validate
+        for phrase in [phrases] if isinstance(phrases, str) else phrases:
+            if not _SLOT_RE.search(phrase):
+                self._exact[normalize_query(phrase)] = intent
+                continue
+            pattern = compile_phrase(phrase)
+            intent.patterns.append(pattern)
+            first = phrase.split()[0].lower()
+            bucket = self._leading_slot if _SLOT_RE.fullmatch(first) else self._by_first_word.setdefault(first, [])
+            bucket.append((intent, pattern))
+            bucket.sort(key=lambda entry: -entry[0].priority)
+        return intent
+
+    def intent(self, name: str, *phrases: str, priority: int = 0,
+               validate: Optional[Callable[..., bool]] = None):
+        """
+        Decorator form of register().
+
+            @router.intent("greet", "hello", "hi there")
+            def greet():
+                return "Hello!"
+        """
+        def decorator(handler):
+            self.register(name, phrases, handler, priority, validate)
+            return handler
+        return decorator
+
+    def load_plugins(self, modules: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Import plugin modules and let each register its intents.
+
+        Args:
+            modules: Module names; defaults to the comma-separated
+                     $RAWWICK_INTENT_PLUGINS
+
+        Returns:
+            The names of the plugins that were loaded
+        """
+        if modules is None:
+            modules = [m.strip() for m in os.environ.get("RAWWICK_INTENT_PLUGINS", "").split(",") if m.strip()]
+        loaded = []
+        for name in modules:
+            module = importlib.import_module(name)
+            module.register(self)
+            loaded.append(name)
+        return loaded
+
+    @staticmethod
+    def _strip_fillers(command: str) -> str:
+        words = command.strip().rstrip(_TRAILING_PUNCTUATION).split()
+        while len(words) > 1 and normalize_query(words[0]) in FILLER_WORDS | {""}:
+            words.pop(0)
+        return " ".join(words)
+
+    def match(self, command: str) -> Optional[IntentMatch]:
+        """
+        Find the intent a command asks for.
+
+        Args:
+            command: The spoken or typed command
+
+        Returns:
+            The match, or None if the command should go to the LLM
+        """
+        intent = None if _SLOT_CHARACTERS.search(command) else self._exact.get(normalize_query(command))
+        if intent is not None:
+            self.hits += 1
+            return IntentMatch(intent, {})
+
+        text = self._strip_fillers(command)
+        first = text.split(" ", 1)[0].lower()
+        for intent, pattern in self._by_first_word.get(first, []) + self._leading_slot:
+            found = pattern.match(text)
+            if found:
+                slots = {k: v.strip() for k, v in found.groupdict().items()}
+                if not intent.accepts(slots):
+                    continue
+                self.hits += 1
+                return IntentMatch(intent, slots)
+        self.misses += 1
+        return None
+
+    def route(self, command: str) -> Optional[str]:
+        """
+        Run a command locally if an intent matches it.
+
+        Args:
+            command: The spoken or typed command
+
+        Returns:
+            The handler's output, or None on a miss or a handler error
+        """
+        found = self.match(command)
+        return found.run() if found else None
+
+
+def _cpu_usage() -> str:
+    import psutil
+    per_cpu = psutil.cpu_percent(interval=0.2, percpu=True)
+    return f"CPU usage: {sum(per_cpu) / len(per_cpu):.1f}% ({', '.join(f'{p:.0f}%' for p in per_cpu)})"
+
+
+def _memory_usage() -> str:
+    import psutil
+    memory = psutil.virtual_memory()
+    return (f"Memory: {memory.percent:.1f}% used "
+            f"({memory.used / 2**30:.1f} GiB of {memory.total / 2**30:.1f} GiB)")
+
+
+def _disk_usage(path: str = ".") -> str:
+    import shutil
+    usage = shutil.disk_usage(path)
+    return (f"Disk ({os.path.abspath(path)}): {usage.free / 2**30:.1f} GiB free "
+            f"of {usage.total / 2**30:.1f} GiB")
+
+
+def _existing(path: str, check: Callable[[str], bool]) -> bool:
+    # "ls -la" is a shell command for the LLM, not a directory called "-la"
+    return not path.startswith("-") and check(os.path.expanduser(path))
+
+
+def _local(output: str) -> str:
+    """fs_helpers report failures as text; raise so the command goes to the LLM."""
+    if output.startswith("[red]"):
+        raise OSError(output)
+    return output
+
+
+def register_builtin_intents(router: IntentRouter) -> IntentRouter:
+    """
+    Register the commands that map directly onto local helpers.
+
+    Args:
+        router: The router to add them to
+
+    Returns:
+        The same router
+    """
+    from executors import fs_helpers
+
+    router.register("list_files", ["list files", "show files", "list the files", "what files are here",
+                                   "list directory", "ls"], lambda: _local(fs_helpers.list_dir(".")))
+    router.register("list_files_in", ["list files in {path}", "show files in {path}", "ls {path}"],
+                    lambda path: _local(fs_helpers.list_dir(os.path.expanduser(path))),
+                    validate=lambda path: _existing(path, os.path.isdir))
+    router.register("directory_tree", ["show directory tree", "show the directory tree", "walk directory"],
+                    lambda: fs_helpers.walk_dir("."))
+    router.register("read_file", ["read file {path}", "read {path}", "show contents of {path}",
+                                  "cat {path}"], lambda path: _local(fs_helpers.read_file(os.path.expanduser(path))),
+                    validate=lambda path: _existing(path, os.path.isfile))
+    router.register("current_directory", ["where am i", "current directory", "pwd"], os.getcwd)
+    router.register("time", ["time", "what time is it", "current time", "tell me the time"],
+                    lambda: f"The current time is {time.strftime('%H:%M:%S')}")
+    router.register("date", ["date", "what is the date", "what's the date", "today's date"],
+                    lambda: f"Today is {time.strftime('%A, %d %B %Y')}")
+    router.register("cpu_usage", ["cpu usage", "show cpu usage", "what is the cpu usage"], _cpu_usage)
+    router.register("memory_usage", ["memory usage", "show memory usage", "ram usage", "show ram usage"],
+                    _memory_usage)
+    router.register("disk_usage", ["disk usage", "show disk usage", "free space", "disk space",
+                                   "how much free space"], _disk_usage)
+    return router
@@ -0,0 +1,239 @@
+from collections import deque
+from concurrent.futures import Future, wait
+from typing import Dict, List, Optional
+import heapq
+import itertools
+import queue
+import threading
+import time
+from utils.response_cache import normalize_query
+
+# Lower runs first
+PRIORITY_CONTROL = 0
+PRIORITY_NORMAL = 10
+PRIORITY_EXIT = 20
+
+EXIT_COMMANDS = frozenset({"exit", "quit", "stop"})
+CANCEL_COMMANDS = frozenset({"cancel", "cancel that", "abort", "never mind", "nevermind", "stop that"})
+
+
+class ScheduledCommand:
+    """A command waiting in (or dispatched from) the scheduler."""
+    __slots__ = ("command", "key", "priority", "seq", "submitted", "started", "copies", "future", "task_id")
+
+    def __init__(self, command: str, key: str, priority: int, seq: int, task_id: Optional[str] = None):
+        self.command = command
+        self.task_id = task_id
+        self.key = key
+        self.priority = priority
+        self.seq = seq
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.copies = 1
+        self.future: Optional[Future] = None
+
+    def __lt__(self, other: "ScheduledCommand") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def wait(self) -> Optional[float]:
+        return None if self.started is None else self.started - self.submitted
+
+
+class CommandScheduler:
+    """
+    Priority queue for recognized commands, with coalescing and cancellation.
+
+    Cancel commands ("cancel", "abort", ...) jump ahead of everything else,
+    and on arrival they cancel every queued command and every in-flight one
+    (the Future returned by the processor, e.g. system_agent(), which
+    cancels its LLM stream and kills its shell commands). Exit commands
+    ("exit", "quit", "stop") only stop intake: later commands are refused,
+    the exit itself is dispatched after the work already queued, and
+    nothing running is cancelled. A command identical to one queued or in
+    flight within `coalesce_window` seconds (compared after
+    normalize_query, so "list files" and "please list files" match) is
+    merged into it instead of running again.
+
+    put/get/empty/qsize/task_done mirror queue.Queue, so it drops in where a
+    plain FIFO was used.
+    """
+    def __init__(self, coalesce_window: float = 3.0, wait_samples: int = 1000):
+        """
+        Initialize the scheduler.
+
+        Args:
+            coalesce_window: Seconds within which identical commands are merged
+            wait_samples: Recent queue wait times kept for percentiles
+        """
+        self.coalesce_window = coalesce_window
+        self._heap: List[ScheduledCommand] = []
+        self._queued: Dict[str, ScheduledCommand] = {}
+        self._in_flight: Dict[str, ScheduledCommand] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=wait_samples)
+        self.closed = False
+        self.stats_counts = {"submitted": 0, "dispatched": 0, "coalesced": 0, "refused": 0,
+                             "cancelled_queued": 0, "cancelled_in_flight": 0, "max_depth": 0}
+
+    @staticmethod
+    def is_exit(command: str) -> bool:
+        return command.strip().lower() in EXIT_COMMANDS
+
+    @staticmethod
+    def is_cancel(command: str) -> bool:
+        return normalize_query(command) in CANCEL_COMMANDS or command.strip().lower() in CANCEL_COMMANDS
+
+    def classify(self, command: str) -> int:
+        """Priority for a command: cancels first, then everything else in order, exit last."""
+        if self.is_cancel(command):
+            return PRIORITY_CONTROL
+        return PRIORITY_EXIT if self.is_exit(command) else PRIORITY_NORMAL
+
+    def put(self, command: str, priority: Optional[int] = None,
+            task_id: Optional[str] = None) -> Optional[ScheduledCommand]:
+        """
+        Queue a command.
+
+        Args:
+            command: The command text
+            priority: Overrides classify(); lower runs first
+            task_id: Trace id carried through to the processor
+
+        Returns:
+            The queued entry, or None if it was merged into an identical one
+            or intake was closed by an exit command
+        """
+        priority = self.classify(command) if priority is None else priority
+        if priority == PRIORITY_CONTROL:
+            self.cancel_all()
+        key = normalize_query(command) or command.strip().lower()
+        now = time.monotonic()
+        with self._cond:
+            self.stats_counts["submitted"] += 1
+            if self.closed and priority != PRIORITY_CONTROL:
+                self.stats_counts["refused"] += 1
+                return None
+            if priority == PRIORITY_EXIT:
+                self.closed = True
+            elif priority != PRIORITY_CONTROL:
+                existing = self._queued.get(key) or self._in_flight.get(key)
+                if existing is not None and now - existing.submitted <= self.coalesce_window:
+                    existing.copies += 1
+                    self.stats_counts["coalesced"] += 1
+                    return None
+            entry = ScheduledCommand(command, key, priority, next(self._seq), task_id)
+            heapq.heappush(self._heap, entry)
+            self._queued[key] = entry
+            self.stats_counts["max_depth"] = max(self.stats_counts["max_depth"], len(self._heap))
+            self._cond.notify()
+            return entry
+
+    def get_entry(self, timeout: Optional[float] = None) -> ScheduledCommand:
+        """
+        Take the most urgent command.
+
+        Args:
+            timeout: Seconds to wait; None waits forever
+
+        Returns:
+            The entry
+
+        Raises:
+            queue.Empty: Nothing arrived within the timeout
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._heap, timeout):
+                raise queue.Empty
+            entry = heapq.heappop(self._heap)
+            if self._queued.get(entry.key) is entry:
+                del self._queued[entry.key]
+            entry.started = time.monotonic()
+            self._waits.append(entry.wait)
+            self.stats_counts["dispatched"] += 1
+            return entry
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> str:
+        """queue.Queue-compatible get() returning the command text."""
+        return self.get_entry(timeout if block else 0).command
+
+    def task_done(self):
+        """Accepted for queue.Queue compatibility; completion is tracked via track()."""
+
+    def empty(self) -> bool:
+        with self._cond:
+            return not self._heap
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def track(self, entry: ScheduledCommand, future: Future):
+        """
+        Remember a dispatched command's Future so it can be coalesced with and cancelled.
+
+        Args:
+            entry: The entry returned by get_entry()
+            future: Completes when the command has been processed
+        """
+        if not isinstance(future, Future):
+            return
+        with self._cond:
+            entry.future = future
+            self._in_flight[entry.key] = entry
+
+        def finished(_):
+            with self._cond:
+                if self._in_flight.get(entry.key) is entry:
+                    del self._in_flight[entry.key]
+        future.add_done_callback(finished)
+
+    def cancel_all(self) -> int:
+        """
+        Drop every queued command and cancel every in-flight one.
+
+        Returns:
+            How many commands were cancelled
+        """
+        with self._cond:
+            dropped = len(self._heap)
+            self._heap.clear()
+            self._queued.clear()
+            in_flight = list(self._in_flight.values())
+            self.stats_counts["cancelled_queued"] += dropped
+        cancelled = sum(1 for entry in in_flight if entry.future is not None and entry.future.cancel())
+        with self._cond:
+            self.stats_counts["cancelled_in_flight"] += cancelled
+        return dropped + cancelled
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the in-flight commands to finish.
+
+        Args:
+            timeout: Seconds to wait; None waits forever
+
+        Returns:
+            False if some were still running when the timeout ran out
+        """
+        with self._cond:
+            futures = [entry.future for entry in self._in_flight.values() if entry.future is not None]
+        return not wait(futures, timeout).not_done if futures else True
+
+    def stats(self) -> Dict:
+        """
+        Queue depth, in-flight count, wait-time percentiles and counters.
+
+        Returns:
+            A dictionary of scheduler metrics
+        """
+        with self._cond:
+            waits = sorted(self._waits)
+            report = dict(self.stats_counts, depth=len(self._heap), in_flight=len(self._in_flight))
+
+        def percentile(fraction):
+            return waits[min(len(waits) - 1, int(len(waits) * fraction))] if waits else None
+        report.update(wait_p50=percentile(0.50), wait_p95=percentile(0.95),
+                      wait_max=waits[-1] if waits else None)
+        return report
@@ -0,0 +1,233 @@
+from typing import Dict, List, Optional
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+
+# inotify(7) constants
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class DirectorySnapshot:
+    """Names in a directory, capped at a maximum number of entries."""
+    __slots__ = ("path", "mtime_ns", "files", "dirs", "total_files", "total_dirs")
+
+    def __init__(self, path: str, mtime_ns: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.files: List[str] = []
+        self.dirs: List[str] = []
+        self.total_files = 0
+        self.total_dirs = 0
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.files) < self.total_files or len(self.dirs) < self.total_dirs
+
+    def as_dict(self) -> Dict:
+        return {
+            "current_dir": self.path,
+            "files": list(self.files),
+            "dirs": list(self.dirs),
+            "total_files": self.total_files,
+            "total_dirs": self.total_dirs,
+            "truncated": self.truncated,
+        }
+
+    def summary(self, budget: int = 600) -> str:
+        """
+        Describe the directory for a prompt, within a character budget.
+
+        Args:
+            budget: Maximum length of the summary in characters
+
+        Returns:
+            A short multi-line description of the directory
+        """
+        lines = [f"Working directory: {self.path} ({self.total_dirs} dirs, {self.total_files} files)"]
+        remaining = budget - len(lines[0])
+        for label, names, total in (("Dirs", self.dirs, self.total_dirs), ("Files", self.files, self.total_files)):
+            if not names or remaining <= len(label) + 4:
+                continue
+            shown = []
+            used = len(label) + 2
+            for name in sorted(names):
+                if used + len(name) + 2 > remaining - 16:
+                    break
+                shown.append(name)
+                used += len(name) + 2
+            line = f"{label}: " + ", ".join(shown)
+            if len(shown) < total:
+                line += f" (+{total - len(shown)} more)"
+            lines.append(line)
+            remaining -= len(line) + 1
+        return "\n".join(lines)[:budget]
+
+
+class _Inotify:
+    """Minimal non-blocking inotify watcher for a single directory (Linux only)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wd = -1
+
+    def watch(self, path: str) -> bool:
+        if self.wd >= 0:
+            self._libc.inotify_rm_watch(self.fd, self.wd)
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+        self.wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        return self.wd >= 0
+
+    def read_events(self):
+        """Yield (mask, name) for every pending event."""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                offset += length
+                if wd == self.wd or mask & IN_Q_OVERFLOW:
+                    yield mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WorkspaceScanner:
+    """
+    Cached, incrementally updated snapshot of the working directory.
+
+    A directory is listed with os.scandir, which gets entry types from the
+    directory listing itself instead of a stat per entry. The listing is
+    reused for as long as the directory's mtime doesn't change; on Linux an
+    inotify watch applies additions and removals to the cached listing
+    without rescanning at all. Only the first `max_entries` names are kept.
+    """
+    def __init__(self, max_entries: int = 500, use_inotify: bool = True):
+        """
+        Initialize the scanner.
+
+        Args:
+            max_entries: Maximum number of names kept per snapshot
+            use_inotify: Use inotify for incremental updates where available
+        """
+        self.max_entries = max_entries
+        self._cache: Optional[DirectorySnapshot] = None
+        self._lock = threading.Lock()
+        self._inotify: Optional[_Inotify] = None
+        self._watching = False
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+        self.scans = 0
+        self.incremental_updates = 0
+
+    def _scan(self, path: str, mtime_ns: int) -> DirectorySnapshot:
+        snapshot = DirectorySnapshot(path, mtime_ns)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    snapshot.total_dirs += 1
+                    if len(snapshot.dirs) + len(snapshot.files) < self.max_entries:
+                        snapshot.dirs.append(entry.name)
+                else:
+                    snapshot.total_files += 1
+                    if len(snapshot.dirs) + len(snapshot.files) < self.max_entries:
+                        snapshot.files.append(entry.name)
+        self.scans += 1
+        return snapshot
+
+    def _apply_events(self, snapshot: DirectorySnapshot) -> bool:
+        """Apply pending inotify events; return False if a full rescan is needed."""
+        for mask, name in self._inotify.read_events():
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                return False
+            names = snapshot.dirs if mask & IN_ISDIR else snapshot.files
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if name in names:
+                    continue  # Already picked up by the scan that followed the watch
+                if mask & IN_ISDIR:
+                    snapshot.total_dirs += 1
+                else:
+                    snapshot.total_files += 1
+                if len(snapshot.dirs) + len(snapshot.files) < self.max_entries:
+                    names.append(name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if name in names:
+                    names.remove(name)
+                elif snapshot.truncated is False:
+                    return False
+                if mask & IN_ISDIR:
+                    snapshot.total_dirs -= 1
+                else:
+                    snapshot.total_files -= 1
+            self.incremental_updates += 1
+        return True
+
+    def snapshot(self, path: str) -> DirectorySnapshot:
+        """
+        Get the current listing of a directory.
+
+        Args:
+            path: The directory to describe
+
+        Returns:
+            The (possibly cached) snapshot
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            cached = self._cache
+            if cached is not None and cached.path == path:
+                if self._watching:
+                    if self._apply_events(cached):
+                        return cached
+                else:
+                    try:
+                        if os.stat(path).st_mtime_ns == cached.mtime_ns:
+                            return cached
+                    except OSError:
+                        pass
+
+            # Watch before scanning so no change between the two is missed
+            self._watching = bool(self._inotify and self._inotify.watch(path))
+            if self._watching:
+                list(self._inotify.read_events())
+            self._cache = self._scan(path, os.stat(path).st_mtime_ns)
+            return self._cache
+
+    def close(self):
+        """
+        Release the inotify watch, if any.
+        """
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+            self._watching = False
@@ -1,11 +1,11 @@
 # Example: Using RawWick with custom command handling
 
 from Listen import ContinuousListener
-from core.agent import TaskExecutor
 from models.groq import GroqModel
 from executors.rawwick_executor import RawWickExecutor
 from utils.cache import FixCache
 from core.context_manager import ContextManager
+from core.intent_router import IntentRouter, register_builtin_intents
 import time
 import os
 
@@ -16,11 +16,11 @@ def custom_command_example():
     This example shows how to:
     1. Create a custom TaskExecutor instance
     2. Add pre-processing for commands
-    3. Handle specific commands directly without AI
+    3. Handle specific commands directly without AI, through an IntentRouter
     """
     print("\n===== RawWick Custom Commands Example =====\n")
     print("This example shows how to handle custom commands.")
-    print("Try saying 'hello', 'time', or any other command.")
+    print("Try saying 'hello', 'time', 'list files', 'read file README.md', or any other command.")
     print("Say 'exit' or press Ctrl+C to quit.\n")
     
     # Create a custom command processor
@@ -45,19 +45,31 @@ def custom_command_example():
                 fix_cache=self.cache,
                 context_manager=self.context_manager
             )
+            
+            # Local handlers: the built-ins (files, time, cpu, ...) plus our own
+            self.router = register_builtin_intents(IntentRouter())
+            
+            @self.router.intent("hello", "hello", "hi", "hey rawwick")
+            def hello():
+                return "👋 Hello! I'm RawWick, your voice assistant."
+            
+            @self.router.intent("time", "time", "what time is it")
+            def current_time():
+                return f"🕒 The current time is {time.strftime('%H:%M:%S', time.localtime())}"
+            
+            @self.router.intent("make_dir", "create folder {name}", "make directory {name}")
+            def make_dir(name):
+                os.makedirs(name, exist_ok=True)
+                return f"📁 Created {name}"
         
         def process_command(self, command):
             # Pre-process the command
             command = command.strip().lower()
             
             # Handle custom commands directly
-            if command == "hello":
-                print("👋 Hello! I'm RawWick, your voice assistant.")
-                return
-                
-            elif command == "time":
-                current_time = time.strftime("%H:%M:%S", time.localtime())
-                print(f"🕒 The current time is {current_time}")
+            output = self.router.route(command)
+            if output is not None:
+                print(output)
                 return
             
             # For all other commands, use the AI executor
@@ -66,7 +78,8 @@ def custom_command_example():
             # Update workspace context
             self.context_manager.update_workspace_state(os.getcwd())
             
-            # Process with AI
+            # Process with AI. The executor is asyncio-based; from a plain
+            # thread like this one, process() runs aprocess() and waits for it
             try:
                 response = self.ai.chat(command)
                 self.executor.process(response)
@@ -99,7 +112,9 @@ def custom_command_example():
         # Always stop the listener properly
         if listener:
             listener.stop_listening()
-            print("✅ Listener stopped. Example complete.")
+        # Stop the Python worker processes and the executor's event loop
+        processor.executor.shutdown()
+        print("✅ Listener stopped. Example complete.")
 
 if __name__ == "__main__":
     custom_command_example()
\ No newline at end of file
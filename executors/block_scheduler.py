@@ -0,0 +1,174 @@
+from typing import Awaitable, Callable, List, Set
+import ast
+import asyncio
+import os
+import re
+import shlex
+
+# Operations that change state other blocks may observe
+MUTATION_RE = re.compile(
+    r"open\([^)]*['\"][wax+]|write_file|\.write\(|mkdir|makedirs|rmdir|remove\(|unlink|rename|"
+    r"shutil\.(copy|move|rmtree)|subprocess|os\.system"
+)
+SHELL_MUTATION_RE = re.compile(
+    r"mkdir|rmdir|\btouch\b|\bcp\b|\bmv\b|\brm\b|\bdel\b|\bcopy\b|\bmove\b|\bren\b|"
+    r"(^|[^2&])>|\btee\b|\bchmod\b|\bchown\b|\bln\b|\bsed\s+-i"
+)
+# Operations that change process-wide state, so nothing may run beside them
+BARRIER_RE = re.compile(
+    r"\bcd\b|chdir|os\.environ|\bexport\b|\bsetx\b|\bset\s+\w+=|pip\s+install|apt(-get)?\s|brew\s|"
+    r"\bkill\b|taskkill|systemctl|\bservice\b|reg\s+add|winreg"
+)
+
+
+class BlockFootprint:
+    """What a code block touches, as far as can be told from its source."""
+    __slots__ = ("resources", "mutating", "barrier")
+
+    def __init__(self, resources: Set[str], mutating: bool, barrier: bool):
+        self.resources = resources
+        self.mutating = mutating
+        self.barrier = barrier
+
+
+def _python_resources(code: str) -> Set[str]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    return {
+        node.value for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip()
+    }
+
+
+def _shell_resources(code: str) -> Set[str]:
+    resources = set()
+    for line in code.splitlines():
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError:
+            words = line.split()
+        # Skip the command name and flags; what's left are mostly paths and names
+        resources.update(w for w in words[1:] if not w.startswith("-"))
+    return resources
+
+
+def _normalize_path(resource: str) -> str:
+    return os.path.normpath(os.path.expanduser(resource.strip())).replace("\\", "/")
+
+
+def _related(a: str, b: str) -> bool:
+    """Whether two normalized resources are the same path or one contains the other."""
+    if a == b:
+        return True
+    # "." contains every relative path
+    if "." in (a, b):
+        other = b if a == "." else a
+        return not os.path.isabs(other)
+    return a.startswith(b.rstrip("/") + "/") or b.startswith(a.rstrip("/") + "/")
+
+
+def analyze_block(code: str, lang: str) -> BlockFootprint:
+    """
+    Work out what a block reads and changes.
+
+    Args:
+        code: The block's source
+        lang: "python" or "bash"
+
+    Returns:
+        The block's footprint
+    """
+    resources = _python_resources(code) if lang == "python" else _shell_resources(code)
+    resources = {_normalize_path(resource) for resource in resources}
+    pattern = MUTATION_RE if lang == "python" else SHELL_MUTATION_RE
+    mutating = bool(pattern.search(code))
+    # A mutation whose target can't be identified could affect anything
+    barrier = bool(BARRIER_RE.search(code)) or (mutating and not resources)
+    return BlockFootprint(resources, mutating, barrier)
+
+
+def depends_on(later: BlockFootprint, earlier: BlockFootprint) -> bool:
+    """
+    Decide whether a block must wait for an earlier one.
+
+    Args:
+        later: Footprint of the block being scheduled
+        earlier: Footprint of a block that came before it
+
+    Returns:
+        True if running them concurrently could change the outcome
+    """
+    if later.barrier or earlier.barrier:
+        return True
+    if not (later.mutating or earlier.mutating):
+        return False
+    # A block naming nothing ("ls", os.listdir()) may look at whatever was changed
+    if not (later.resources and earlier.resources):
+        return True
+    # Same path, or a directory and a path inside it: os.makedirs("out")
+    # must finish before open("out/a.txt", "w")
+    return any(_related(a, b) for a in later.resources for b in earlier.resources)
+
+
+class AsyncBlockScheduler:
+    """
+    Runs a response's code blocks concurrently where it is safe to.
+
+    Blocks are submitted in response order. Each one is an asyncio task that
+    waits only for the tasks of the earlier blocks it depends on (shared
+    files, working directory, environment, installs...), so independent
+    steps such as "check disk, check network, list processes" run side by
+    side, up to a concurrency limit. Results are collected per block, so
+    callers can still report them in the original order.
+    """
+    def __init__(self, run: Callable[[int, str, str], Awaitable[str]], max_concurrency: int = 3):
+        """
+        Initialize the scheduler. Must be created on the event loop it runs on.
+
+        Args:
+            run: Coroutine function executing one block, called as run(index, code, lang)
+                 with the block's 1-based position in the response
+            max_concurrency: Maximum number of blocks running at once
+        """
+        self.run = run
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._footprints: List[BlockFootprint] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, code: str, lang: str) -> asyncio.Task:
+        """
+        Schedule a block behind the earlier blocks it depends on.
+
+        Args:
+            code: The block's source
+            lang: "python" or "bash"
+
+        Returns:
+            A task resolving to the block's output
+        """
+        footprint = analyze_block(code, lang)
+        index = len(self._tasks) + 1
+        deps = [
+            task for earlier, task in zip(self._footprints, self._tasks)
+            if depends_on(footprint, earlier)
+        ]
+
+        async def task():
+            if deps:
+                await asyncio.wait(deps)
+            async with self._slots:
+                return await self.run(index, code, lang)
+
+        scheduled = asyncio.ensure_future(task())
+        self._footprints.append(footprint)
+        self._tasks.append(scheduled)
+        return scheduled
+
+    def cancel(self):
+        """
+        Cancel blocks that haven't finished.
+        """
+        for task in self._tasks:
+            task.cancel()
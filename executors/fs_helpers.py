@@ -0,0 +1,49 @@
+import os
+
+
+def read_file(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        return f"[red]Failed to read file:[/red] {e}"
+
+
+def write_file(path: str, content: str) -> str:
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return f"[green]Successfully wrote to file:[/green] {path}"
+    except Exception as e:
+        return f"[red]Failed to write to file:[/red] {e}"
+
+
+def list_dir(path=".") -> str:
+    try:
+        files = os.listdir(path)
+        return "\n".join(files)
+    except Exception as e:
+        return f"[red]Failed to list directory:[/red] {e}"
+
+
+def walk_dir(root=".") -> str:
+    output = []
+    try:
+        for dirpath, dirs, files in os.walk(root):
+            output.append(f"[bold]{dirpath}[/bold]")
+            for f in files:
+                output.append(f"  └── {f}")
+        return "\n".join(output)
+    except Exception as e:
+        return f"[red]Failed to walk directory:[/red] {e}"
+
+
+# Names exposed to generated filesystem snippets
+FS_HELPERS = {
+    "read_file": read_file,
+    "write_file": write_file,
+    "list_dir": list_dir,
+    "walk_dir": walk_dir,
+    "os": os,
+    "open": open,
+}
@@ -1,29 +1,109 @@
-from typing import List
 from rich.console import Console
 from rich.markdown import Markdown
-import re, os, webbrowser, io, subprocess
-from contextlib import redirect_stdout, redirect_stderr
-from typing import List, Dict, Optional
+import re, os, webbrowser, subprocess, threading
+import shlex
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from rich.syntax import Syntax
 from rich.panel import Panel
 from rich.table import Table
-import psutil
 import platform
 import signal
 from datetime import datetime
+from executors import fs_helpers
+from executors.worker_pool import PythonWorkerPool, WorkerResult, is_gui_app
+from executors.block_scheduler import AsyncBlockScheduler
+from typing import AsyncIterable, AsyncIterator
+import asyncio
+import time
+import weakref
+from utils import tracing
+from utils.tracing import tracer
+
+if TYPE_CHECKING:
+    import psutil
+
+
+class CodeBlockStreamParser:
+    """
+    Incremental parser for fenced code blocks in a streamed response.
+
+    Text is fed in arbitrary chunks as it arrives from the model. Each block
+    is returned as soon as its closing fence has been seen, so it can be
+    executed while the rest of the answer is still being generated.
+    """
+    FENCE = "```"
+
+    def __init__(self):
+        self._buffer = ""
+        self._info: Optional[str] = None  # Info string of the open block, None when outside one
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Consume a chunk of response text.
+
+        Args:
+            chunk: The next piece of the response
+
+        Returns:
+            (code, info) for every block closed by this chunk, where info is
+            the language tag after the opening fence (possibly empty)
+        """
+        self._buffer += chunk
+        blocks = []
+        while True:
+            if self._info is None:
+                start = self._buffer.find(self.FENCE)
+                if start == -1:
+                    # Keep a possible partial fence at the end of the buffer
+                    self._buffer = self._buffer[-(len(self.FENCE) - 1):]
+                    break
+                newline = self._buffer.find("\n", start + len(self.FENCE))
+                if newline == -1:
+                    self._buffer = self._buffer[start:]
+                    break
+                self._info = self._buffer[start + len(self.FENCE):newline].strip().lower()
+                self._buffer = self._buffer[newline + 1:]
+            else:
+                end = self._buffer.find(self.FENCE)
+                if end == -1:
+                    break
+                blocks.append((self._buffer[:end], self._info))
+                self._buffer = self._buffer[end + len(self.FENCE):]
+                self._info = None
+        return blocks
+
 
 class RawWickExecutor:
-    def __init__(self, ai, fix_cache, context_manager):
+    # Seconds a launched desktop app gets to fail before it counts as started
+    LAUNCH_GRACE = 2.0
+
+    def __init__(self, ai, fix_cache, context_manager, worker_pool: Optional[PythonWorkerPool] = None,
+                 execution_timeout: float = 30.0, block_concurrency: int = 3,
+                 fix_deadline: float = 30.0, race_candidates: int = 1,
+                 max_concurrent_executions: int = 8):
         self.console = Console()
         self.console.ask_ai = ai
         self.cache = fix_cache
         self.confirm = False
         self.context_manager = context_manager
-        self.running_processes: Dict[str, psutil.Process] = {}
+        self.running_processes: Dict[str, "psutil.Process"] = {}
         self.last_execution_stats = {}
-
-    def extract_code_blocks(self, text: str) -> List[str]:
-        return re.findall(r"```(?:python|bash)?\n(.*?)```", text, re.DOTALL)
+        self.execution_timeout = execution_timeout
+        self.block_concurrency = block_concurrency
+        self.fix_deadline = fix_deadline
+        self.race_candidates = race_candidates
+        self._worker_pool = worker_pool
+        self._pool_lock = threading.Lock()
+        # Async path: limit on blocks executing at once across all commands, per event loop
+        self.max_concurrent_executions = max_concurrent_executions
+        self._execution_limits = weakref.WeakKeyDictionary()
+        # Event loop the blocking API runs its coroutines on, started on first use
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def extract_code_blocks(text: str) -> List[str]:
+        # Same fence grammar as streamed responses, so both run the same blocks
+        return [code for code, _ in CodeBlockStreamParser().feed(text)]
 
     def detect_and_open_links(self, text: str) -> None:
         links = re.findall(r"https?://\S+", text)
@@ -32,98 +112,106 @@ class RawWickExecutor:
             self.console.print(f"[bold green]Opened URL:[/bold green] {url}")
 
     def read_file(self, path: str) -> str:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        except Exception as e:
-            return f"[red]Failed to read file:[/red] {e}"
+        return fs_helpers.read_file(path)
 
     def write_file(self, path: str, content: str) -> str:
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(content)
-            return f"[green]Successfully wrote to file:[/green] {path}"
-        except Exception as e:
-            return f"[red]Failed to write to file:[/red] {e}"
+        return fs_helpers.write_file(path, content)
 
     def list_dir(self, path=".") -> str:
-        try:
-            files = os.listdir(path)
-            return "\n".join(files)
-        except Exception as e:
-            return f"[red]Failed to list directory:[/red] {e}"
+        return fs_helpers.list_dir(path)
 
     def walk_dir(self, root=".") -> str:
-        output = []
-        try:
-            for dirpath, dirs, files in os.walk(root):
-                output.append(f"[bold]{dirpath}[/bold]")
-                for f in files:
-                    output.append(f"  └── {f}")
-            return "\n".join(output)
-        except Exception as e:
-            return f"[red]Failed to walk directory:[/red] {e}"
+        return fs_helpers.walk_dir(root)
 
     def is_filesystem_task(self, code: str) -> bool:
         return any(kw in code for kw in ["open(", "os.listdir", "os.walk", "read(", "write("])
 
-    def handle_filesystem_task(self, code: str) -> str:
-        local_vars = {
-            "read_file": self.read_file,
-            "write_file": self.write_file,
-            "list_dir": self.list_dir,
-            "walk_dir": self.walk_dir,
-            "os": os,
-            "open": open,
+    @property
+    def worker_pool(self) -> PythonWorkerPool:
+        """Worker processes for generated code, started on first use."""
+        with self._pool_lock:
+            if self._worker_pool is None:
+                self._worker_pool = PythonWorkerPool(timeout=self.execution_timeout)
+            return self._worker_pool
+
+    def _record_execution(self, lang: str, elapsed: float, success: bool, memory_used: int = 0):
+        """Remember the most recent run for display_execution_stats()."""
+        self.last_execution_stats = {
+            "execution_time": elapsed,
+            "memory_used": memory_used,
+            "success": success,
+            "lang": lang,
+            "task_id": tracing.current_task_id(),
         }
-        try:
-            stdout, stderr = io.StringIO(), io.StringIO()
-            with redirect_stdout(stdout), redirect_stderr(stderr):
-                exec(code, {}, local_vars)
-            return stdout.getvalue() or "(Filesystem task executed)"
-        except Exception as e:
-            return f"[red]Filesystem Error:[/red] {e}"
 
-    def execute_python(self, code: str) -> str:
-        stdout, stderr = io.StringIO(), io.StringIO()
+    def _run_in_worker(self, code: str, label: str, timeout: Optional[float] = None,
+                       fs: bool = False, cancel: Optional[threading.Event] = None) -> Tuple[str, WorkerResult]:
+        result = self.worker_pool.run(code, timeout=timeout, fs_helpers=fs, cancel=cancel)
+        self._record_execution("python", result.elapsed, result.ok, result.memory_used)
+        if result.timed_out or result.cancelled:
+            return f"[red]{result.error}[/red]", result
+        if not result.ok:
+            return f"[red]{label} Error:[/red] {result.error}\n{result.stderr}", result
+        return result.stdout, result
+
+    def handle_filesystem_task(self, code: str, timeout: Optional[float] = None,
+                               cancel: Optional[threading.Event] = None) -> str:
+        output, _ = self._run_in_worker(code, "Filesystem", timeout=timeout, fs=True, cancel=cancel)
+        return output or "(Filesystem task executed)"
+
+    def execute_python(self, code: str, timeout: Optional[float] = None,
+                       cancel: Optional[threading.Event] = None) -> str:
+        output, _ = self._run_in_worker(code, "Python", timeout=timeout, cancel=cancel)
+        return output or "(Python code executed)"
+
+    @staticmethod
+    def is_gui_launch(code: str) -> bool:
+        """Whether a shell block just opens a desktop app ("notepad", "start chrome", "xdg-open x.pdf")."""
+        lines = [line for line in code.strip().splitlines() if line.strip() and not line.lstrip().startswith("#")]
+        if len(lines) != 1:
+            return False
         try:
-            with redirect_stdout(stdout), redirect_stderr(stderr):
-                exec(code, {})
-        except Exception as e:
-            return f"[red]Python Error:[/red] {e}\n{stderr.getvalue()}"
-        return stdout.getvalue() or "(Python code executed)"
-
-    def execute_shell(self, code: str) -> str:
+            words = shlex.split(lines[0], posix=os.name != "nt")
+        except ValueError:
+            words = lines[0].split()
+        return bool(words) and is_gui_app(words[0]) and not any(op in lines[0] for op in ("|", ">", "&&", ";"))
+
+    def _launched(self, code: str, returncode: Optional[int], start: float) -> str:
+        ok = returncode in (None, 0)
+        self._record_execution("bash", time.perf_counter() - start, ok)
+        if not ok:
+            return f"[red]Shell Error:[/red] {code.strip()} exited with code {returncode}"
+        return f"(Launched: {code.strip()})"
+
+    def execute_shell(self, code: str, timeout: Optional[float] = None) -> str:
+        if self.is_gui_launch(code):
+            return self._run_sync(self.alaunch_detached(code))
+        start = time.perf_counter()
         try:
-            result = subprocess.run(code, shell=True, capture_output=True, text=True)
+            result = subprocess.run(code, shell=True, capture_output=True, text=True,
+                                    timeout=timeout or self.execution_timeout)
+            self._record_execution("bash", time.perf_counter() - start, result.returncode == 0)
             return result.stdout or result.stderr or "(Shell command executed)"
+        except subprocess.TimeoutExpired as e:
+            self._record_execution("bash", time.perf_counter() - start, False)
+            return f"[red]Shell Error:[/red] command timed out after {e.timeout} seconds"
         except Exception as e:
+            self._record_execution("bash", time.perf_counter() - start, False)
             return f"[red]Shell Error:[/red] {e}"
 
+    def shutdown(self):
+        with self._pool_lock:
+            if self._worker_pool is not None:
+                self._worker_pool.shutdown()
+                self._worker_pool = None
+            if self._sync_loop is not None:
+                self._sync_loop.call_soon_threadsafe(self._sync_loop.stop)
+                self._sync_loop = None
+
     def execute_with_timeout(self, code: str, timeout: int = 30) -> str:
         """Execute code with timeout and resource monitoring."""
-        start_time = datetime.now()
-        start_memory = psutil.Process().memory_info().rss
-
-        try:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(self.execute_python, code)
-                result = future.result(timeout=timeout)
-
-            end_time = datetime.now()
-            end_memory = psutil.Process().memory_info().rss
-            execution_time = (end_time - start_time).total_seconds()
-            memory_used = end_memory - start_memory
-
-            self.last_execution_stats = {
-                "execution_time": execution_time,
-                "memory_used": memory_used,
-                "success": True
-            }
-
-            return result
-        except TimeoutError:
-            return f"[red]Execution timed out after {timeout} seconds[/red]"
+        output, _ = self._run_in_worker(code, "Python", timeout=timeout)
+        return output or "(Python code executed)"
 
     def smart_execute(self, code: str, lang: str) -> str:
         """Smart execution with context awareness and error prevention."""
@@ -181,46 +269,368 @@ class RawWickExecutor:
 
         self.console.print(table)
 
-    def process(self, response: str):
-        self.console.print(Markdown(f"**AI Response:**\n\n{response}"))
-        self.detect_and_open_links(response)
+    def detect_language(self, code: str, info: str = "") -> str:
+        if info in ("python", "py"):
+            return "python"
+        if info in ("bash", "sh", "shell", "cmd", "powershell"):
+            return "bash"
+        return "python" if "import " in code or "def " in code else "bash"
 
-        code_blocks = self.extract_code_blocks(response)
-        for i, code in enumerate(code_blocks, 1):
-            lang = "python" if "import " in code or "def " in code else "bash"
-            output = self.run_with_retry(code, lang, max_retries=3)
-            self.console.print(Markdown(f"**Final Output (after fix attempts) #{i}:**\n```\n{output}\n```"))
+    def report_output(self, index: int, output: str):
+        self.console.print(Markdown(f"**Final Output (after fix attempts) #{index}:**\n```\n{output}\n```"))
 
-    def run_with_retry(self, code: str, lang: str, max_retries=3) -> str:
-        original_code = code.strip()
-        if fixed := self.cache.get(original_code):
-            code = fixed
+    @staticmethod
+    def is_error_output(output: str) -> bool:
+        return "Error:" in output or "[red]" in output
 
-        for attempt in range(1, max_retries + 1):
+    def _execute(self, code: str, lang: str, timeout: Optional[float] = None,
+                 cancel: Optional[threading.Event] = None) -> str:
+        with tracer.span("execution_attempt", lang=lang) as span:
             if self.is_filesystem_task(code):
-                output = self.handle_filesystem_task(code)
+                output = self.handle_filesystem_task(code, timeout, cancel)
+            elif lang == "python":
+                output = self.execute_python(code, timeout, cancel)
             else:
-                output = self.execute_python(code) if lang == "python" else self.execute_shell(code)
+                output = self.execute_shell(code, timeout)
+            span.attrs["ok"] = not self.is_error_output(output)
+            return output
+
+    def _cached_candidates(self, original_code: str, lang: str) -> Iterator[str]:
+        """Cached fixes recorded for snippets that only look like this one.
+
+        First the fix for a structurally identical snippet, then the fix for
+        the most similar one. They may carry the other snippet's literals,
+        so they're only tried after the block itself has failed and only
+        cached for it once they run cleanly.
+        """
+        for stage, lookup in (("fix_cache_structural", self.cache.structural),
+                              ("fix_cache_similar", self.cache.similar)):
+            with tracer.span(stage) as span:
+                candidate = lookup(original_code, lang)
+                span.attrs["hit"] = candidate is not None
+            if candidate:
+                yield candidate
+
+    # --- asyncio path -----------------------------------------------------
+    # The agent core runs responses here: shell commands run as asyncio
+    # subprocesses, AI calls go through achat(), and racing or cancelled
+    # work is actually cancelled rather than abandoned. The blocking API
+    # (process, run_with_retry, ...) at the end wraps these coroutines.
+
+    def _execution_slot(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._pool_lock:
+            slot = self._execution_limits.get(loop)
+            if slot is None:
+                slot = self._execution_limits[loop] = asyncio.Semaphore(self.max_concurrent_executions)
+            return slot
+
+    @staticmethod
+    def _kill_process_tree(process):
+        try:
+            if os.name == "nt":
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def alaunch_detached(self, code: str) -> str:
+        """
+        Start a desktop app without waiting for it to close.
+
+        The execution timeout doesn't apply: the app keeps running in its
+        own session, and only a failure within LAUNCH_GRACE is an error.
+        """
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_shell(
+                code, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL, start_new_session=os.name != "nt",
+            )
+        except Exception as e:
+            return f"[red]Shell Error:[/red] {e}"
+        try:
+            return self._launched(code, await asyncio.wait_for(process.wait(), self.LAUNCH_GRACE), start)
+        except asyncio.TimeoutError:
+            return self._launched(code, None, start)
+
+    async def execute_shell_async(self, code: str, timeout: Optional[float] = None) -> str:
+        if self.is_gui_launch(code):
+            return await self.alaunch_detached(code)
+        timeout = timeout or self.execution_timeout
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_shell(
+                code, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name != "nt",
+            )
+        except Exception as e:
+            return f"[red]Shell Error:[/red] {e}"
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            self._kill_process_tree(process)
+            await process.wait()
+            self._record_execution("bash", time.perf_counter() - start, False)
+            return f"[red]Shell Error:[/red] command timed out after {timeout} seconds"
+        except asyncio.CancelledError:
+            self._kill_process_tree(process)
+            raise
+        self._record_execution("bash", time.perf_counter() - start, process.returncode == 0)
+        return (stdout.decode(errors="replace") or stderr.decode(errors="replace")
+                or "(Shell command executed)")
+
+    async def _execute_async(self, code: str, lang: str, timeout: Optional[float] = None) -> str:
+        async with self._execution_slot():
+            if lang != "python" and not self.is_filesystem_task(code):
+                with tracer.span("execution_attempt", lang=lang) as span:
+                    output = await self.execute_shell_async(code, timeout)
+                    span.attrs["ok"] = not self.is_error_output(output)
+                    return output
+            # Python runs in the worker pool, whose protocol is blocking pipe I/O;
+            # cancelling the thread isn't possible, so the event kills the worker
+            cancel = threading.Event()
+            try:
+                return await asyncio.to_thread(self._execute, code, lang, timeout, cancel)
+            except asyncio.CancelledError:
+                cancel.set()
+                raise
+
+    async def arun_block(self, index: int, code: str, lang: str,
+                         on_stage: Optional[Callable[[str], None]] = None) -> str:
+        stage = (lambda name: on_stage(f"#{index} {name}")) if on_stage else None
+        return await self.arun_with_retry(code, lang, on_stage=stage)
+
+    def _async_scheduler(self, on_stage: Optional[Callable[[str], None]]) -> AsyncBlockScheduler:
+        return AsyncBlockScheduler(
+            lambda index, code, lang: self.arun_block(index, code, lang, on_stage=on_stage),
+            max_concurrency=self.block_concurrency,
+        )
+
+    async def _areport_ready(self, tasks: List[asyncio.Task], outputs: List[str], block: bool = False):
+        """Report finished blocks in response order, stopping at the first one still running."""
+        while len(outputs) < len(tasks):
+            task = tasks[len(outputs)]
+            if not (block or task.done()):
+                break
+            outputs.append(await task)
+            self.report_output(len(outputs), outputs[-1])
+
+    async def aprocess(self, response: str, on_stage: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Run a response's code blocks, concurrently where safe, and report them in order."""
+        self.console.print(Markdown(f"**AI Response:**\n\n{response}"))
+        self.detect_and_open_links(response)
 
-            if "Error:" not in output and "[red]" not in output:
+        scheduler = self._async_scheduler(on_stage)
+        tasks, outputs = [], []
+        with tracer.span("code_extraction") as span:
+            code_blocks = CodeBlockStreamParser().feed(response)
+            span.attrs["blocks"] = len(code_blocks)
+        try:
+            for i, (code, info) in enumerate(code_blocks, 1):
+                if on_stage:
+                    on_stage(f"code extracted #{i}")
+                tasks.append(scheduler.submit(code, self.detect_language(code, info)))
+            await self._areport_ready(tasks, outputs, block=True)
+        finally:
+            scheduler.cancel()
+        return outputs
+
+    async def aprocess_stream(self, chunks: AsyncIterable[str],
+                              on_stage: Optional[Callable[[str], None]] = None) -> Tuple[str, List[str]]:
+        """Execute code blocks from a streamed response as soon as each one closes."""
+        parser = CodeBlockStreamParser()
+        scheduler = self._async_scheduler(on_stage)
+        started = time.perf_counter()
+        parts = []
+        tasks, outputs = [], []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                for code, info in parser.feed(chunk):
+                    lang = self.detect_language(code, info)
+                    if on_stage:
+                        on_stage(f"code extracted #{len(tasks) + 1}")
+                    # Time from the start of the response until this block closed
+                    tracer.record("code_block_ready", time.perf_counter() - started, block=len(tasks) + 1, lang=lang)
+                    self.console.print(Syntax(code, lang, theme="ansi_dark"))
+                    tasks.append(scheduler.submit(code, lang))
+                await self._areport_ready(tasks, outputs)
+            await self._areport_ready(tasks, outputs, block=True)
+        finally:
+            scheduler.cancel()
+
+        response = "".join(parts)
+        if not tasks:
+            self.console.print(Markdown(f"**AI Response:**\n\n{response}"))
+        self.detect_and_open_links(response)
+        return response, outputs
+
+    async def arun_with_retry(self, code: str, lang: str, max_retries: Optional[int] = None,
+                              on_stage: Optional[Callable[[str], None]] = None,
+                              deadline: Optional[float] = None) -> str:
+        """Run a block, fixing it with the AI until it works or the deadline passes.
+
+        The fix budget is wall-clock time (deadline seconds, default
+        fix_deadline) counted from the first failure, so a slow first run
+        doesn't leave no time for fixes; max_retries optionally caps the
+        number of attempts as well. With race_candidates > 1 each round asks
+        for several fixes at once and keeps the first that works.
+        """
+        original_code = code.strip()
+        with tracer.span("fix_cache_lookup") as lookup:
+            cached_fix = self.cache.get(original_code, lang)
+            lookup.attrs["hit"] = cached_fix is not None
+        if cached_fix:
+            code = cached_fix
+        candidates = self._cached_candidates(original_code, lang)
+        budget = self.fix_deadline if deadline is None else deadline
+        expires = None  # Set when the first attempt fails
+        remaining = lambda: budget if expires is None else expires - time.monotonic()
+
+        attempt = 1
+        while True:
+            if on_stage:
+                on_stage(f"execution attempt {attempt}")
+            output = await self._execute_async(code, lang, timeout=max(1.0, min(self.execution_timeout, remaining())))
+            if not self.is_error_output(output):
                 if original_code != code:
-                    self.cache.add(original_code, code)
+                    self.cache.add(original_code, code, lang)
                 return output
+            if expires is None:
+                expires = time.monotonic() + budget
+            if cached_fix and attempt == 1:
+                self.cache.invalidate(original_code, cached_fix, lang)
+            if remaining() <= 0 or (max_retries is not None and attempt >= max_retries):
+                break
+
+            candidate = next((c for c in candidates if c.strip() != code.strip()), None)
+            if candidate:
+                self.console.print(f"[yellow]Attempt {attempt} failed. Trying a cached fix for similar code...[/yellow]")
+                code = candidate
+                attempt += 1
+                continue
+
+            if self.race_candidates > 1:
+                self.console.print(f"[yellow]Attempt {attempt} failed. Racing {self.race_candidates} fixes...[/yellow]")
+                if on_stage:
+                    on_stage(f"racing {self.race_candidates} fixes")
+                fixed, output = await self._arace_fixes(original_code, lang, output, remaining)
+                attempt += self.race_candidates
+                if fixed is not None:
+                    self.cache.add(original_code, fixed, lang)
+                    return output
+                if remaining() <= 0 or (max_retries is not None and attempt >= max_retries):
+                    break
+                continue
 
             self.console.print(f"[yellow]Attempt {attempt} failed. Trying to fix the code...[/yellow]")
-            code = self.fix_code_with_ai(original_code, output)
-
-        return f"[red]❌ All attempts failed after {max_retries} retries.[/red]\nLast error:\n{output}"
+            if on_stage:
+                on_stage("fixing")
+            code = await self.afix_code_with_ai(original_code, output)
+            attempt += 1
+
+        return f"[red]❌ All attempts failed after {attempt} attempts.[/red]\nLast error:\n{output}"
+
+    async def _arace_fixes(self, original_code: str, lang: str, error: str,
+                           remaining: Callable[[], float]) -> Tuple[Optional[str], str]:
+        """Request several fixes concurrently and return the first that runs cleanly.
+
+        Candidates use increasing temperatures so they differ, and each one
+        is validated in its own sandboxed worker; losers are cancelled.
+        Returns (fix, output), or (None, last_error) if no candidate
+        succeeded before the deadline.
+        """
+        temperatures = [min(1.0, 0.2 + 0.3 * i) for i in range(self.race_candidates)]
+
+        async def candidate(temperature: float) -> Tuple[str, str]:
+            fix = await self.afix_code_with_ai(original_code, error, temperature=temperature)
+            return fix, await self._execute_async(fix, lang, timeout=max(1.0, min(self.execution_timeout, remaining())))
+
+        tasks = [asyncio.ensure_future(candidate(t)) for t in temperatures]
+        pending, last_error = set(tasks), error
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, remaining()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break  # The race deadline
+                for task in done:
+                    try:
+                        fix, output = task.result()
+                    except Exception as e:
+                        # Includes a candidate's own execution timeout
+                        last_error = f"[red]Fix Error:[/red] {str(e) or type(e).__name__}"
+                        continue
+                    if not self.is_error_output(output):
+                        return fix, output
+                    last_error = output
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None, last_error
+
+    async def afix_code_with_ai(self, broken_code: str, error: str, temperature: Optional[float] = None) -> str:
+        with tracer.span("fix_request", temperature=temperature):
+            reply = await self.console.ask_ai.achat(self._fix_prompt(broken_code, error), scratch=True,
+                                                    temperature=temperature)
+        matches = self.extract_code_blocks(reply)
+        return matches[0] if matches else broken_code
 
-    def fix_code_with_ai(self, broken_code: str, error: str) -> str:
-        prompt = (
+    @staticmethod
+    def _fix_prompt(broken_code: str, error: str) -> str:
+        return (
             "Fix this code. Don't explain. Only return valid, working code block. "
             f"The code:\n```python\n{broken_code}\n```\n"
             f"The error was:\n```\n{error}\n```"
         )
-        reply = self.console.ask_ai.chat(prompt)
-        matches = self.extract_code_blocks(reply)
-        return matches[0] if matches else broken_code
+
+    # --- blocking API -----------------------------------------------------
+    # For callers without an event loop (scripts, examples). Each call runs
+    # the coroutine above on the executor's own loop thread and waits.
+
+    def _run_sync(self, coro):
+        with self._pool_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._sync_loop.run_forever, name="rawwick-executor-loop",
+                                 daemon=True).start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._sync_loop)
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. Ctrl+C: don't leave the work running
+            future.cancel()
+            raise
+
+    @staticmethod
+    async def _aiter_blocking(chunks: Iterable[str]) -> AsyncIterator[str]:
+        """Iterate a blocking iterable in a worker thread."""
+        iterator, done = iter(chunks), object()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    def process(self, response: str, on_stage: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Blocking version of aprocess()."""
+        return self._run_sync(self.aprocess(response, on_stage))
+
+    def process_stream(self, chunks: Iterable[str],
+                       on_stage: Optional[Callable[[str], None]] = None) -> Tuple[str, List[str]]:
+        """Blocking version of aprocess_stream(); chunks may be a blocking iterator."""
+        return self._run_sync(self.aprocess_stream(self._aiter_blocking(chunks), on_stage))
+
+    def run_with_retry(self, code: str, lang: str, max_retries: Optional[int] = None,
+                       on_stage: Optional[Callable[[str], None]] = None,
+                       deadline: Optional[float] = None) -> str:
+        """Blocking version of arun_with_retry()."""
+        return self._run_sync(self.arun_with_retry(code, lang, max_retries, on_stage, deadline))
+
+    def fix_code_with_ai(self, broken_code: str, error: str, temperature: Optional[float] = None) -> str:
+        return self._run_sync(self.afix_code_with_ai(broken_code, error, temperature))
         
         # Show session summary
         session_stats = self.context_manager.get_session_summary()
@@ -0,0 +1,357 @@
+from typing import Dict, List, Optional, Tuple
+import importlib
+import io
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported once in every worker so snippets don't pay for them
+DEFAULT_PRELOAD = ("os", "sys", "subprocess", "platform", "shutil", "json", "socket", "psutil")
+
+# Desktop applications and launchers: they run until the user closes them, so
+# one still running at the execution timeout was launched, not hung
+GUI_APPS = frozenset({
+    "start", "open", "xdg-open", "gio", "explorer", "notepad", "notepad++", "calc", "mspaint", "wordpad",
+    "write", "winword", "excel", "powerpnt", "chrome", "google-chrome", "chromium", "chromium-browser",
+    "firefox", "msedge", "brave", "safari", "code", "gedit", "kate", "nautilus", "dolphin", "thunar",
+    "gnome-calculator", "gnome-terminal", "konsole", "vlc", "spotify", "slack", "discord", "teams",
+})
+
+
+def is_gui_app(name: str) -> bool:
+    """Whether a program name (or path, with or without .exe) is in GUI_APPS."""
+    name = os.path.basename(name.strip().strip('"')).lower()
+    return (name[:-4] if name.endswith(".exe") else name) in GUI_APPS
+
+
+class WorkerResult:
+    """Outcome of running one snippet in a worker process."""
+    __slots__ = ("ok", "stdout", "stderr", "error", "elapsed", "memory_used", "timed_out", "crashed", "cancelled")
+
+    def __init__(self, ok: bool, stdout: str = "", stderr: str = "", error: str = "",
+                 elapsed: float = 0.0, memory_used: int = 0, timed_out: bool = False, crashed: bool = False,
+                 cancelled: bool = False):
+        self.ok = ok
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error
+        self.elapsed = elapsed
+        self.memory_used = memory_used
+        self.timed_out = timed_out
+        self.crashed = crashed
+        self.cancelled = cancelled
+
+
+def _send_frame(stream, obj):
+    data = pickle.dumps(obj)
+    stream.write(struct.pack(">I", len(data)) + data)
+    stream.flush()
+
+
+def _recv_frame(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        raise EOFError
+    size, = struct.unpack(">I", header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return pickle.loads(data)
+
+
+def worker_main():
+    """Entry point of a worker process: preload modules, then run snippets sent over the pipe."""
+    # Keep the pipes to the pool private: snippets (and programs they start)
+    # write to stderr instead and can't read the request stream.
+    requests_in = os.fdopen(os.dup(0), "rb")
+    results_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+
+    for name in sys.argv[1:]:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    try:
+        import psutil
+        proc = psutil.Process()
+    except ImportError:
+        proc = None
+    from executors.fs_helpers import FS_HELPERS
+
+    # Every snippet starts from the same environment, whatever the last one changed
+    base_env = dict(os.environ)
+    _send_frame(results_out, "ready")
+    while True:
+        try:
+            message = _recv_frame(requests_in)
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        code, with_fs_helpers, cwd = message
+        if os.environ != base_env:
+            os.environ.clear()
+            os.environ.update(base_env)
+        try:
+            os.chdir(cwd)
+        except OSError:
+            pass
+        scope = dict(FS_HELPERS) if with_fs_helpers else {}
+        scope["__name__"] = "__main__"
+        stdout, stderr = io.StringIO(), io.StringIO()
+        start_rss = proc.memory_info().rss if proc else 0
+        error = ""
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                exec(code, scope)
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                error = f"SystemExit: {e.code}"
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            stderr.write(traceback.format_exc(limit=-1))
+        memory_used = (proc.memory_info().rss - start_rss) if proc else 0
+        _send_frame(results_out, (not error, stdout.getvalue(), stderr.getvalue(), error, memory_used))
+
+
+class _Worker:
+    def __init__(self, preload: Tuple[str, ...]):
+        bootstrap = (
+            f"import sys; sys.path.insert(0, {ROOT_DIR!r}); "
+            "from executors.worker_pool import worker_main; worker_main()"
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", bootstrap, *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self.results: "queue.Queue" = queue.Queue()
+        self.ready = threading.Event()
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        self.tasks = 0
+
+    def _read_results(self):
+        try:
+            while True:
+                frame = _recv_frame(self.process.stdout)
+                if frame == "ready":
+                    self.ready.set()
+                else:
+                    self.results.put(frame)
+        except (EOFError, OSError, ValueError, pickle.UnpicklingError):
+            self.results.put(EOFError)
+
+    def send(self, message):
+        _send_frame(self.process.stdin, message)
+
+    def gui_children(self) -> list:
+        """Desktop applications (see GUI_APPS) the snippets have started and that are still open."""
+        try:
+            import psutil
+            return [child for child in psutil.Process(self.process.pid).children(recursive=True)
+                    if is_gui_app(child.name())]
+        except Exception:
+            return []
+
+    def kill(self, spare: Tuple = ()):
+        """
+        Kill the worker and everything its snippets started.
+
+        Args:
+            spare: psutil processes (with their children) to leave running
+        """
+        try:
+            # Take down anything the snippet started as well
+            import psutil
+            keep = set()
+            for proc in spare:
+                keep.add(proc.pid)
+                keep.update(child.pid for child in proc.children(recursive=True))
+            for child in psutil.Process(self.process.pid).children(recursive=True):
+                if child.pid not in keep:
+                    child.kill()
+        except Exception:
+            pass
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1.0)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+    def stop(self):
+        try:
+            self.send(None)
+            self.process.wait(timeout=1.0)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class PythonWorkerPool:
+    """
+    Pool of warm, pre-imported worker processes for generated Python code.
+
+    Each snippet runs in a separate process, so a crash or a hang can't take
+    the agent down with it. Workers are started ahead of time with common
+    modules already imported, which avoids interpreter startup on every run.
+    Requests and captured stdout/stderr travel over the workers' pipes.
+    Each snippet starts in the agent's current directory with the worker's
+    original environment. A snippet that exceeds its wall-clock timeout gets
+    its worker killed and a fresh one is spawned in its place; desktop
+    applications it opened (GUI_APPS) are left running and the run counts
+    as a successful launch.
+    """
+    def __init__(self, size: Optional[int] = None, timeout: float = 30.0,
+                 preload: Tuple[str, ...] = DEFAULT_PRELOAD, max_tasks_per_worker: int = 50):
+        """
+        Initialize the pool and start its workers.
+
+        Args:
+            size: Number of worker processes (default: up to 4, based on CPU count)
+            timeout: Default wall-clock limit for a snippet in seconds
+            preload: Modules to import in every worker at startup
+            max_tasks_per_worker: Snippets a worker runs before it is recycled,
+                                  so state leaked by one snippet doesn't linger
+        """
+        self.size = size or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"executions": 0, "timeouts": 0, "crashes": 0, "respawns": 0, "cancellations": 0}
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.preload)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, spare: Tuple = (), graceful: bool = False) -> _Worker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self.stats["respawns"] += 1
+        if graceful:
+            # Recycling an idle worker: programs its snippets launched stay up
+            worker.stop()
+        else:
+            worker.kill(spare)
+        return self._spawn()
+
+    @staticmethod
+    def _wait_for_result(worker: "_Worker", timeout: float, cancel: Optional[threading.Event]):
+        if cancel is None:
+            return worker.results.get(timeout=timeout)
+        deadline = time.monotonic() + timeout
+        while not cancel.is_set():
+            try:
+                return worker.results.get(timeout=max(0.0, min(0.1, deadline - time.monotonic())))
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise
+        return None
+
+    def run(self, code: str, timeout: Optional[float] = None, fs_helpers: bool = False,
+            cancel: Optional[threading.Event] = None) -> WorkerResult:
+        """
+        Run a snippet in the next idle worker.
+
+        Args:
+            code: The Python source to execute
+            timeout: Wall-clock limit in seconds (default: the pool's timeout)
+            fs_helpers: Expose read_file/write_file/list_dir/walk_dir to the snippet
+            cancel: Setting this event kills the snippet's worker and returns early
+
+        Returns:
+            The captured output and outcome of the run
+        """
+        if self._closed:
+            raise RuntimeError("Worker pool is shut down")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        # A freshly respawned worker may still be importing its preload list
+        worker.ready.wait(timeout)
+        start = time.perf_counter()
+        try:
+            worker.send((code, fs_helpers, os.getcwd()))
+            try:
+                frame = self._wait_for_result(worker, timeout, cancel)
+            except queue.Empty:
+                # A snippet waiting on an app it opened (subprocess.run(["notepad"]))
+                # did its job: the app is left open and the run counts as done
+                launched = worker.gui_children()
+                worker = self._replace(worker, spare=tuple(launched))
+                if launched:
+                    with self._lock:
+                        self.stats["executions"] += 1
+                    names = ", ".join(sorted({proc.name() for proc in launched}))
+                    return WorkerResult(True, stdout=f"(Launched {names})", elapsed=time.perf_counter() - start)
+                with self._lock:
+                    self.stats["timeouts"] += 1
+                return WorkerResult(False, error=f"Execution timed out after {timeout} seconds",
+                                    elapsed=time.perf_counter() - start, timed_out=True)
+            if frame is None:
+                with self._lock:
+                    self.stats["cancellations"] += 1
+                worker = self._replace(worker)
+                return WorkerResult(False, error="Execution cancelled",
+                                    elapsed=time.perf_counter() - start, cancelled=True)
+            if frame is EOFError:
+                raise EOFError
+            ok, stdout, stderr, error, memory_used = frame
+        except (EOFError, OSError, ValueError):
+            with self._lock:
+                self.stats["crashes"] += 1
+            try:
+                exitcode = worker.process.wait(timeout=0.5)
+            except subprocess.TimeoutExpired:
+                exitcode = None
+            worker = self._replace(worker)
+            return WorkerResult(False, error=f"Worker process crashed (exit code {exitcode})",
+                                elapsed=time.perf_counter() - start, crashed=True)
+        finally:
+            worker.tasks += 1
+            if worker.tasks >= self.max_tasks_per_worker and not self._closed:
+                worker = self._replace(worker, graceful=True)
+            self._idle.put(worker)
+
+        with self._lock:
+            self.stats["executions"] += 1
+        return WorkerResult(ok, stdout, stderr, error, time.perf_counter() - start, memory_used)
+
+    def shutdown(self):
+        """
+        Stop every worker process.
+        """
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def snapshot(self) -> Dict:
+        """
+        Get pool counters.
+
+        Returns:
+            A dictionary with execution, timeout, crash and respawn counts
+        """
+        with self._lock:
+            return dict(self.stats, size=self.size)
@@ -1,7 +1,64 @@
-from Listen import ContinuousListener
-from core.agent import system_agent
+from utils.startup_profile import profiler
+import argparse
+import json
+import sys
 import time
 
+with profiler.measure("Listen", "import"):
+    from Listen import ContinuousListener
+with profiler.measure("core.agent", "import"):
+    from core.agent import get_assistant, system_agent
+
+def profile_startup():
+    """
+    Build every component up front and print how long each one took.
+    
+    Normally components are created lazily on the first command; this forces
+    them all so the cold-start cost can be measured, then exits.
+    """
+    import Listen
+    
+    Listen.get_recognizer()
+    with profiler.measure("ContinuousListener", "init"):
+        ContinuousListener()
+    get_assistant().warm_up()
+    print(profiler.report())
+    get_assistant().progress.stop()
+
+def run_batch_mode(args) -> int:
+    """
+    Run commands from a file or stdin instead of the microphone.
+    
+    Returns:
+        The process exit code: 1 if any command failed
+    """
+    from core.batch import run_batch
+    
+    summary = run_batch(args.batch, concurrency=args.concurrency, order=args.order,
+                        results=args.results)
+    get_assistant().shutdown()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+def run_daemon_mode(args) -> int:
+    """
+    Serve commands from local clients over HTTP or a Unix socket.
+    
+    Returns:
+        The process exit code: 2 if the address was refused
+    """
+    from core.daemon import serve
+    
+    try:
+        serve(args.serve, workers=args.workers, queue_size=args.queue_size,
+              client_limit=args.client_limit)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    finally:
+        get_assistant().shutdown()
+    return 0
+
 def main():
     """
     Main function to run the RawWick voice assistant system.
@@ -10,6 +67,57 @@ def main():
     AI-powered executor that processes voice commands. The system will continue
     running until the user says 'exit', 'quit', or 'stop'.
     """
+    parser = argparse.ArgumentParser(description="RawWick voice assistant")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import and init time per component, then exit")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="Run text commands from a file (one per line, or JSONL), or '-' for stdin")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Batch commands processed at once")
+    parser.add_argument("--order", choices=["input", "completion"], default="input",
+                        help="Write batch results in input order or as they finish")
+    parser.add_argument("--results", metavar="PATH",
+                        help="Write a JSONL result record per batch command ('-' for stdout)")
+    parser.add_argument("--trace-file", metavar="PATH",
+                        help="Append a JSONL span per pipeline stage (also $RAWWICK_TRACE_FILE)")
+    parser.add_argument("--metrics", metavar="ADDRESS", nargs="?", const="127.0.0.1:9464",
+                        help="Serve Prometheus metrics at http://ADDRESS/metrics, loopback only "
+                             "(default 127.0.0.1:9464)")
+    parser.add_argument("--serve", metavar="ADDRESS", nargs="?", const="127.0.0.1:8765",
+                        help="Run as a daemon serving a local API on host:port or unix:/path "
+                             "(default 127.0.0.1:8765); non-loopback addresses need $RAWWICK_DAEMON_TOKEN")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Daemon commands processed at once")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="Daemon commands allowed to wait before new ones are rejected")
+    parser.add_argument("--client-limit", type=int, default=4,
+                        help="Daemon commands one client may have queued or running")
+    parser.add_argument("--race-candidates", type=int, default=1,
+                        help="Fixes requested at once when a code block fails; the first that works wins")
+    args = parser.parse_args()
+    get_assistant(race_candidates=args.race_candidates)
+    
+    if args.profile_startup:
+        profile_startup()
+        return 0
+    
+    if args.trace_file or args.metrics:
+        from utils.tracing import tracer
+        if args.trace_file:
+            tracer.configure(args.trace_file)
+        if args.metrics:
+            try:
+                tracer.serve(args.metrics)
+            except ValueError as e:
+                print(f"❌ {e}", file=sys.stderr)
+                return 2
+            print(f"📈 Metrics at http://{args.metrics}/metrics")
+    
+    if args.batch:
+        return run_batch_mode(args)
+    
+    if args.serve:
+        return run_daemon_mode(args)
     
     # Create and start the continuous listener
     listener = ContinuousListener(on_command_received=lambda cmd: 
@@ -19,6 +127,7 @@ def main():
     
     # Wait for the listener to finish (when exit command is given)
     # This keeps the main thread alive until the listener is stopped
+    interrupted = False
     try:
         # Keep the main thread alive
         while listener.listening_active:
@@ -26,10 +135,26 @@ def main():
     except KeyboardInterrupt:
         # Handle Ctrl+C gracefully
         print("\n⚠️ Keyboard interrupt detected. Shutting down...")
+        interrupted = True
     finally:
         # Ensure we stop the listener properly
         listener.stop_listening()
+        # system_agent() returns at once, so commands may still be running:
+        # let them finish on "exit", cancel them on Ctrl+C
+        commands = listener.command_queue
+        try:
+            if not interrupted:
+                # Commands queued before the exit still have to be dispatched
+                listener.wait_until_done()
+                if commands.stats()["in_flight"]:
+                    print("⏳ Waiting for running commands to finish (Ctrl+C to cancel them)...")
+                    commands.join()
+        except KeyboardInterrupt:
+            interrupted = True
+        if interrupted:
+            commands.cancel_all()
+        get_assistant().shutdown()
         print("✅ All tasks completed. System shutdown.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,170 @@
+from typing import Dict, List, Optional
+import re
+import threading
+from collections import deque
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+
+# Rough per-message framing overhead (role, separators) in tokens
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a piece of text will cost.
+
+    Uses the common ~4 characters per token heuristic for English and code,
+    which is close enough to budget requests without a tokenizer dependency.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        The estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
+class ConversationWindow:
+    """
+    Bounded, token-budgeted conversation history for the Groq model.
+
+    The system prompt is pinned once at the start of every request. Past
+    turns are kept in a bounded store, and each request only includes as
+    many of them as fit in the token budget: the most recent turns first,
+    then the older turns most relevant to the new query. Turns that don't
+    make it in are folded into a one-line summary so the model still knows
+    what was asked earlier in the session.
+    """
+    def __init__(self, system_prompt: str, max_tokens: int = 3000, keep_recent: int = 4,
+                 max_turns: int = 100, summary_tokens: int = 200):
+        """
+        Initialize the window with a pinned system prompt.
+
+        Args:
+            system_prompt: The system message sent with every request
+            max_tokens: Token budget for the whole request payload
+            keep_recent: Number of most recent turns to prefer over relevant ones
+            max_turns: Number of turns retained in memory at most
+            summary_tokens: Token budget for the summary of dropped turns
+        """
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.turns: deque = deque(maxlen=max_turns)
+        self._lock = threading.Lock()
+
+    def _message_tokens(self, message: Dict) -> int:
+        """
+        Estimate the token cost of one chat message.
+        """
+        return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+    def _turn_tokens(self, turn: Dict) -> int:
+        """
+        Estimate the token cost of a user/assistant turn.
+        """
+        return sum(self._message_tokens(m) for m in turn["messages"])
+
+    def add_turn(self, query: str, reply: str):
+        """
+        Record a completed user/assistant exchange.
+
+        Args:
+            query: The user message that was sent
+            reply: The assistant's response
+        """
+        turn = {
+            "messages": [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": reply},
+            ],
+            "words": set(_WORD_RE.findall(query.lower())),
+            "query": query,
+        }
+        turn["tokens"] = self._turn_tokens(turn)
+        with self._lock:
+            self.turns.append(turn)
+
+    def _summarize(self, dropped: List[Dict]) -> Optional[Dict]:
+        """
+        Fold dropped turns into a single short system note.
+
+        Args:
+            dropped: Turns that didn't fit in the budget, oldest first
+
+        Returns:
+            A system message summarizing them, or None if nothing was dropped
+        """
+        if not dropped or self.summary_tokens <= 0:
+            return None
+        budget = self.summary_tokens * 4
+        asked = []
+        # Newest dropped turns are the most useful, so fill from the end
+        for turn in reversed(dropped):
+            line = turn["query"].splitlines()[0][:80]
+            if sum(len(a) + 2 for a in asked) + len(line) > budget:
+                break
+            asked.append(line)
+        if not asked:
+            return None
+        return {
+            "role": "system",
+            "content": "Earlier in this session the user asked: " + "; ".join(reversed(asked)),
+        }
+
+    def build(self, query: str) -> List[Dict]:
+        """
+        Build the message list for a new request.
+
+        Args:
+            query: The new user message
+
+        Returns:
+            The messages to send: pinned system prompt, selected history and the query
+        """
+        system_msg = {"role": "system", "content": self.system_prompt}
+        user_msg = {"role": "user", "content": query}
+        budget = (self.max_tokens - self._message_tokens(system_msg)
+                  - self._message_tokens(user_msg) - self.summary_tokens)
+
+        with self._lock:
+            turns = list(self.turns)
+
+        selected = set()
+        # Most recent turns first
+        for idx in range(len(turns) - 1, max(len(turns) - self.keep_recent, 0) - 1, -1):
+            if turns[idx]["tokens"] > budget:
+                break
+            selected.add(idx)
+            budget -= turns[idx]["tokens"]
+
+        # Then the older turns that share the most words with the query
+        words = set(_WORD_RE.findall(query.lower()))
+        candidates = sorted(
+            ((len(words & turns[idx]["words"]), idx) for idx in range(len(turns)) if idx not in selected),
+            reverse=True,
+        )
+        for score, idx in candidates:
+            if score == 0:
+                break
+            if turns[idx]["tokens"] <= budget:
+                selected.add(idx)
+                budget -= turns[idx]["tokens"]
+
+        messages = [system_msg]
+        summary = self._summarize([t for i, t in enumerate(turns) if i not in selected])
+        if summary:
+            messages.append(summary)
+        for idx in sorted(selected):
+            messages.extend(turns[idx]["messages"])
+        messages.append(user_msg)
+        return messages
+
+    def clear(self):
+        """
+        Forget every recorded turn, keeping the pinned system prompt.
+        """
+        with self._lock:
+            self.turns.clear()
@@ -1,17 +1,97 @@
-from typing import List
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+import asyncio
+import json
 import os
+import threading
+import weakref
 from platform import system, machine, python_version
-import requests
+from models.http_client import PooledHTTPClient, get_shared_async_client, get_shared_client
+from models.conversation import ConversationWindow
+
+
+def platform_fingerprint() -> str:
+    """
+    Describe the platform the generated code will run on.
+    
+    Returns:
+        A short string with OS, shell, architecture and Python version
+    """
+    shell = os.environ.get("SHELL") or os.environ.get("COMSPEC") or "unknown"
+    return (
+        f"OS: {system().lower()}, "
+        f"Shell: {os.path.basename(shell).lower()}, "
+        f"Arch: {machine()}, "
+        f"Python: {python_version()}"
+    )
+
+
+def build_system_prompt() -> str:
+    """
+    Build the RawWick system prompt for the current platform.
+    
+    Returns:
+        The system message content pinned at the start of every request
+    """
+    return (
+        "You're RawWick, a voice-activated AI assistant created by AbdulKarim. "
+        "If a task is asked (e.g. 'open notepad', 'launch camera', 'list files'), respond only with Python or shell code "
+        "that performs the task. Never explain or give instructions. Wrap the code in triple backticks (```), so it can be executed. "
+        "Don't ask the user for permission. Assume full access to OS APIs, commands, and disk. Avoid assistant-like responses. "
+        "Focus on clean architecture, scalability, and real-world applications. "
+        "Remember: Backend is home, frontend is playground, and systems are the gym. "
+        f"Platform context: {platform_fingerprint()}."
+    )
+
+
+def response_usage(payload: Dict) -> Optional[Dict]:
+    """
+    Token usage reported in a completion or in the last chunk of a stream.
+    
+    Args:
+        payload: The decoded response body or stream chunk
+        
+    Returns:
+        The usage object (prompt_tokens, completion_tokens, ...), if present
+    """
+    return payload.get("usage") or (payload.get("x_groq") or {}).get("usage")
+
+
+def parse_sse_line(line: str, usage: Optional[Dict] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Parse one line of a streamed chat completion.
+    
+    Args:
+        line: A line of the server-sent event stream
+        usage: Updated with the token usage if the line reports it
+        
+    Returns:
+        (done, text): done is True at the end-of-stream marker; text is the
+        content delta carried by the line, if any
+    """
+    if not line or not line.startswith("data:"):
+        return False, None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return True, None
+    payload = json.loads(data)
+    if usage is not None:
+        usage.update(response_usage(payload) or {})
+    choices = payload.get("choices") or [{}]
+    return False, choices[0].get("delta", {}).get("content")
+
 
 class GroqModel:
     """
     Groq API integration for RawWick assistant.
     
     This class handles communication with the Groq API to generate responses
-    to user commands. It maintains a conversation history and formats system
-    prompts to ensure the AI responds with executable code.
+    to user commands. It keeps a token-budgeted conversation window with a
+    pinned system prompt to ensure the AI responds with executable code.
     """
-    def __init__(self, api_key: str, model="llama3-70b-8192", temperature=0.2, max_tokens=1024):
+    def __init__(self, api_key: str, model="llama3-70b-8192", temperature=0.2, max_tokens=1024,
+                 client: Optional[PooledHTTPClient] = None, pool_size=10,
+                 connect_timeout=5.0, read_timeout=60.0, max_retries=4,
+                 context_tokens=3000, keep_recent=4, max_concurrent_requests=16):
         """
         Initialize the Groq model with API credentials and parameters.
         
@@ -20,64 +100,249 @@ class GroqModel:
             model: The model to use (default: llama3-70b-8192)
             temperature: Controls randomness (0.0-1.0, lower is more deterministic)
             max_tokens: Maximum number of tokens in the response
+            client: HTTP client to send requests through (default: the shared pool)
+            pool_size: Keep-alive connections in the shared pool, if it gets created here
+            connect_timeout: Seconds to wait for a connection, if the shared pool gets created here
+            read_timeout: Seconds to wait for response data, if the shared pool gets created here
+            max_retries: Retries on throttling/transient errors, if the shared pool gets created here
+            context_tokens: Token budget for each request's messages
+            keep_recent: Number of most recent turns to always try to include
+            max_concurrent_requests: Limit on in-flight async requests per event loop
         """
         
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.chat_history = []
+        self.conversation = ConversationWindow(
+            build_system_prompt(),
+            max_tokens=context_tokens,
+            keep_recent=keep_recent,
+        )
         self.api_url = "https://api.groq.com/openai/v1/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.client = client or get_shared_client(
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            max_retries=max_retries,
+        )
+        self._client_settings = dict(pool_size=pool_size, connect_timeout=connect_timeout,
+                                     read_timeout=read_timeout, max_retries=max_retries)
+        self.max_concurrent_requests = max_concurrent_requests
+        self._request_limits = weakref.WeakKeyDictionary()
+        self._limits_lock = threading.Lock()
 
-    def chat(self, query: str) -> str:
+    def _request_body(self, query: str, scratch: bool, stream: bool = False,
+                      temperature: Optional[float] = None) -> Dict:
+        """
+        Build the JSON body for a chat completion request.
+        
+        Args:
+            query: The user's command or question
+            scratch: Use a throwaway context instead of the conversation
+            stream: Ask the API to stream the completion
+            temperature: Override the model's sampling temperature
+            
+        Returns:
+            The request body
+        """
+        if scratch:
+            messages = [
+                {"role": "system", "content": self.conversation.system_prompt},
+                {"role": "user", "content": query},
+            ]
+        else:
+            messages = self.conversation.build(query)
+
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature if temperature is None else temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if stream:
+            body["stream"] = True
+            # Token counts arrive in the last chunk
+            body["stream_options"] = {"include_usage": True}
+        return body
+
+    def chat(self, query: str, scratch: bool = False, temperature: Optional[float] = None,
+             usage: Optional[Dict] = None) -> str:
         """
         Send a query to the Groq API and get a response.
         
-        This method formats the conversation with system context and user query,
-        then sends it to the Groq API. The response is expected to contain
-        executable code that the RawWick executor can run.
+        This method builds the request from the pinned system prompt, the
+        part of the conversation that fits the token budget, and the user
+        query, then sends it to the Groq API. The response is expected to
+        contain executable code that the RawWick executor can run.
         
         Args:
             query: The user's command or question
+            scratch: Send the query in a throwaway context that neither sees
+                     nor extends the conversation (used for code fix-ups)
+            temperature: Override the sampling temperature for this request
+            usage: Updated with the request's token usage, if the API reports it
             
         Returns:
             The AI's response containing executable code
         """
+        body = self._request_body(query, scratch, temperature=temperature)
+        res = self.client.post(self.api_url, headers=self.headers, json=body)
+        payload = res.json()
+        if usage is not None:
+            usage.update(response_usage(payload) or {})
+        reply = payload["choices"][0]["message"]["content"]
+        if not scratch:
+            self.conversation.add_turn(query, reply)
+        return reply
+
+    def stream_chat(self, query: str, scratch: bool = False, usage: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Send a query to the Groq API and yield the response as it arrives.
         
-        shell = os.environ.get("SHELL") or os.environ.get("COMSPEC") or "unknown"
-        platform_info = (
-            f"OS: {system().lower()}, "
-            f"Shell: {os.path.basename(shell).lower()}, "
-            f"Arch: {machine()}, "
-            f"Python: {python_version()}"
-        )
+        The completion is streamed as server-sent events, so callers can act
+        on the first code block before the rest of the answer is generated.
+        The full reply is added to the conversation once the stream ends.
+        
+        Args:
+            query: The user's command or question
+            scratch: Send the query in a throwaway context (see chat)
+            usage: Updated with the request's token usage once the stream reports it
+            
+        Yields:
+            Pieces of the AI's response text, in order
+        """
+        body = self._request_body(query, scratch, stream=True)
+        res = self.client.post(self.api_url, headers=self.headers, json=body, stream=True)
+        parts = []
+        try:
+            for line in res.iter_lines(decode_unicode=True):
+                done, delta = parse_sse_line(line, usage)
+                if done:
+                    break
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            res.close()
 
-        self.chat_history.append({
-            "role": "system",
-            "content": (
-                "You're RawWick, a voice-activated AI assistant created by AbdulKarim. "
-                "If a task is asked (e.g. 'open notepad', 'launch camera', 'list files'), respond only with Python or shell code "
-                "that performs the task. Never explain or give instructions. Wrap the code in triple backticks (```), so it can be executed. "
-                "Don't ask the user for permission. Assume full access to OS APIs, commands, and disk. Avoid assistant-like responses. "
-                "Focus on clean architecture, scalability, and real-world applications. "
-                "Remember: Backend is home, frontend is playground, and systems are the gym. "
-                f"Platform context: {platform_info}."
-            )
-        })
-        self.chat_history.append({"role": "user", "content": query})
+        if not scratch:
+            self.conversation.add_turn(query, "".join(parts))
 
-        body = {
-            "model": self.model,
-            "messages": self.chat_history,
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-        }
-        res = requests.post(self.api_url, headers=self.headers, json=body)
-        res.raise_for_status()
-        reply = res.json()["choices"][0]["message"]["content"]
-        self.chat_history.append({"role": "assistant", "content": reply})
-        return reply
\ No newline at end of file
+    def _request_slot(self) -> asyncio.Semaphore:
+        """The semaphore limiting in-flight async requests on the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._limits_lock:
+            slot = self._request_limits.get(loop)
+            if slot is None:
+                slot = self._request_limits[loop] = asyncio.Semaphore(self.max_concurrent_requests)
+            return slot
+
+    async def achat(self, query: str, scratch: bool = False, temperature: Optional[float] = None,
+                    usage: Optional[Dict] = None) -> str:
+        """
+        Async version of chat().
+        
+        Uses the shared httpx client when httpx is installed; otherwise the
+        blocking call runs in a worker thread.
+        
+        Args:
+            query: The user's command or question
+            scratch: Send the query in a throwaway context (see chat)
+            temperature: Override the sampling temperature for this request
+            usage: Updated with the request's token usage, if the API reports it
+            
+        Returns:
+            The AI's response containing executable code
+        """
+        async with self._request_slot():
+            client = get_shared_async_client(**self._client_settings)
+            if client is None:
+                return await asyncio.to_thread(self.chat, query, scratch, temperature, usage)
+            body = self._request_body(query, scratch, temperature=temperature)
+            res = await client.post(self.api_url, headers=self.headers, json=body)
+            payload = res.json()
+            if usage is not None:
+                usage.update(response_usage(payload) or {})
+            reply = payload["choices"][0]["message"]["content"]
+        if not scratch:
+            self.conversation.add_turn(query, reply)
+        return reply
+
+    async def astream_chat(self, query: str, scratch: bool = False,
+                           usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Async version of stream_chat().
+        
+        Args:
+            query: The user's command or question
+            scratch: Send the query in a throwaway context (see chat)
+            usage: Updated with the request's token usage once the stream reports it
+            
+        Yields:
+            Pieces of the AI's response text, in order
+        """
+        async with self._request_slot():
+            client = get_shared_async_client(**self._client_settings)
+            if client is None:
+                async for delta in self._stream_in_thread(query, scratch, usage):
+                    yield delta
+                return
+
+            body = self._request_body(query, scratch, stream=True)
+            parts = []
+            async with client.stream(self.api_url, headers=self.headers, json=body) as res:
+                async for line in res.aiter_lines():
+                    done, delta = parse_sse_line(line, usage)
+                    if done:
+                        break
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+
+        if not scratch:
+            self.conversation.add_turn(query, "".join(parts))
+
+    async def _stream_in_thread(self, query: str, scratch: bool,
+                                usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Bridge the blocking stream_chat() generator onto the event loop."""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for delta in self.stream_chat(query, scratch, usage):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(chunks.put_nowait, delta)
+                loop.call_soon_threadsafe(chunks.put_nowait, done)
+            except BaseException as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            await asyncio.shield(producer)
+
+    def latency_stats(self) -> Dict:
+        """
+        Get latency and retry counters for calls made through the HTTP client.
+        
+        Returns:
+            A dictionary of call counts and latency figures in seconds
+        """
+        return self.client.stats.snapshot()
@@ -0,0 +1,384 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes that are worth retrying: throttling and transient server errors
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class LatencyStats:
+    """
+    Thread-safe per-call latency counters for the HTTP client.
+
+    Keeps running totals rather than individual samples so the memory
+    footprint stays constant no matter how long the agent runs.
+    """
+    def __init__(self):
+        """
+        Initialize all counters at zero.
+        """
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttled = 0
+        self.total_time = 0.0
+        self.min_time: Optional[float] = None
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def record(self, elapsed: float, ok: bool, retries: int, throttled: int):
+        """
+        Record the outcome of one logical call (including its retries).
+
+        Args:
+            elapsed: Wall-clock seconds spent on the call
+            ok: Whether the call eventually succeeded
+            retries: Number of retries that were needed
+            throttled: Number of 429 responses seen during the call
+        """
+        with self._lock:
+            self.calls += 1
+            self.failures += 0 if ok else 1
+            self.retries += retries
+            self.throttled += throttled
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self.max_time = max(self.max_time, elapsed)
+            self.min_time = elapsed if self.min_time is None else min(self.min_time, elapsed)
+
+    def snapshot(self) -> Dict:
+        """
+        Get a consistent copy of the counters.
+
+        Returns:
+            A dictionary with call counts and latency figures in seconds
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "avg_time": self.total_time / self.calls if self.calls else 0.0,
+                "min_time": self.min_time or 0.0,
+                "max_time": self.max_time,
+                "last_time": self.last_time,
+            }
+
+
+class _RetryPolicy:
+    """Backoff and Retry-After handling shared by the sync and async clients."""
+    max_retries: int
+    backoff_base: float
+    backoff_max: float
+
+    def _retry_after(self, response) -> Optional[float]:
+        """
+        Parse the Retry-After header of a response.
+
+        Args:
+            response: The throttled or failed response
+
+        Returns:
+            The delay in seconds requested by the server, or None
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute the delay before the next attempt.
+
+        Uses "full jitter" exponential backoff, but never waits less than the
+        server asked for via Retry-After.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            The number of seconds to sleep
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+
+class PooledHTTPClient(_RetryPolicy):
+    """
+    Pooled, keep-alive HTTP transport used by the RawWick model clients.
+
+    A single requests.Session is shared by every call so TCP and TLS
+    connections are reused across commands and fix-up retries. Throttling
+    (429) and transient server errors are retried with jittered exponential
+    backoff, honoring the server's Retry-After header when present.
+    """
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        Initialize the client and its shared connection pool.
+
+        Args:
+            pool_size: Maximum number of keep-alive connections per host
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of the response
+            max_retries: Retries for throttled or transient failures
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound for a single backoff delay
+            headers: Default headers sent with every request
+        """
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = LatencyStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def post(self, url: str, json=None, stream: bool = False, **kwargs) -> requests.Response:
+        """
+        POST to a URL with pooling, timeouts and retries.
+
+        Args:
+            url: The endpoint to call
+            json: JSON-serializable request body
+            stream: Whether to stream the response body
+            **kwargs: Extra arguments forwarded to requests.Session.post
+
+        Returns:
+            The successful response
+
+        Raises:
+            requests.HTTPError: If the final response is still an error
+            requests.RequestException: If the connection keeps failing
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        retries = throttled = 0
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=json, stream=stream, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    self.stats.record(time.perf_counter() - start, False, retries, throttled)
+                    raise
+                retries += 1
+                time.sleep(self._backoff(attempt))
+                continue
+
+            throttled += response.status_code == 429
+            if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                retries += 1
+                delay = self._backoff(attempt, self._retry_after(response))
+                response.close()
+                time.sleep(delay)
+                continue
+
+            ok = response.ok
+            self.stats.record(time.perf_counter() - start, ok, retries, throttled)
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                # Give the connection back to the pool; e.response still has the status
+                response.close()
+                raise
+            return response
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        self.session.close()
+
+
+_shared_client: Optional[PooledHTTPClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client(**kwargs) -> PooledHTTPClient:
+    """
+    Get the process-wide HTTP client, creating it on first use.
+
+    Every model instance that doesn't bring its own client shares this one,
+    so all of them draw from the same keep-alive pool.
+
+    Args:
+        **kwargs: Settings used only when the client is first created
+
+    Returns:
+        The shared PooledHTTPClient
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = PooledHTTPClient(**kwargs)
+        return _shared_client
+
+
+class AsyncPooledHTTPClient(_RetryPolicy):
+    """
+    Asyncio counterpart of PooledHTTPClient, built on httpx.AsyncClient.
+
+    Requests wait on the event loop instead of occupying a thread, so many
+    commands can have an API call in flight at once. Pooling, timeouts and
+    the retry policy match the synchronous client. Requires the optional
+    `httpx` package; an instance belongs to the event loop it was created on.
+    """
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        Initialize the client and its connection pool.
+
+        Args:
+            pool_size: Maximum number of keep-alive connections
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of the response
+            max_retries: Retries for throttled or transient failures
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound for a single backoff delay
+            headers: Default headers sent with every request
+
+        Raises:
+            ImportError: If httpx is not installed
+        """
+        import httpx
+
+        self._httpx = httpx
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = LatencyStats()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            headers=headers,
+        )
+
+    async def _send(self, url: str, json=None, stream: bool = False, **kwargs):
+        start = time.perf_counter()
+        retries = throttled = 0
+
+        for attempt in range(self.max_retries + 1):
+            request = self.client.build_request("POST", url, json=json, **kwargs)
+            try:
+                response = await self.client.send(request, stream=stream)
+            except self._httpx.TransportError:
+                if attempt == self.max_retries:
+                    self.stats.record(time.perf_counter() - start, False, retries, throttled)
+                    raise
+                retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            throttled += response.status_code == 429
+            if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                retries += 1
+                delay = self._backoff(attempt, self._retry_after(response))
+                await response.aclose()
+                await asyncio.sleep(delay)
+                continue
+
+            ok = response.is_success
+            self.stats.record(time.perf_counter() - start, ok, retries, throttled)
+            if not ok:
+                await response.aclose()
+            response.raise_for_status()
+            return response
+
+    async def post(self, url: str, json=None, **kwargs):
+        """
+        POST to a URL with pooling, timeouts and retries.
+
+        Args:
+            url: The endpoint to call
+            json: JSON-serializable request body
+            **kwargs: Extra arguments forwarded to httpx (e.g. headers)
+
+        Returns:
+            The successful httpx.Response, fully read
+
+        Raises:
+            httpx.HTTPStatusError: If the final response is still an error
+            httpx.TransportError: If the connection keeps failing
+        """
+        return await self._send(url, json=json, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url: str, json=None, **kwargs) -> AsyncIterator:
+        """
+        POST to a URL and stream the response body.
+
+        Retries only happen before the body starts streaming.
+
+        Args:
+            url: The endpoint to call
+            json: JSON-serializable request body
+            **kwargs: Extra arguments forwarded to httpx (e.g. headers)
+
+        Yields:
+            The httpx.Response, whose body can be read with aiter_lines()
+        """
+        response = await self._send(url, json=json, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        """
+        Close every pooled connection.
+        """
+        await self.client.aclose()
+
+
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_client(**kwargs) -> Optional[AsyncPooledHTTPClient]:
+    """
+    Get the async HTTP client for the running event loop, creating it on first use.
+
+    Args:
+        **kwargs: Settings used only when the client is first created
+
+    Returns:
+        The loop's shared AsyncPooledHTTPClient, or None if httpx isn't installed
+    """
+    loop = asyncio.get_running_loop()
+    with _shared_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            try:
+                client = AsyncPooledHTTPClient(**kwargs)
+            except ImportError:
+                return None
+            _async_clients[loop] = client
+        return client
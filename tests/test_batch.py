@@ -0,0 +1,11 @@
+from core.batch import iter_commands
+
+
+def test_plain_lines_and_comments():
+    items = list(iter_commands(["list files\n", "\n", "# comment\n", "show disk usage\n"]))
+    assert items == [{"index": 0, "command": "list files"}, {"index": 1, "command": "show disk usage"}]
+
+
+def test_jsonl_records_keep_their_ids():
+    items = list(iter_commands(['{"command": "time", "id": "a"}', "date"]))
+    assert items == [{"index": 0, "command": "time", "id": "a"}, {"index": 1, "command": "date"}]
@@ -0,0 +1,47 @@
+import asyncio
+
+from executors.block_scheduler import AsyncBlockScheduler, analyze_block, depends_on
+
+
+def deps(later, earlier, lang="bash"):
+    return depends_on(analyze_block(later, lang), analyze_block(earlier, lang))
+
+
+def test_reads_run_concurrently():
+    assert not deps("cat a.txt", "cat b.txt")
+    assert not deps("print(open('a.txt').read())", "print(open('b.txt').read())", "python")
+
+
+def test_writes_order_blocks_touching_the_same_path():
+    assert deps("cat out/a.txt", "mkdir out")
+    assert deps("open('out/a.txt', 'w').write('x')", "import os\nos.makedirs('out')", "python")
+    assert not deps("cat other.txt", "mkdir out")
+
+
+def test_unnamed_reads_wait_for_writes():
+    assert deps("ls", "touch new.txt")
+
+
+def test_barriers_wait_for_everything():
+    assert deps("cat a.txt", "cd /tmp")
+    assert deps("export X=1", "cat a.txt")
+
+
+def test_scheduler_runs_independent_blocks_together():
+    running, peak = 0, 0
+
+    async def run(index, code, lang):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return code
+
+    async def main():
+        scheduler = AsyncBlockScheduler(run)
+        tasks = [scheduler.submit(code, "bash") for code in ("cat a.txt", "cat b.txt", "mkdir c")]
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == ["cat a.txt", "cat b.txt", "mkdir c"]
+    assert peak >= 2
@@ -0,0 +1,45 @@
+from models.conversation import ConversationWindow, MESSAGE_OVERHEAD, estimate_tokens
+
+
+def cost(messages):
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def filled_window(turns=30, **kwargs):
+    window = ConversationWindow("You are RawWick.", **kwargs)
+    for i in range(turns):
+        window.add_turn(f"command number {i} " + "word " * 20, "```bash\necho done\n```" + " x" * 40)
+    return window
+
+
+def test_request_stays_within_the_token_budget():
+    window = filled_window(max_tokens=600, summary_tokens=60)
+    messages = window.build("list files " * 10)
+    assert cost(messages) <= 600
+    assert messages[0] == {"role": "system", "content": "You are RawWick."}
+    assert messages[-1]["content"] == "list files " * 10
+
+
+def test_most_recent_turns_are_kept_and_the_rest_summarized():
+    window = filled_window(max_tokens=600, keep_recent=2, summary_tokens=60)
+    messages = window.build("show disk usage")
+    contents = [m["content"] for m in messages]
+    assert any(c.startswith("command number 29 ") for c in contents)
+    assert any(c.startswith("command number 28 ") for c in contents)
+    assert not any(c.startswith("command number 0 ") for c in contents)
+    assert messages[1]["role"] == "system"
+    assert messages[1]["content"].startswith("Earlier in this session the user asked:")
+
+
+def test_relevant_older_turn_is_preferred_over_unrelated_ones():
+    window = ConversationWindow("system", max_tokens=200, keep_recent=1, summary_tokens=0)
+    window.add_turn("open the quarterly spreadsheet", "ok")
+    for i in range(10):
+        window.add_turn(f"unrelated chatter {i} " + "filler " * 10, "ok")
+    contents = [m["content"] for m in window.build("close the quarterly spreadsheet")]
+    assert "open the quarterly spreadsheet" in contents
+
+
+def test_empty_window_sends_system_prompt_and_query():
+    window = ConversationWindow("system")
+    assert window.build("hi") == [{"role": "system", "content": "system"}, {"role": "user", "content": "hi"}]
@@ -0,0 +1,66 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from core.daemon import AgentDaemon, make_server
+
+
+class FakeAssistant:
+    """Runs commands on its own loop; each one runs until it is cancelled."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.started = threading.Event()
+
+    async def aprocess_query(self, query, on_stage=None):
+        self.started.set()
+        await asyncio.sleep(3600)
+
+
+@pytest.fixture
+def daemon():
+    assistant = FakeAssistant()
+    daemon = AgentDaemon(assistant, workers=1, queue_size=8, client_limit=1)
+    asyncio.run_coroutine_threadsafe(daemon._astart(), assistant.loop).result()
+    yield daemon
+    daemon.stop()
+    assistant.loop.call_soon_threadsafe(assistant.loop.stop)
+
+
+def test_stop_cancels_running_and_queued_commands(daemon):
+    running = daemon.submit("a", "list files")
+    assert daemon.assistant.started.wait(5)
+    queued = daemon.submit("b", "show disk usage")
+    daemon.stop()
+    assert daemon.wait(running, 5) and daemon.wait(queued, 5)
+    assert running.status == queued.status == "cancelled"
+    assert queued.events[-1]["event"] == "cancelled"
+    assert daemon.stats["cancelled"] == 2
+    assert daemon._queued == 0 and not daemon._active
+
+
+def post(server, headers):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("POST", "/commands", json.dumps({"command": "list files"}),
+                 {"Content-Type": "application/json", **headers})
+    response = conn.getresponse()
+    body = json.loads(response.read())
+    conn.close()
+    return response.status, body
+
+
+def test_client_limit_is_keyed_on_the_peer_not_a_header(daemon):
+    server = make_server(daemon, "127.0.0.1:0")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        status, body = post(server, {"X-RawWick-Client": "one"})
+        assert status == 202 and body["client"] == "127.0.0.1"
+        status, _ = post(server, {"X-RawWick-Client": "two"})
+        assert status == 429
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,83 @@
+import sqlite3
+
+from utils.cache import FixCache, SQLiteFixStore
+
+
+def open_cache(tmp_path, **kwargs):
+    cache = FixCache(str(tmp_path / "fix_cache.db"), legacy_path=None, **kwargs)
+    assert cache.index_ready.wait(5)
+    return cache
+
+
+def test_exact_lookup(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.add("print(x)", "x = 1\nprint(x)", "python")
+    assert cache.get("print(x)\n", "python") == "x = 1\nprint(x)"
+    assert cache.get("print(y)", "python") is None
+
+
+def test_similar_uses_the_recorded_language_after_reopening(tmp_path):
+    # Parses as Python, so detection alone would tokenize it differently
+    broken = "ls -la /tmp/reports/monthly/summary/data"
+    cache = open_cache(tmp_path)
+    cache.add(broken, "ls -la /tmp/reports", "bash")
+    cache.store.close()
+
+    reopened = open_cache(tmp_path)
+    assert reopened.similar(broken, "bash") == "ls -la /tmp/reports"
+
+
+def test_invalidated_fix_is_not_suggested(tmp_path):
+    cache = open_cache(tmp_path)
+    code = "import os\nprint(os.listdir('/tmp/some/where'))"
+    cache.add(code, "print('fixed')", "python")
+    cache.invalidate(code, "print('fixed')", "python")
+    assert cache.get(code, "python") is None
+    assert cache.similar(code, "python") is None
+
+
+def test_each_platform_keeps_its_own_fix(tmp_path):
+    path = str(tmp_path / "fix_cache.db")
+    linux = FixCache(path, legacy_path=None, fingerprint="linux")
+    windows = FixCache(path, legacy_path=None, fingerprint="windows")
+    linux.add("open notepad", "gedit", "bash")
+    windows.add("open notepad", "notepad.exe", "bash")
+    assert linux.get("open notepad") == "gedit"
+    assert windows.get("open notepad") == "notepad.exe"
+    windows.invalidate("open notepad", "notepad.exe", "bash")
+    assert linux.get("open notepad") == "gedit"
+    assert windows.get("open notepad") is None
+
+
+def test_replacing_a_fix_does_not_count_towards_the_limit(tmp_path):
+    cache = open_cache(tmp_path, max_entries=2)
+    cache.add("print(a)", "a = 1", "python")
+    cache.add("print(b)", "b = 1", "python")
+    for attempt in range(5):
+        cache.add("print(b)", f"b = {attempt}", "python")
+    assert cache.stats()["evictions"] == 0
+    assert len(cache) == 2
+    cache.add("print(c)", "c = 1", "python")
+    assert cache.stats()["evictions"] > 0
+
+
+def test_migrates_databases_keyed_on_the_snippet_alone(tmp_path):
+    path = str(tmp_path / "fix_cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE fixes (key TEXT PRIMARY KEY, fixed TEXT NOT NULL, updated REAL NOT NULL, "
+                 "struct_key TEXT, platform TEXT, hits INTEGER NOT NULL DEFAULT 0, last_hit REAL, "
+                 "size INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("INSERT INTO fixes (key, fixed, updated, platform) VALUES ('ls', 'ls -la', 1, NULL)")
+    conn.execute("INSERT INTO fixes (key, fixed, updated, platform) VALUES ('dir', 'ls', 1, 'linux')")
+    conn.commit()
+    conn.close()
+
+    store = SQLiteFixStore(path)
+    key_columns = [row[1] for row in store._conn().execute("PRAGMA table_info(fixes)") if row[5]]
+    assert key_columns == ["key", "platform"]
+    assert store.get("ls", "windows") == "ls -la"
+    assert store.get("dir", "linux") == "ls"
+    assert store.get("dir", "windows") is None
+    store.put("dir", "dir /b", platform="windows")
+    assert store.get("dir", "linux") == "ls"
+    assert len(store) == 3
@@ -0,0 +1,28 @@
+from core.history_index import HistoryIndex
+
+
+def test_best_match_first_and_only_shared_terms_score():
+    index = HistoryIndex()
+    index.add(1, "open notepad")
+    index.add(2, "list files in downloads")
+    index.add(3, "list files")
+    results = index.search("list files", limit=5)
+    assert [doc_id for _, doc_id in results] == [3, 2]
+
+
+def test_rare_terms_weigh_more():
+    index = HistoryIndex()
+    for doc_id in range(5):
+        index.add(doc_id, f"show files {doc_id}")
+    index.add("rare", "show spreadsheet")
+    assert index.search("show spreadsheet")[0][1] == "rare"
+
+
+def test_remove_and_re_add():
+    index = HistoryIndex()
+    index.add(1, "open notepad")
+    index.add(1, "open calculator")
+    assert index.search("notepad") == []
+    index.remove(1)
+    assert index.search("calculator") == []
+    assert len(index) == 0 and index.total_length == 0
@@ -0,0 +1,43 @@
+import os
+
+from core.intent_router import IntentRouter, register_builtin_intents
+
+
+def router():
+    return register_builtin_intents(IntentRouter())
+
+
+def test_exact_phrases_ignore_fillers_and_punctuation():
+    found = router().match("Please, list files!")
+    assert found.intent.name == "list_files" and found.slots == {}
+
+
+def test_slot_phrase_needs_a_valid_value(tmp_path):
+    (tmp_path / "notes.txt").write_text("hello")
+    found = router().match(f"read {tmp_path / 'notes.txt'}")
+    assert found.intent.name == "read_file"
+    assert found.run() is not None
+    assert router().match("read me a joke") is None
+
+
+def test_shell_arguments_go_to_the_llm():
+    assert router().match("ls -la") is None
+    found = router().match("ls ~")
+    assert found is None or found.intent.name == "list_files_in"
+
+
+def test_miss_and_failing_handler():
+    r = IntentRouter()
+    r.register("boom", "explode", lambda: 1 / 0)
+    assert r.route("explode") is None
+    assert r.match("something else") is None
+    assert (r.hits, r.misses) == (1, 1)
+
+
+def test_priority_decides_between_slot_patterns():
+    r = IntentRouter()
+    r.register("generic", "open {name}", lambda name: "generic")
+    r.register("folder", "open {name}", lambda name: "folder", priority=5,
+               validate=lambda name: os.path.isdir(name))
+    assert r.route(f"open {os.getcwd()}") == "folder"
+    assert r.route("open notepad") == "generic"
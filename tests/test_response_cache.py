@@ -0,0 +1,49 @@
+import os
+import time
+
+from utils.response_cache import ResponseCache, normalize_query
+
+
+def test_normalize_query_drops_filler_words_only():
+    assert normalize_query("Please, list files!") == "list files"
+    assert normalize_query("wait for 5 seconds") == "wait for 5 seconds"
+
+
+def test_context_is_part_of_the_key(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.json"))
+    cache.put("list files", "```bash\nls\n```", context="/home/a")
+    assert cache.get("list files", "/home/a") is not None
+    assert cache.get("list files", "/home/b") is None
+    assert cache.get("please list files", "/home/a") is not None
+
+
+def test_changes_are_written_by_flush_not_by_lookups(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path, save_interval=60)
+    cache.put("first", "a")
+    cache.put("second", "b")
+    cache.get("first")
+    assert not os.path.exists(path)
+    cache.flush()
+    reloaded = ResponseCache(path)
+    # Least- to most-recently used, as left by the lookup
+    assert [entry["query"] for entry in reloaded.data.values()] == ["second", "first"]
+
+
+def test_changes_are_saved_in_the_background(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path, save_interval=0.05)
+    cache.put("list files", "ls")
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ResponseCache(path).get("list files") == "ls"
+
+
+def test_bounded_by_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.json"), max_entries=2)
+    for query in ("one", "two", "three"):
+        cache.put(query, query)
+    assert cache.get("one") is None
+    assert cache.stats()["entries"] == 2
+    cache.flush()
@@ -0,0 +1,58 @@
+import asyncio
+
+from executors.rawwick_executor import RawWickExecutor
+
+
+class NoFixes:
+    def get(self, code, lang):
+        return None
+
+    structural = similar = get
+
+    def add(self, original, fixed, lang):
+        self.added = fixed
+
+    def invalidate(self, original, fixed, lang):
+        pass
+
+
+class ScriptedExecutor(RawWickExecutor):
+    """Runs code by looking it up in `results`; fixes come from `fixes` by temperature."""
+
+    def __init__(self, results, fixes, **kwargs):
+        super().__init__(ai=None, fix_cache=NoFixes(), context_manager=None, **kwargs)
+        self.results, self.fixes, self.fix_requests = results, fixes, []
+
+    async def _execute_async(self, code, lang, timeout=None):
+        delay, outcome = self.results[code]
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    async def afix_code_with_ai(self, broken_code, error, temperature=None):
+        self.fix_requests.append(temperature)
+        return self.fixes[temperature]
+
+
+def test_fix_budget_starts_after_the_first_failure():
+    executor = ScriptedExecutor({"broken": (0.2, "Error: boom"), "fixed": (0, "ok")},
+                                {None: "fixed"}, fix_deadline=0.1)
+    assert asyncio.run(executor.arun_with_retry("broken", "python")) == "ok"
+    assert executor.fix_requests == [None]
+    assert executor.cache.added == "fixed"
+
+
+def test_candidate_timeout_counts_as_a_failed_candidate():
+    executor = ScriptedExecutor(
+        {"broken": (0, "Error: boom"), "hangs": (0, asyncio.TimeoutError()), "fixed": (0.05, "ok")},
+        {0.2: "hangs", 0.5: "fixed"}, race_candidates=2, fix_deadline=5)
+    assert asyncio.run(executor.arun_with_retry("broken", "python", max_retries=3)) == "ok"
+    assert executor.cache.added == "fixed"
+
+
+def test_race_stops_at_the_deadline():
+    executor = ScriptedExecutor({"broken": (0, "Error: boom"), "slow": (5, "ok")},
+                                {0.2: "slow", 0.5: "slow"}, race_candidates=2, fix_deadline=0.1)
+    output = asyncio.run(executor.arun_with_retry("broken", "python"))
+    assert "All attempts failed" in output
@@ -0,0 +1,126 @@
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import pytest
+
+from core.scheduler import CommandScheduler, PRIORITY_CONTROL, PRIORITY_EXIT, PRIORITY_NORMAL
+
+
+def dispatch(scheduler):
+    """Take the next command and track it as in flight, like Listen's processor loop."""
+    entry = scheduler.get_entry(timeout=0)
+    # Same shape as the Future from run_coroutine_threadsafe: pending until done
+    future = Future()
+    scheduler.track(entry, future)
+    return entry, future
+
+
+def drain(scheduler):
+    commands = []
+    while not scheduler.empty():
+        commands.append(scheduler.get(timeout=0))
+    return commands
+
+
+def test_classify():
+    scheduler = CommandScheduler()
+    assert scheduler.classify("cancel that") == PRIORITY_CONTROL
+    assert scheduler.classify("Never mind") == PRIORITY_CONTROL
+    assert scheduler.classify("exit") == PRIORITY_EXIT
+    assert scheduler.classify("list files") == PRIORITY_NORMAL
+
+
+def test_exit_runs_after_queued_work_and_closes_intake():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    scheduler.put("exit")
+    assert scheduler.put("open notepad") is None
+    assert drain(scheduler) == ["list files", "exit"]
+    assert scheduler.stats()["refused"] == 1
+
+
+def test_exit_leaves_in_flight_work_alone():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, running = dispatch(scheduler)
+    scheduler.put("show disk usage")
+    scheduler.put("quit")
+    assert not running.cancelled()
+    assert drain(scheduler) == ["show disk usage", "quit"]
+    assert scheduler.stats()["in_flight"] == 1
+    assert scheduler.stats()["cancelled_in_flight"] == 0
+
+
+def test_cancel_cancels_queued_and_in_flight_work():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, running = dispatch(scheduler)
+    scheduler.put("show disk usage")
+    scheduler.put("cancel")
+    assert running.cancelled()
+    assert drain(scheduler) == ["cancel"]
+    stats = scheduler.stats()
+    assert stats["cancelled_queued"] == 1
+    assert stats["cancelled_in_flight"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_cancel_is_accepted_after_exit():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, running = dispatch(scheduler)
+    scheduler.put("exit")
+    scheduler.put("abort")
+    assert running.cancelled()
+    assert drain(scheduler) == ["abort"]
+
+
+def test_identical_commands_coalesce():
+    scheduler = CommandScheduler()
+    first = scheduler.put("list files")
+    assert scheduler.put("please list files") is None
+    assert first.copies == 2
+    assert scheduler.qsize() == 1
+
+
+def test_coalesces_with_in_flight_command_until_it_finishes():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, future = dispatch(scheduler)
+    assert scheduler.put("list files") is None
+    future.set_result(None)
+    assert scheduler.put("list files") is not None
+
+
+def test_get_times_out():
+    with pytest.raises(queue.Empty):
+        CommandScheduler().get(timeout=0.01)
+
+
+def test_join_waits_for_in_flight_work_after_exit():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, running = dispatch(scheduler)
+    scheduler.put("exit")
+    timer = threading.Timer(0.1, running.set_result, ("done",))
+    timer.start()
+    started = time.monotonic()
+    assert scheduler.join(timeout=5)
+    assert time.monotonic() - started >= 0.05
+    assert running.result() == "done"
+    timer.join()
+
+
+def test_join_times_out_while_work_is_running():
+    scheduler = CommandScheduler()
+    scheduler.put("list files")
+    _, running = dispatch(scheduler)
+    assert not scheduler.join(timeout=0.05)
+    running.set_result(None)
+    assert scheduler.join(timeout=0)
+
+
+def test_join_returns_at_once_when_idle():
+    assert CommandScheduler().join(timeout=0)
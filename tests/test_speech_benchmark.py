@@ -0,0 +1,15 @@
+import pytest
+
+from utils.speech_benchmark import offline_backend, word_errors
+
+
+def test_word_errors():
+    assert word_errors("open the file", "Open the file!") == (0, 3)
+    assert word_errors("open the file", "open file now") == (2, 3)
+
+
+def test_default_backend_needs_a_local_model(monkeypatch):
+    monkeypatch.delenv("RAWWICK_SPEECH_BACKEND", raising=False)
+    monkeypatch.delenv("VOSK_MODEL_PATH", raising=False)
+    with pytest.raises(ValueError, match="VOSK_MODEL_PATH"):
+        offline_backend()
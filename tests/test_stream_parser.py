@@ -0,0 +1,44 @@
+import pytest
+
+from executors.rawwick_executor import CodeBlockStreamParser, RawWickExecutor
+
+RESPONSE = (
+    "Here you go:\n"
+    "```python\nprint('hi')\n```\n"
+    "Then:\n"
+    "```\nls -la\n```\n"
+    "And a tagged one:\n"
+    "```PowerShell \nGet-ChildItem\n```\n"
+)
+BLOCKS = [("print('hi')\n", "python"), ("ls -la\n", ""), ("Get-ChildItem\n", "powershell")]
+
+
+def feed_in_chunks(text, size):
+    parser = CodeBlockStreamParser()
+    blocks = []
+    for i in range(0, len(text), size):
+        blocks.extend(parser.feed(text[i:i + size]))
+    return blocks
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(RESPONSE)])
+def test_blocks_are_the_same_however_the_response_is_chunked(size):
+    assert feed_in_chunks(RESPONSE, size) == BLOCKS
+
+
+def test_block_is_returned_by_the_chunk_that_closes_it():
+    parser = CodeBlockStreamParser()
+    assert parser.feed("```bash\necho one\n") == []
+    assert parser.feed("``") == []
+    assert parser.feed("`\n```bash\necho two") == [("echo one\n", "bash")]
+    assert parser.feed("\n```") == [("echo two\n", "bash")]
+
+
+def test_unclosed_block_is_not_returned():
+    assert feed_in_chunks("text ```python\nprint(1)\n", 4) == []
+
+
+def test_complete_responses_use_the_same_fence_grammar():
+    extract = RawWickExecutor.extract_code_blocks
+    assert extract(RESPONSE) == [code for code, _ in BLOCKS]
+    assert extract("no code here") == []
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import urllib.request
+
+import pytest
+
+from models.groq import parse_sse_line
+from utils.tracing import Tracer
+
+STREAM = [
+    'data: {"choices": [{"delta": {"content": "ls"}}]}',
+    'data: {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 3}}',
+    "data: [DONE]",
+]
+
+
+def test_stream_usage_is_parsed_from_the_last_chunk():
+    usage = {}
+    assert [parse_sse_line(line, usage) for line in STREAM] == [(False, "ls"), (False, None), (True, None)]
+    assert usage == {"prompt_tokens": 12, "completion_tokens": 3}
+
+
+def test_stream_span_records_token_counts(tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    tracer = Tracer(str(trace_file))
+    usage = {}
+
+    async def chunks():
+        for line in STREAM:
+            done, delta = parse_sse_line(line, usage)
+            if done:
+                return
+            if delta:
+                yield delta
+
+    async def consume():
+        span = tracer.begin("llm_request")
+        return [chunk async for chunk in tracer.atrace_stream(chunks(), span, usage)]
+
+    assert asyncio.run(consume()) == ["ls"]
+    tracer.configure(None)
+    record = json.loads(trace_file.read_text().splitlines()[-1])
+    assert (record["prompt_tokens"], record["completion_tokens"]) == (12, 3)
+    assert 'rawwick_llm_tokens_total{kind="completion"} 3' in tracer.prometheus()
+
+
+def test_span_without_usage_has_no_token_counts():
+    tracer = Tracer()
+    span = tracer.begin("llm_request")
+    tracer.record_usage(span, {})
+    assert "prompt_tokens" not in span.attrs
+
+
+def test_metrics_are_only_served_on_loopback():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        tracer.serve("0.0.0.0:0")
+    server = tracer.serve("127.0.0.1:0")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from executors.worker_pool import PythonWorkerPool, _recv_frame, _send_frame
+
+
+def test_frames_round_trip():
+    stream = io.BytesIO()
+    _send_frame(stream, ("print(1)", False, "/tmp"))
+    _send_frame(stream, {"ok": True})
+    stream.seek(0)
+    assert _recv_frame(stream) == ("print(1)", False, "/tmp")
+    assert _recv_frame(stream) == {"ok": True}
+    with pytest.raises(EOFError):
+        _recv_frame(stream)
+
+
+def test_truncated_frame_is_eof():
+    stream = io.BytesIO()
+    _send_frame(stream, "x" * 100)
+    stream = io.BytesIO(stream.getvalue()[:20])
+    with pytest.raises(EOFError):
+        _recv_frame(stream)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = PythonWorkerPool(size=1, preload=())
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_code_and_captures_output(pool):
+    result = pool.run("print('hello')", timeout=20)
+    assert result.ok and result.stdout.strip() == "hello"
+
+
+def test_error_and_timeout(pool):
+    assert not pool.run("raise ValueError('nope')", timeout=20).ok
+    result = pool.run("import time\ntime.sleep(5)", timeout=0.5)
+    assert result.timed_out
+    assert pool.run("print('fresh')", timeout=20).stdout.strip() == "fresh"
@@ -0,0 +1,22 @@
+"""
+Helpers for the local HTTP endpoints (the daemon API and the metrics
+server), which only serve loopback clients unless told otherwise.
+"""
+import ipaddress
+
+
+def host_name(host: str) -> str:
+    """The host part of a "host[:port]" Host header or bind address."""
+    if host.startswith("["):
+        return host[1:].split("]")[0]
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+def is_loopback(host: str) -> bool:
+    """Whether a host name or address only reaches this machine."""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
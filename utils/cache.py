@@ -1,63 +1,586 @@
+from typing import Dict, Iterator, List, Optional, Tuple
 import json
 import os
+import sqlite3
+import threading
+import time
+from utils.code_normalize import code_tokens, detect_lang, structural_key
+from utils.similarity import MinHashIndex
+
+
+class FixStore:
+    """
+    Storage backend interface for FixCache.
+
+    A backend maps a broken snippet (the key) to its fixed version. Backends
+    must be safe to call from several threads at once. Lookups that hit
+    should update the entry's hit count and last-hit time, which eviction
+    uses. A platform given to a lookup excludes fixes recorded on another
+    platform, and the same snippet may have a different fix per platform.
+    """
+    def get(self, key: str, platform: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def get_structural(self, struct_key: str, platform: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def put(self, key: str, fixed: str, struct_key: Optional[str] = None, platform: Optional[str] = None,
+            lang: Optional[str] = None) -> Tuple[int, int]:
+        """Insert or replace a fix; return the change in (entry count, bytes)."""
+        raise NotImplementedError
+
+    def put_many(self, items: Dict[str, str]):
+        for key, fixed in items.items():
+            self.put(key, fixed, structural_key(key))
+
+    def delete(self, key: str, platform: Optional[str] = None):
+        raise NotImplementedError
+
+    def delete_fix(self, struct_key: str, fixed: str, platform: Optional[str] = None):
+        raise NotImplementedError
+
+    def usage(self) -> Tuple[int, int]:
+        """Return (entry count, total bytes of keys and fixes)."""
+        raise NotImplementedError
+
+    def evict(self, max_entries: int, max_bytes: int, policy: str = "lru") -> List[str]:
+        """Drop entries until within both limits; return the evicted keys."""
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        raise NotImplementedError
+
+    def langs(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """Return (key, lang) pairs; lang is None where it wasn't recorded."""
+        return ((key, None) for key, _ in self.items())
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JSONFixStore(FixStore):
+    """
+    The original whole-file JSON backend.
+
+    Every write rewrites the file, so it's only suitable for small caches.
+    Kept for setups that want a human-readable cache file. It keeps no hit
+    metadata, platform scope or language, and evicts in least-recently-used order
+    whatever the policy.
+    """
+    def __init__(self, path="fix_cache.json"):
+        """
+        Initialize the store and load the file if it exists.
+
+        Args:
+            path: The JSON file backing the store
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.data: Dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+        self.structural = {structural_key(k): v for k, v in self.data.items()}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str, platform: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            fixed = self.data.pop(key, None)
+            if fixed is not None:
+                self.data[key] = fixed  # Most recently used entries stay last
+            return fixed
+
+    def get_structural(self, struct_key: str, platform: Optional[str] = None) -> Optional[str]:
+        return self.structural.get(struct_key)
+
+    def put(self, key: str, fixed: str, struct_key: Optional[str] = None, platform: Optional[str] = None,
+            lang: Optional[str] = None) -> Tuple[int, int]:
+        with self._lock:
+            old = self.data.pop(key, None)
+            self.data[key] = fixed
+            self.structural[struct_key or structural_key(key)] = fixed
+            self._save()
+        if old is None:
+            return 1, len(key) + len(fixed)
+        return 0, len(fixed) - len(old)
+
+    def put_many(self, items: Dict[str, str]):
+        with self._lock:
+            self.data.update(items)
+            self.structural.update((structural_key(k), v) for k, v in items.items())
+            self._save()
+
+    def delete(self, key: str, platform: Optional[str] = None):
+        with self._lock:
+            if self.data.pop(key, None) is not None:
+                self.structural.pop(structural_key(key), None)
+                self._save()
+
+    def delete_fix(self, struct_key: str, fixed: str, platform: Optional[str] = None):
+        with self._lock:
+            stale = [k for k, v in self.data.items() if v == fixed and structural_key(k) == struct_key]
+            for key in stale:
+                del self.data[key]
+            if self.structural.get(struct_key) == fixed:
+                del self.structural[struct_key]
+            if stale:
+                self._save()
+
+    def usage(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self.data), sum(len(k) + len(v) for k, v in self.data.items())
+
+    def evict(self, max_entries: int, max_bytes: int, policy: str = "lru") -> List[str]:
+        evicted = []
+        with self._lock:
+            size = sum(len(k) + len(v) for k, v in self.data.items())
+            while self.data and (len(self.data) > max_entries or size > max_bytes):
+                key = next(iter(self.data))
+                size -= len(key) + len(self.data.pop(key))
+                self.structural.pop(structural_key(key), None)
+                evicted.append(key)
+            if evicted:
+                self._save()
+        return evicted
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return iter(list(self.data.items()))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class SQLiteFixStore(FixStore):
+    """
+    SQLite backend running in WAL mode.
+
+    Inserts are single-row upserts against an indexed primary key, so their
+    cost doesn't grow with the cache, and opening the store doesn't read it.
+    Each thread gets its own connection; WAL plus a busy timeout lets
+    several threads and agent processes share one database file. Every row
+    carries its size, hit count, last-hit time, and the platform and
+    language it was recorded with.
+    """
+    def __init__(self, path="fix_cache.db", busy_timeout: float = 5.0):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            path: The SQLite database file
+            busy_timeout: Seconds to wait for a lock held by another writer
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(self._CREATE_TABLE.format(table="fixes"))
+            self._add_columns(conn, {
+                "struct_key": "TEXT",
+                "platform": "TEXT NOT NULL DEFAULT ''",
+                "hits": "INTEGER NOT NULL DEFAULT 0",
+                "last_hit": "REAL",
+                "size": "INTEGER NOT NULL DEFAULT 0",
+                "lang": "TEXT",
+            })
+            self._migrate_primary_key(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS fixes_struct_key ON fixes (struct_key)")
+            conn.execute("UPDATE fixes SET size = length(key) + length(fixed) WHERE size = 0")
+
+    # Rows without a platform (recorded before fixes were scoped) use ''
+    # rather than NULL, since NULLs never conflict in a primary key
+    _CREATE_TABLE = (
+        "CREATE TABLE IF NOT EXISTS {table} ("
+        " key TEXT NOT NULL,"
+        " fixed TEXT NOT NULL,"
+        " updated REAL NOT NULL,"
+        " struct_key TEXT,"
+        " platform TEXT NOT NULL DEFAULT '',"
+        " hits INTEGER NOT NULL DEFAULT 0,"
+        " last_hit REAL,"
+        " size INTEGER NOT NULL DEFAULT 0,"
+        " lang TEXT,"
+        " PRIMARY KEY (key, platform))"
+    )
+    _COLUMNS = "key, fixed, updated, struct_key, platform, hits, last_hit, size, lang"
+
+    def _add_columns(self, conn: sqlite3.Connection, columns: Dict[str, str]):
+        """Add columns introduced after a database was first created."""
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(fixes)")}
+        for name, decl in columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE fixes ADD COLUMN {name} {decl}")
+
+    def _migrate_primary_key(self, conn: sqlite3.Connection):
+        """Rebuild tables keyed on the snippet alone so each platform keeps its own fix."""
+        key_columns = {row[1] for row in conn.execute("PRAGMA table_info(fixes)") if row[5]}
+        if "platform" in key_columns:
+            return
+        # Check again under the write lock: another process may have migrated meanwhile
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        key_columns = {row[1] for row in conn.execute("PRAGMA table_info(fixes)") if row[5]}
+        if "platform" in key_columns:
+            return
+        conn.execute("DROP TABLE IF EXISTS fixes_migrating")
+        conn.execute(self._CREATE_TABLE.format(table="fixes_migrating"))
+        conn.execute(
+            f"INSERT INTO fixes_migrating ({self._COLUMNS}) "
+            "SELECT key, fixed, updated, struct_key, COALESCE(platform, ''), hits, last_hit, size, lang "
+            "FROM fixes"
+        )
+        conn.execute("DROP TABLE fixes")
+        conn.execute("ALTER TABLE fixes_migrating RENAME TO fixes")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Rows recorded on another platform don't match; legacy rows have no platform.
+    # A row recorded on this very platform wins over a legacy one.
+    _PLATFORM_MATCH = "(? IS NULL OR platform = '' OR platform = ?)"
+    _PLATFORM_ORDER = "platform = ? DESC"
+
+    def _hit(self, conn: sqlite3.Connection, key: str, platform: str):
+        conn.execute("UPDATE fixes SET hits = hits + 1, last_hit = ? WHERE key = ? AND platform = ?",
+                     (time.time(), key, platform))
+
+    def get(self, key: str, platform: Optional[str] = None) -> Optional[str]:
+        with self._conn() as conn:
+            row = conn.execute(
+                f"SELECT platform, fixed FROM fixes WHERE key = ? AND {self._PLATFORM_MATCH} "
+                f"ORDER BY {self._PLATFORM_ORDER} LIMIT 1", (key, platform, platform, platform)
+            ).fetchone()
+            if row:
+                self._hit(conn, key, row[0])
+        return row[1] if row else None
+
+    def get_structural(self, struct_key: str, platform: Optional[str] = None) -> Optional[str]:
+        with self._conn() as conn:
+            row = conn.execute(
+                f"SELECT key, platform, fixed FROM fixes WHERE struct_key = ? AND {self._PLATFORM_MATCH} "
+                f"ORDER BY {self._PLATFORM_ORDER}, updated DESC LIMIT 1", (struct_key, platform, platform, platform)
+            ).fetchone()
+            if row:
+                self._hit(conn, row[0], row[1])
+        return row[2] if row else None
+
+    _UPSERT = (
+        "INSERT INTO fixes (key, fixed, updated, struct_key, platform, size, lang) VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(key, platform) DO UPDATE SET fixed = excluded.fixed, updated = excluded.updated, "
+        "struct_key = excluded.struct_key, size = excluded.size, lang = excluded.lang"
+    )
+
+    def put(self, key: str, fixed: str, struct_key: Optional[str] = None, platform: Optional[str] = None,
+            lang: Optional[str] = None) -> Tuple[int, int]:
+        size = len(key) + len(fixed)
+        with self._conn() as conn:
+            old = conn.execute("SELECT size FROM fixes WHERE key = ? AND platform = ?",
+                               (key, platform or "")).fetchone()
+            conn.execute(self._UPSERT, (key, fixed, time.time(), struct_key or structural_key(key, lang),
+                                        platform or "", size, lang))
+        return (1, size) if old is None else (0, size - old[0])
+
+    def put_many(self, items: Dict[str, str]):
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                self._UPSERT,
+                [(key, fixed, now, structural_key(key), "", len(key) + len(fixed), None)
+                 for key, fixed in items.items()],
+            )
+
+    def delete(self, key: str, platform: Optional[str] = None):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM fixes WHERE key = ? AND {self._PLATFORM_MATCH}", (key, platform, platform))
+
+    def delete_fix(self, struct_key: str, fixed: str, platform: Optional[str] = None):
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM fixes WHERE struct_key = ? AND fixed = ? AND {self._PLATFORM_MATCH}",
+                         (struct_key, fixed, platform, platform))
+
+    def usage(self) -> Tuple[int, int]:
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fixes").fetchone()
+        return count, size
+
+    _EVICTION_ORDER = {
+        "lru": "COALESCE(last_hit, updated) ASC",
+        "lfu": "hits ASC, COALESCE(last_hit, updated) ASC",
+    }
+
+    def evict(self, max_entries: int, max_bytes: int, policy: str = "lru") -> List[str]:
+        order = self._EVICTION_ORDER[policy]
+        with self._conn() as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fixes").fetchone()
+            if count <= max_entries and size <= max_bytes:
+                return []
+            evicted = []
+            for key, platform, row_size in conn.execute(f"SELECT key, platform, size FROM fixes ORDER BY {order}"):
+                if count <= max_entries and size <= max_bytes:
+                    break
+                evicted.append((key, platform))
+                count -= 1
+                size -= row_size
+            conn.executemany("DELETE FROM fixes WHERE key = ? AND platform = ?", evicted)
+        return [key for key, _ in evicted]
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return iter(self._conn().execute("SELECT key, fixed FROM fixes").fetchall())
+
+    def langs(self) -> Iterator[Tuple[str, Optional[str]]]:
+        return iter(self._conn().execute("SELECT DISTINCT key, lang FROM fixes").fetchall())
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
 
 class FixCache:
     """
     A simple caching system for RawWick to store and retrieve fixed code snippets.
-    
+
     This class provides persistent storage of code fixes, allowing RawWick to
     remember solutions to common problems and apply them automatically in
-    future sessions.
+    future sessions. Storage is pluggable; the default is an SQLite database,
+    and an existing fix_cache.json is migrated into it on first use.
+
+    The cache is bounded by entry count and total size, evicting least
+    recently (LRU) or least frequently (LFU) hit fixes first. Fixes are
+    scoped to the platform fingerprint they were recorded on, and a fix
+    that stops working can be dropped with invalidate. The similarity index
+    behind similar() is built from the store in a background thread when
+    the cache is opened.
     """
-    def __init__(self, path="fix_cache.json"):
+    def __init__(self, path="fix_cache.db", store: Optional[FixStore] = None,
+                 legacy_path="fix_cache.json", fingerprint: Optional[str] = None,
+                 max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, policy: str = "lru"):
         """
-        Initialize the cache with a file path.
-        
+        Initialize the cache with a storage backend.
+
         Args:
-            path: The file path where cache data will be stored
+            path: The SQLite database file, used when no store is given
+            store: A storage backend to use instead of the default SQLite one
+            legacy_path: JSON cache file from older versions to migrate
+            fingerprint: Platform fingerprint fixes are recorded and looked up under
+            max_entries: Maximum number of cached fixes
+            max_bytes: Maximum total size of cached code in bytes
+            policy: Eviction policy, "lru" or "lfu"
         """
-        
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
         self.path = path
-        self.data = self.load()
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.store = store or SQLiteFixStore(path)
+        if legacy_path and not isinstance(self.store, JSONFixStore):
+            self.migrate(legacy_path)
+        self._index = MinHashIndex()
+        self.index_ready = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "misses": 0, "structural_hits": 0, "structural_misses": 0,
+                       "similar_hits": 0, "similar_misses": 0, "lookup_time": 0.0,
+                       "evictions": 0, "invalidations": 0}
+        # Usage is read once and then tracked locally, so inserts don't rescan the table
+        self._usage: Optional[List[int]] = None
+        threading.Thread(target=self._build_index, name="fix-cache-index", daemon=True).start()
+
+    def migrate(self, legacy_path: str):
+        """
+        Import a JSON cache file from older versions, once.
+
+        The file is renamed afterwards so the import doesn't run again.
+
+        Args:
+            legacy_path: Path to the old fix_cache.json
+        """
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.store.put_many({k.strip(): v.strip() for k, v in data.items()})
+        try:
+            os.replace(legacy_path, f"{legacy_path}.migrated")
+        except OSError:
+            # Another agent process migrated it at the same time
+            pass
+
+    def _timed(self, kind: str, started: float):
+        with self._stats_lock:
+            self._stats[kind] += 1
+            self._stats["lookup_time"] += time.perf_counter() - started
 
-    def load(self):
+    def get(self, code: str, lang: Optional[str] = None):
         """
-        Load the cache data from disk.
-        
+        Retrieve a fixed version of code from the cache.
+
+        Only an exact match counts: a fix returned here is applied before
+        the code itself runs, so it must have been recorded for this very
+        snippet. Look-alike snippets are served by structural() and
+        similar() instead.
+
+        Args:
+            code: The broken code to look up
+            lang: "python" or "bash"; detected when omitted
+
         Returns:
-            The loaded cache data, or an empty dict if the file doesn't exist
+            The fixed code if found, otherwise None
         """
-        if os.path.exists(self.path):
-            with open(self.path, "r") as f:
-                return json.load(f)
-        return {}
+        started = time.perf_counter()
+        fixed = self.store.get(code.strip(), self.fingerprint)
+        self._timed("exact_hits" if fixed is not None else "misses", started)
+        return fixed
 
-    def save(self):
+    def structural(self, code: str, lang: Optional[str] = None) -> Optional[str]:
         """
-        Save the current cache data to disk.
+        Find the fix of a structurally identical cached snippet.
+
+        The match ignores whitespace, comments, variable names and string
+        literals, so the fix may carry another snippet's literals (a fix
+        recorded for opening "notepad" would open it for "calc" too). Like
+        similar(), the result is only a candidate to try once the code
+        itself has failed, and to trust once it runs cleanly.
+
+        Args:
+            code: The broken code to look up
+            lang: "python" or "bash"; detected when omitted
+
+        Returns:
+            A candidate fix, or None if no snippet has the same structure
         """
-        with open(self.path, "w") as f:
-            json.dump(self.data, f, indent=2)
+        started = time.perf_counter()
+        fixed = self.store.get_structural(structural_key(code.strip(), lang), self.fingerprint)
+        self._timed("structural_hits" if fixed is not None else "structural_misses", started)
+        return fixed
+
+    @staticmethod
+    def _tokens(code: str, lang: Optional[str]) -> List[str]:
+        # Snippets stored and looked up without a language are detected the
+        # same way on both sides, so equal code always gets equal tokens
+        return code_tokens(code, lang or detect_lang(code))
 
-    def get(self, code: str):
+    def _build_index(self):
+        """Index every stored snippet; similar() finds nothing for snippets not indexed yet."""
+        try:
+            for key, lang in self.store.langs():
+                # A snippet invalidated meanwhile may be re-added; similar()
+                # then misses it in the store, which is harmless
+                self._index.add(key, self._tokens(key, lang))
+        finally:
+            self.index_ready.set()
+
+    def similar(self, code: str, lang: Optional[str] = None, threshold: float = 0.7) -> Optional[str]:
         """
-        Retrieve a fixed version of code from the cache.
-        
+        Find the fix of the most similar cached snippet.
+
+        The result is only a candidate: it fixed code that looks like this
+        one, so it should be validated by running it before it is trusted.
+
         Args:
             code: The broken code to look up
-            
+            lang: "python" or "bash"; detected when omitted
+            threshold: Minimum estimated token similarity
+
         Returns:
-            The fixed code if found, otherwise None
+            A candidate fix, or None if nothing is close enough
         """
-        return self.data.get(code.strip())
+        started = time.perf_counter()
+        code = code.strip()
+        match = self._index.query(self._tokens(code, lang), threshold)
+        fixed = self.store.get(match[0], self.fingerprint) if match else None
+        self._timed("similar_hits" if fixed is not None else "similar_misses", started)
+        return fixed
 
-    def add(self, broken_code: str, fixed_code: str):
+    def add(self, broken_code: str, fixed_code: str, lang: Optional[str] = None):
         """
         Add a new code fix to the cache.
-        
+
         Args:
             broken_code: The problematic code
             fixed_code: The corrected version of the code
+            lang: "python" or "bash"; detected when omitted
+        """
+        key = broken_code.strip()
+        fixed = fixed_code.strip()
+        added = self.store.put(key, fixed, structural_key(key, lang), self.fingerprint, lang)
+        self._index.add(key, self._tokens(key, lang))
+        self._enforce_bounds(*added)
+
+    def _enforce_bounds(self, added_entries: int, added_bytes: int):
+        """Evict once the locally tracked usage goes over a limit."""
+        with self._stats_lock:
+            if self._usage is None:
+                self._usage = list(self.store.usage())
+            else:
+                self._usage[0] += added_entries
+                self._usage[1] += added_bytes
+            if self._usage[0] <= self.max_entries and self._usage[1] <= self.max_bytes:
+                return
+        # Evict down to 90% of the limits so eviction runs in batches, not per insert
+        evicted = self.store.evict(int(self.max_entries * 0.9), int(self.max_bytes * 0.9), self.policy)
+        for key in evicted:
+            self._index.remove(key)
+        with self._stats_lock:
+            self._stats["evictions"] += len(evicted)
+            self._usage = list(self.store.usage())
+
+    def invalidate(self, code: str, fixed: Optional[str] = None, lang: Optional[str] = None):
+        """
+        Drop fixes that turned out not to work.
+
+        Args:
+            code: The broken code the fix was looked up for
+            fixed: The fix that failed; any entry structurally matching
+                   the code with this fix is dropped too
+            lang: "python" or "bash"; detected when omitted
+        """
+        key = code.strip()
+        self.store.delete(key, self.fingerprint)
+        if fixed is not None:
+            self.store.delete_fix(structural_key(key, lang), fixed.strip(), self.fingerprint)
+        self._index.remove(key)
+        with self._stats_lock:
+            self._stats["invalidations"] += 1
+            self._usage = None
+
+    def stats(self) -> Dict:
         """
-        self.data[broken_code.strip()] = fixed_code.strip()
-        self.save()
\ No newline at end of file
+        Get lookup, eviction and invalidation counters, hit rate and average
+        lookup latency.
+
+        Returns:
+            A dictionary of cache statistics
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["misses"]
+        candidates = (stats["structural_hits"] + stats["structural_misses"]
+                      + stats["similar_hits"] + stats["similar_misses"])
+        stats["hit_rate"] = stats["exact_hits"] / lookups if lookups else 0.0
+        stats["avg_lookup_ms"] = (stats.pop("lookup_time") * 1000 / (lookups + candidates)
+                                  if lookups + candidates else 0.0)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self.store)
@@ -0,0 +1,199 @@
+from typing import List, Optional
+import ast
+import builtins
+import hashlib
+import io
+import keyword
+import shlex
+import tokenize
+
+_BUILTINS = frozenset(dir(builtins))
+_SHELL_PUNCT = "();<>|&"
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    """Renames local identifiers by order of appearance and blanks string literals."""
+
+    def __init__(self, keep: set):
+        self.keep = keep
+        self.names = {}
+
+    def _rename(self, name: str) -> str:
+        if name in self.keep or name in _BUILTINS:
+            return name
+        if name not in self.names:
+            self.names[name] = f"v{len(self.names)}"
+        return self.names[name]
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        node.annotation = None
+        return node
+
+    def visit_FunctionDef(self, node):
+        node.name = self._rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        node.name = self._rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, (str, bytes)):
+            return ast.copy_location(ast.Constant(value="S"), node)
+        return node
+
+    def visit_JoinedStr(self, node):
+        return ast.copy_location(ast.Constant(value="S"), node)
+
+
+def _imported_names(tree: ast.AST) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+    return names
+
+
+def canonical_python(code: str) -> Optional[str]:
+    """
+    Canonical form of a Python snippet.
+
+    Whitespace, comments, local variable/function names and string literals
+    don't affect the result; imports, attributes, calls and structure do.
+
+    Args:
+        code: The Python source
+
+    Returns:
+        The canonical AST dump, or None if the code doesn't parse
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    tree = _Canonicalizer(_imported_names(tree)).visit(tree)
+    return ast.dump(tree, annotate_fields=False)
+
+
+def shell_tokens(code: str) -> List[str]:
+    """
+    Tokenize a shell snippet with comments dropped and quoted strings blanked.
+
+    Args:
+        code: The shell source
+
+    Returns:
+        The token stream
+    """
+    lexer = shlex.shlex(code, posix=False, punctuation_chars=_SHELL_PUNCT)
+    lexer.whitespace_split = True
+    lexer.commenters = "#"
+    try:
+        words = list(lexer)
+    except ValueError:
+        words = code.split()
+    return ["S" if w[:1] in ("'", '"') else w for w in words]
+
+
+def python_tokens(code: str) -> Optional[List[str]]:
+    """
+    Tokenize a Python snippet with comments dropped, strings blanked and
+    local names replaced by placeholders.
+
+    Imported names, attributes and builtins are kept, since they carry most
+    of what the snippet does.
+
+    Args:
+        code: The Python source
+
+    Returns:
+        The token stream, or None if the code can't be tokenized
+    """
+    tokens = []
+    names = {}
+    imported = set()
+    in_import = False
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in (tokenize.NL, tokenize.NEWLINE):
+                in_import = False
+            if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+                            tokenize.DEDENT, tokenize.ENDMARKER):
+                continue
+            text = tok.string
+            if tok.type == tokenize.STRING:
+                text = "S"
+            elif tok.type == tokenize.NAME:
+                if text in ("import", "from"):
+                    in_import = True
+                elif in_import:
+                    imported.add(text)
+                elif not (keyword.iskeyword(text) or text in _BUILTINS or text in imported
+                          or (tokens and tokens[-1] == ".")):
+                    text = names.setdefault(text, f"v{len(names)}")
+            tokens.append(text)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    return tokens
+
+
+def detect_lang(code: str) -> str:
+    """
+    Guess whether a snippet is Python or shell.
+
+    Args:
+        code: The snippet
+
+    Returns:
+        "python" if it parses as Python, otherwise "bash"
+    """
+    try:
+        ast.parse(code)
+        return "python"
+    except (SyntaxError, ValueError):
+        return "bash"
+
+
+def structural_key(code: str, lang: Optional[str] = None) -> str:
+    """
+    Build a cache key that ignores formatting, naming and literal differences.
+
+    Args:
+        code: The snippet
+        lang: "python" or "bash"; detected when omitted
+
+    Returns:
+        A short prefixed digest, e.g. "py:3f2a..." or "sh:91bc..."
+    """
+    lang = lang or detect_lang(code)
+    canonical = canonical_python(code) if lang == "python" else None
+    if canonical is not None:
+        prefix = "py"
+    else:
+        prefix, canonical = "sh", " ".join(shell_tokens(code))
+    return f"{prefix}:{hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20]}"
+
+
+def code_tokens(code: str, lang: Optional[str] = None) -> List[str]:
+    """
+    Token stream used for similarity matching.
+
+    Args:
+        code: The snippet
+        lang: "python" or "bash"; detected when omitted
+
+    Returns:
+        The snippet's tokens with comments dropped and strings blanked
+    """
+    tokens = python_tokens(code) if (lang or detect_lang(code)) == "python" else None
+    return tokens if tokens is not None else shell_tokens(code)
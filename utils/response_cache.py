@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Words that never change what a spoken command asks for: politeness,
+# hesitations and the wake phrase. Words like "for", "now" or "me" can
+# ("wait for 5 seconds", "what can you do"), so they are kept.
+FILLER_WORDS = frozenset({
+    "please", "kindly", "um", "uh", "er", "erm", "hmm", "hey", "rawwick",
+})
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Reduce a spoken command to a canonical form for cache lookups.
+
+    Lowercases the query, strips punctuation and drops filler words, so
+    "Please, list files!" and "list files" share a cache entry.
+
+    Args:
+        query: The raw command text
+
+    Returns:
+        The normalized command
+    """
+    words = _PUNCTUATION_RE.sub(" ", query.lower()).split()
+    kept = [w for w in words if w not in FILLER_WORDS]
+    return " ".join(kept or words)
+
+
+class ResponseCache:
+    """
+    Persistent query-to-response cache placed in front of the LLM.
+
+    Responses are keyed on the normalized command, the platform fingerprint
+    (generated code is only valid for the platform it was generated for)
+    and a context fingerprint supplied by the caller, e.g. the working
+    directory and the history the prompt included. Entries expire after a
+    TTL, and the cache is bounded by entry count and total size with
+    least-recently-used eviction.
+
+    Lookups and inserts only change memory. Changes are written out by a
+    background timer `save_interval` seconds after the first unsaved one,
+    and by flush() at shutdown, so callers on an event loop never wait on
+    the disk and eviction order still survives restarts.
+    """
+    def __init__(self, path="response_cache.json", fingerprint: str = "", ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 256, max_bytes: int = 1024 * 1024, save_interval: float = 30.0):
+        """
+        Initialize the cache and load any entries saved on disk.
+
+        Args:
+            path: The file path where cache data will be stored
+            fingerprint: Platform fingerprint mixed into every key
+            ttl: Seconds an entry stays valid
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses in bytes
+            save_interval: Seconds unsaved changes wait before being written out
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.data: "OrderedDict[str, Dict]" = self.load()
+        self._bytes = sum(len(e["response"]) for e in self.data.values())
+
+    def key(self, query: str, context: str = "") -> str:
+        """
+        Build the cache key for a command.
+
+        Args:
+            query: The raw command text
+            context: Fingerprint of the context the response depends on
+
+        Returns:
+            A hex digest of the normalized command, platform and context
+        """
+        raw = f"{normalize_query(query)}|{self.fingerprint}|{context}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def load(self) -> "OrderedDict[str, Dict]":
+        """
+        Load the cache data from disk, dropping expired entries.
+
+        Returns:
+            The loaded entries in least- to most-recently-used order
+        """
+        if not os.path.exists(self.path):
+            return OrderedDict()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return OrderedDict()
+        now = time.time()
+        return OrderedDict(
+            (k, e) for k, e in sorted(entries.items(), key=lambda item: item[1]["used"])
+            if now - e["created"] < self.ttl
+        )
+
+    def save(self):
+        """
+        Save the current cache data to disk atomically.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                snapshot = {k: dict(e) for k, e in self.data.items()}
+            # Written outside _lock so lookups don't wait on the disk
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """
+        Save changes not written out yet, e.g. at shutdown.
+        """
+        with self._lock:
+            dirty = self._timer is not None
+        if dirty:
+            self.save()
+
+    def _autosave(self):
+        try:
+            self.save()
+        except OSError:
+            pass
+
+    def _mark_dirty(self):
+        # Called with _lock held; one pending timer covers every change until it fires
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_interval, self._autosave)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _remove(self, key: str):
+        entry = self.data.pop(key, None)
+        if entry:
+            self._bytes -= len(entry["response"])
+
+    def get(self, query: str, context: str = "") -> Optional[str]:
+        """
+        Look up the cached response for a command.
+
+        Args:
+            query: The raw command text
+            context: Fingerprint of the context the response depends on
+
+        Returns:
+            The cached response if present and fresh, otherwise None
+        """
+        key = self.key(query, context)
+        with self._lock:
+            entry = self.data.get(key)
+            if entry and time.time() - entry["created"] >= self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["used"] = time.time()
+            self.data.move_to_end(key)
+            self.hits += 1
+            self._mark_dirty()
+            return entry["response"]
+
+    def put(self, query: str, response: str, context: str = ""):
+        """
+        Cache the response generated for a command.
+
+        Args:
+            query: The raw command text
+            response: The AI response that handled it successfully
+            context: Fingerprint of the context the response depends on
+        """
+        if len(response) > self.max_bytes:
+            return
+        key = self.key(query, context)
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            self.data[key] = {"query": normalize_query(query), "response": response,
+                              "created": now, "used": now}
+            self._bytes += len(response)
+            while len(self.data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self.data)))
+            self._mark_dirty()
+
+    def invalidate(self, query: str, context: str = ""):
+        """
+        Drop the cached response for a command, e.g. after it failed to run.
+
+        Args:
+            query: The raw command text
+            context: Fingerprint of the context the response depends on
+        """
+        key = self.key(query, context)
+        with self._lock:
+            if key in self.data:
+                self._remove(key)
+                self._mark_dirty()
+
+    def stats(self) -> Dict:
+        """
+        Get hit/miss counters and the current cache size.
+
+        Returns:
+            A dictionary of cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,127 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Set, Tuple
+import random
+import threading
+import zlib
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive index for finding near-duplicate token streams.
+
+    Each document is reduced to a MinHash signature over token shingles, and
+    the signature is split into bands that are bucketed separately (LSH), so
+    a lookup only compares against documents sharing at least one band
+    instead of scanning everything.
+    """
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize an empty index.
+
+        Args:
+            num_perm: Number of hash permutations in each signature
+            bands: Number of LSH bands; num_perm must divide evenly into them
+            shingle_size: Number of consecutive tokens per shingle
+            seed: Seed for the permutation parameters
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    def signature(self, tokens: Sequence[str]) -> Tuple[int, ...]:
+        """
+        Compute the MinHash signature of a token stream.
+
+        Args:
+            tokens: The document's tokens
+
+        Returns:
+            The signature tuple
+        """
+        size = self.shingle_size
+        if len(tokens) <= size:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+        return tuple(
+            min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, tokens: Sequence[str]):
+        """
+        Add or replace a document.
+
+        Args:
+            key: Identifier returned by queries
+            tokens: The document's tokens
+        """
+        signature = self.signature(tokens)
+        with self._lock:
+            self._discard(key)
+            self._signatures[key] = signature
+            for band, value in self._bands(signature):
+                self._buckets[band].setdefault(value, set()).add(key)
+
+    def _discard(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, value in self._bands(signature):
+            bucket = self._buckets[band].get(value)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][value]
+
+    def remove(self, key: Hashable):
+        """
+        Remove a document if present.
+
+        Args:
+            key: The document's identifier
+        """
+        with self._lock:
+            self._discard(key)
+
+    def query(self, tokens: Sequence[str], threshold: float = 0.7) -> Optional[Tuple[Hashable, float]]:
+        """
+        Find the most similar indexed document.
+
+        Args:
+            tokens: The tokens to match
+            threshold: Minimum estimated Jaccard similarity to accept
+
+        Returns:
+            (key, estimated similarity) of the best match, or None
+        """
+        signature = self.signature(tokens)
+        with self._lock:
+            candidates = set()
+            for band, value in self._bands(signature):
+                candidates.update(self._buckets[band].get(value, ()))
+            best = None
+            for key in candidates:
+                other = self._signatures[key]
+                score = sum(a == b for a, b in zip(signature, other)) / self.num_perm
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (key, score)
+            return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
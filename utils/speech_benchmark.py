@@ -0,0 +1,196 @@
+"""
+Recognition benchmark for the voice pipeline.
+
+Replays recorded utterances through ContinuousListener (no microphone or
+audio hardware needed) and reports end-of-speech-to-text latency,
+throughput and word error rate. Each audio file may have a sidecar
+transcript with the same name and a .txt extension.
+
+The benchmark runs offline by default: it uses the Vosk backend and
+refuses to start until a local model is configured, rather than letting
+Vosk download one or timing a network service.
+
+    VOSK_MODEL_PATH=models/vosk-en python -m utils.speech_benchmark fixtures/ --speed 0
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from Listen import ContinuousListener, FileAudioSource, get_backend, load_speech_recognition
+
+_WORD_RE = re.compile(r"[\w']+")
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase words with punctuation removed."""
+    return _WORD_RE.findall(text.lower())
+
+
+def word_errors(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """
+    Word-level edit distance between a reference transcript and a hypothesis.
+
+    Args:
+        reference: The expected transcript
+        hypothesis: The recognized text
+
+    Returns:
+        (substitutions + deletions + insertions, number of reference words)
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def offline_backend(name: Optional[str] = None, model_path: Optional[str] = None):
+    """
+    Create the backend to benchmark, defaulting to offline Vosk.
+
+    Args:
+        name: Backend name; defaults to $RAWWICK_SPEECH_BACKEND, then "vosk"
+        model_path: Vosk model directory; defaults to $VOSK_MODEL_PATH
+
+    Returns:
+        The RecognizerBackend
+
+    Raises:
+        ValueError: Vosk was chosen but no local model is configured
+    """
+    name = (name or os.environ.get("RAWWICK_SPEECH_BACKEND") or "vosk").lower()
+    if name != "vosk":
+        return get_backend(name)
+    model_path = model_path or os.environ.get("VOSK_MODEL_PATH")
+    if not model_path:
+        raise ValueError("no Vosk model configured: pass --model-path or set VOSK_MODEL_PATH")
+    return get_backend(name, model_path=model_path)
+
+
+def run_benchmark(path: str, backend=None, speed: float = 0.0, workers: int = 2,
+                  vad: bool = False) -> Dict:
+    """
+    Replay a file or directory of utterances and measure recognition.
+
+    Args:
+        path: An audio file or a directory of them
+        backend: Backend name or RecognizerBackend; names go through offline_backend()
+        speed: Replay speed (1.0 is real time, 0 is as fast as possible)
+        workers: Number of recognizer threads
+        vad: Run voice-activity detection before recognition
+
+    Returns:
+        A report with per-utterance rows and aggregate latency, throughput and WER
+
+    Raises:
+        ValueError: No offline model is configured for the default backend
+    """
+    if backend is None or isinstance(backend, str):
+        backend = offline_backend(backend)
+    sr = load_speech_recognition()
+    source = FileAudioSource(path, speed=speed)
+    files = source.files()
+    durations = {}
+    for name in files:
+        with sr.AudioFile(name) as audio_file:
+            durations[name] = audio_file.DURATION
+
+    rows = []
+    lock = threading.Lock()
+
+    def record(label, text, captured_at):
+        latency = time.monotonic() - captured_at
+        with lock:
+            rows.append({"file": label, "text": text, "latency": latency})
+
+    listener = ContinuousListener(recognizer_workers=workers, backend=backend, vad=vad,
+                                  audio_source=source, on_transcript=record)
+    started = time.monotonic()
+    listener.start_listening(process_commands=False)
+    listener.wait_until_done()
+    wall = time.monotonic() - started
+
+    total_errors = total_words = 0
+    for row in rows:
+        reference_path = os.path.splitext(row["file"])[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                errors, words = word_errors(f.read(), row["text"])
+            row["wer"] = errors / words if words else float(errors > 0)
+            total_errors += errors
+            total_words += words
+
+    latencies = [row["latency"] for row in rows]
+    audio_seconds = sum(durations.values())
+    return {
+        "backend": listener.backend.name,
+        "utterances": len(rows),
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall,
+        "utterances_per_second": len(rows) / wall if wall else None,
+        "realtime_factor": audio_seconds / wall if wall else None,
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_max": max(latencies) if latencies else None,
+        "wer": total_errors / total_words if total_words else None,
+        "gate": listener.gate_stats(),
+        "rows": rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark speech recognition on recorded utterances.")
+    parser.add_argument("path", help="Audio file or directory of WAV/AIFF/FLAC files")
+    parser.add_argument("--backend", help="Recognition backend (vosk, whisper, google); default vosk")
+    parser.add_argument("--model-path", help="Vosk model directory (default $VOSK_MODEL_PATH)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Replay speed: 1 for real time, 0 for as fast as possible")
+    parser.add_argument("--workers", type=int, default=2, help="Recognizer threads")
+    parser.add_argument("--vad", action="store_true", help="Enable voice-activity detection")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        backend = offline_backend(args.backend, args.model_path)
+    except ValueError as e:
+        parser.error(str(e))
+    report = run_benchmark(args.path, backend=backend, speed=args.speed,
+                           workers=args.workers, vad=args.vad)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for row in report["rows"]:
+        wer = f"{row['wer']:.2%}" if "wer" in row else "-"
+        print(f"{os.path.basename(row['file'] or '?'):<32} {row['latency'] * 1000:8.0f} ms  WER {wer:>7}  {row['text']}")
+
+    def fmt(value, scale=1.0, unit=""):
+        return "-" if value is None else f"{value * scale:.2f}{unit}"
+
+    print(f"\nBackend: {report['backend']}  Utterances: {report['utterances']}  "
+          f"Audio: {report['audio_seconds']:.1f}s  Wall: {report['wall_seconds']:.1f}s")
+    print(f"Latency p50 {fmt(report['latency_p50'], 1000, 'ms')}  p95 {fmt(report['latency_p95'], 1000, 'ms')}  "
+          f"max {fmt(report['latency_max'], 1000, 'ms')}")
+    print(f"Throughput {fmt(report['utterances_per_second'])} utt/s  "
+          f"({fmt(report['realtime_factor'])}x real time)  WER {fmt(report['wer'], 100, '%')}")
+    print(f"Gate: {report['gate']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from typing import List, Tuple
+import threading
+import time
+
+
+class StartupProfiler:
+    """
+    Records how long each component takes to import and initialize.
+
+    Components are built lazily, so a measurement is recorded whenever one is
+    first used; `main.py --profile-startup` forces all of them up front and
+    prints the report.
+    """
+    def __init__(self):
+        self.records: List[Tuple[str, str, float]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def measure(self, component: str, phase: str = "init"):
+        """
+        Time a block of startup work.
+
+        Args:
+            component: What is being loaded (e.g. "ai", "Listen")
+            phase: "import" or "init"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.records.append((component, phase, elapsed))
+
+    def report(self) -> str:
+        """
+        Format the recorded timings, slowest first.
+
+        Nested measurements (e.g. the executor building the AI client) are
+        included in their parent's time as well as listed on their own.
+
+        Returns:
+            A plain-text table
+        """
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record[2], reverse=True)
+        lines = [f"{'component':<24} {'phase':<7} {'ms':>9}"]
+        lines += [f"{component:<24} {phase:<7} {elapsed * 1000:9.1f}" for component, phase, elapsed in records]
+        lines.append(f"{'total since startup':<32} {(time.perf_counter() - self._origin) * 1000:9.1f}")
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,346 @@
+"""
+Per-stage tracing for the command pipeline.
+
+Every stage of a command (audio capture, recognition, queueing, context
+build, cache lookups, the LLM request, code extraction, each execution
+attempt and each fix) is recorded as a span carrying the command's
+task_id, so one slow command can be followed from the microphone to its
+result. Spans are appended to a JSONL trace file (when one is configured)
+and aggregated into per-stage latency histograms, exported in Prometheus
+text format with p50/p95/p99 quantiles.
+
+    RAWWICK_TRACE_FILE=trace.jsonl python main.py --metrics 127.0.0.1:9464
+    curl -s localhost:9464/metrics
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Dict, Optional, Tuple
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Prometheus-style upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_task: contextvars.ContextVar = contextvars.ContextVar("rawwick_task_id", default=None)
+
+
+def new_task_id() -> str:
+    """A short id for one command, shared by all of its spans."""
+    return uuid.uuid4().hex[:6]
+
+
+def current_task_id() -> Optional[str]:
+    """The task_id of the command being processed in this context, if any."""
+    return _current_task.get()
+
+
+@contextmanager
+def task(task_id: Optional[str]):
+    """
+    Attribute spans recorded in this context (and in tasks and threads it
+    starts through asyncio) to a command.
+
+    Args:
+        task_id: The command's task_id
+    """
+    token = _current_task.set(task_id)
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent values for quantiles."""
+
+    def __init__(self, window: int = 2048):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+    def quantiles(self) -> Dict[float, Optional[float]]:
+        values = sorted(self.recent)
+        if not values:
+            return {q: None for q in QUANTILES}
+        return {q: values[min(len(values) - 1, int(len(values) * q))] for q in QUANTILES}
+
+
+class Span:
+    """One timed stage of a command; end() records it."""
+    __slots__ = ("tracer", "name", "task_id", "start", "_started", "attrs", "ended")
+
+    def __init__(self, tracer: "Tracer", name: str, task_id: Optional[str], attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.task_id = task_id
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.attrs = attrs
+        self.ended = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def end(self, **attrs):
+        """Close the span (only the first call counts), adding any final attributes."""
+        if self.ended:
+            return
+        self.ended = True
+        self.attrs.update(attrs)
+        self.tracer.record(self.name, self.elapsed, task_id=self.task_id, start=self.start, **self.attrs)
+
+
+class Tracer:
+    """
+    Collects spans into histograms and, optionally, a JSONL trace file.
+
+    Use the module-level `tracer`; set $RAWWICK_TRACE_FILE or call
+    configure() to write spans to disk.
+    """
+    def __init__(self, trace_file: Optional[str] = None):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self.trace_file = None
+        self.configure(trace_file or os.environ.get("RAWWICK_TRACE_FILE"))
+
+    def configure(self, trace_file: Optional[str] = None):
+        """
+        Start (or stop, with None) writing spans to a JSONL file.
+
+        Args:
+            trace_file: Path the spans are appended to
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.trace_file = trace_file
+            self._file = open(trace_file, "a", encoding="utf-8") if trace_file else None
+        return self
+
+    def begin(self, name: str, task_id: Optional[str] = None, **attrs) -> Span:
+        """
+        Start a span; call end() on it when the stage finishes.
+
+        Args:
+            name: Stage name, e.g. "llm_request"
+            task_id: The command's id; defaults to current_task_id()
+            **attrs: Extra fields for the trace record
+        """
+        return Span(self, name, task_id or current_task_id(), attrs)
+
+    @contextmanager
+    def span(self, name: str, task_id: Optional[str] = None, **attrs):
+        """
+        Time a block as a span. The yielded Span's attrs can be added to.
+
+        Args:
+            name: Stage name
+            task_id: The command's id; defaults to current_task_id()
+            **attrs: Extra fields for the trace record
+        """
+        span = self.begin(name, task_id, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=type(e).__name__)
+            raise
+        else:
+            span.end()
+
+    def record(self, name: str, duration: float, task_id: Optional[str] = None,
+               start: Optional[float] = None, **attrs):
+        """
+        Record a finished span.
+
+        Args:
+            name: Stage name
+            duration: Seconds the stage took
+            task_id: The command's id; defaults to current_task_id()
+            start: Wall-clock start time; defaults to now minus duration
+            **attrs: Extra fields for the trace record
+        """
+        task_id = task_id or current_task_id()
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(duration)
+            if self._file is not None:
+                entry = {"task_id": task_id, "span": name,
+                         "start": round(start if start is not None else time.time() - duration, 6),
+                         "duration": round(duration, 6)}
+                entry.update(attrs)
+                self._file.write(json.dumps(entry, default=str) + "\n")
+                self._file.flush()
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        Add to a counter (exported as rawwick_<name>_total).
+
+        Args:
+            name: Counter name, e.g. "llm_stream_chunks"
+            value: Amount to add
+            **labels: Prometheus labels
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_usage(self, span: Span, usage: Optional[Dict]):
+        """
+        Add an LLM response's token counts to its span and the token counters.
+
+        Args:
+            span: The LLM request's span, not ended yet
+            usage: The API's usage object; nothing is recorded without one
+        """
+        for kind in ("prompt", "completion"):
+            tokens = (usage or {}).get(f"{kind}_tokens")
+            if tokens is not None:
+                span.attrs[f"{kind}_tokens"] = tokens
+                self.count("llm_tokens", tokens, kind=kind)
+
+    async def atrace_stream(self, chunks: AsyncIterable[str], span: Span,
+                            usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Pass an LLM response stream through, recording time to first byte,
+        chunk count and size on the span and ending it with the stream.
+        Token counts are taken from `usage` once the stream has filled it in.
+        """
+        count = size = 0
+        try:
+            async for chunk in chunks:
+                if not count:
+                    span.attrs["ttfb"] = round(span.elapsed, 6)
+                    self.record(f"{span.name}_ttfb", span.elapsed, task_id=span.task_id)
+                count += 1
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record_usage(span, usage)
+            span.end(chunks=count, chars=size)
+            self.count("llm_stream_chunks", count)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Per-stage count, total and quantiles.
+
+        Returns:
+            {stage: {"count", "sum", "p50", "p95", "p99"}}
+        """
+        with self._lock:
+            report = {}
+            for name, histogram in sorted(self.histograms.items()):
+                quantiles = histogram.quantiles()
+                report[name] = {"count": histogram.count, "sum": histogram.sum,
+                                **{f"p{int(q * 100)}": quantiles[q] for q in QUANTILES}}
+            return report
+
+    def prometheus(self) -> str:
+        """
+        Render all histograms and counters in Prometheus text format.
+
+        Returns:
+            The exposition text
+        """
+        lines = [
+            "# HELP rawwick_stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE rawwick_stage_duration_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP rawwick_stage_duration_quantile_seconds Recent per-stage latency quantiles.",
+            "# TYPE rawwick_stage_duration_quantile_seconds gauge",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    lines.append(f'rawwick_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'rawwick_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'rawwick_stage_duration_seconds_sum{{stage="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'rawwick_stage_duration_seconds_count{{stage="{name}"}} {histogram.count}')
+                for q, value in histogram.quantiles().items():
+                    if value is not None:
+                        quantile_lines.append(
+                            f'rawwick_stage_duration_quantile_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}'
+                        )
+            counters = sorted(self.counters.items())
+        lines += quantile_lines
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE rawwick_{name}_total counter")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"rawwick_{name}_total{{{label_text}}} {value:g}" if label_text
+                         else f"rawwick_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, address: str = "127.0.0.1:9464") -> "ThreadingHTTPServer":
+        """
+        Serve GET /metrics (Prometheus text) from a daemon thread.
+
+        Args:
+            address: "host:port" or ":port"; the host must be a loopback address
+
+        Returns:
+            The running server
+
+        Raises:
+            ValueError: The address isn't a loopback address
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from utils.addresses import host_name, is_loopback
+
+        host, _, port = address.rpartition(":")
+        host = host_name(host) or "127.0.0.1"
+        # Stage names and counters describe the commands being run
+        if not is_loopback(host):
+            raise ValueError(f"refusing to serve metrics on non-loopback address {host!r}")
+
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    body, content_type = tracer.prometheus(), "text/plain; version=0.0.4"
+                elif self.path.split("?")[0] == "/stages":
+                    body, content_type = json.dumps(tracer.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=server.serve_forever, name="rawwick-metrics", daemon=True).start()
+        return server
+
+
+tracer = Tracer()
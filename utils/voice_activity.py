@@ -0,0 +1,189 @@
+from array import array
+from typing import Callable, Iterable, Optional
+import math
+import re
+import sys
+import threading
+
+
+class VoiceActivityDetector:
+    """
+    Cheap on-device check that a captured segment actually contains speech.
+
+    The segment is split into short frames. A frame counts as speech when its
+    energy clearly exceeds the segment's own noise floor and its zero-crossing
+    rate falls in the range of voiced speech (broadband hiss, fans and clicks
+    cross zero far more often). When the optional `webrtcvad` package is
+    installed its classifier is used per frame instead. A segment passes if
+    it has enough speech frames, both in total duration and as a share of
+    the segment.
+    """
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, energy_ratio: float = 2.5,
+                 min_rms: float = 150.0, zcr_range: tuple = (0.01, 0.30),
+                 min_speech_seconds: float = 0.25, min_speech_ratio: float = 0.15,
+                 use_webrtc: bool = True, webrtc_mode: int = 2):
+        """
+        Initialize the detector.
+
+        Args:
+            sample_rate: Rate audio is converted to before analysis
+            frame_ms: Frame length in milliseconds (10, 20 or 30 for webrtcvad)
+            energy_ratio: Frame RMS must exceed the noise floor by this factor
+            min_rms: Absolute RMS floor for a speech frame (16-bit samples)
+            zcr_range: Zero-crossing rate (per sample) accepted as voiced speech
+            min_speech_seconds: Minimum total speech in a passing segment
+            min_speech_ratio: Minimum share of speech frames in a passing segment
+            use_webrtc: Use webrtcvad when it is installed
+            webrtc_mode: webrtcvad aggressiveness, 0 (lenient) to 3 (strict)
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.energy_ratio = energy_ratio
+        self.min_rms = min_rms
+        self.zcr_range = zcr_range
+        self.min_speech_frames = max(1, int(min_speech_seconds * 1000 / frame_ms))
+        self.min_speech_ratio = min_speech_ratio
+        self._webrtc = None
+        if use_webrtc:
+            try:
+                import webrtcvad
+                self._webrtc = webrtcvad.Vad(webrtc_mode)
+            except ImportError:
+                pass
+
+    def _samples(self, audio) -> array:
+        samples = array("h")
+        samples.frombytes(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        if sys.byteorder == "big":
+            samples.byteswap()
+        return samples
+
+    def _frame_features(self, frame: array):
+        energy = 0
+        crossings = 0
+        previous = frame[0]
+        for sample in frame:
+            energy += sample * sample
+            if (sample >= 0) != (previous >= 0):
+                crossings += 1
+            previous = sample
+        return math.sqrt(energy / len(frame)), crossings / len(frame)
+
+    def speech_frames(self, audio) -> tuple:
+        """
+        Classify each frame of a segment.
+
+        Args:
+            audio: A speech_recognition AudioData segment
+
+        Returns:
+            (speech frame count, total frame count)
+        """
+        samples = self._samples(audio)
+        size = self.frame_samples
+        frames = [samples[i:i + size] for i in range(0, len(samples) - size + 1, size)]
+        if not frames:
+            return 0, 0
+
+        if self._webrtc is not None:
+            speech = sum(1 for frame in frames if self._webrtc.is_speech(frame.tobytes(), self.sample_rate))
+            return speech, len(frames)
+
+        features = [self._frame_features(frame) for frame in frames]
+        # The quietest fifth of the segment (leading silence and the trailing
+        # pause that ended the phrase) estimates the background level.
+        levels = sorted(rms for rms, _ in features)
+        noise_floor = levels[len(levels) // 5]
+        threshold = max(self.min_rms, noise_floor * self.energy_ratio)
+        low, high = self.zcr_range
+        speech = sum(1 for rms, zcr in features if rms >= threshold and low <= zcr <= high)
+        return speech, len(frames)
+
+    def is_speech(self, audio) -> bool:
+        """
+        Decide whether a segment is worth sending to the recognizer.
+
+        Args:
+            audio: A speech_recognition AudioData segment
+
+        Returns:
+            True if the segment contains enough speech
+        """
+        speech, total = self.speech_frames(audio)
+        return total > 0 and speech >= self.min_speech_frames and speech / total >= self.min_speech_ratio
+
+
+class WakeWordGate:
+    """
+    Only lets commands through after a wake word has been heard.
+
+    Saying a wake word opens the gate for `window` seconds; the rest of that
+    utterance ("rawwick, open the browser") is the command. Gating works on
+    transcripts, but an optional local `spotter` can check the audio for the
+    wake word before recognition, so closed-gate chatter never reaches the
+    recognizer at all.
+    """
+    def __init__(self, wake_words: Iterable[str], window: float = 8.0,
+                 spotter: Optional[Callable[[object], bool]] = None):
+        """
+        Initialize the gate.
+
+        Args:
+            wake_words: Phrases that open the gate (case-insensitive)
+            window: Seconds the gate stays open after a wake word
+            spotter: Optional callable taking an AudioData segment and
+                     returning True if it contains a wake word
+        """
+        self.wake_words = [w.lower() for w in wake_words]
+        self.window = window
+        self.spotter = spotter
+        self._pattern = re.compile(
+            r"\b(" + "|".join(re.escape(w) for w in self.wake_words) + r")\b[\s,.!?]*"
+        )
+        self._open_until = float("-inf")
+        self._lock = threading.Lock()
+
+    def open(self, at: float):
+        """Open the gate for `window` seconds from time `at`."""
+        with self._lock:
+            self._open_until = max(self._open_until, at + self.window)
+
+    def is_open(self, at: float) -> bool:
+        with self._lock:
+            return at <= self._open_until
+
+    def admit_audio(self, audio, captured_at: float) -> bool:
+        """
+        Pre-recognition check.
+
+        Args:
+            audio: The captured segment
+            captured_at: time.monotonic() when it was captured
+
+        Returns:
+            False only if the gate is closed and the spotter didn't hear a wake word
+        """
+        if self.spotter is None or self.is_open(captured_at):
+            return True
+        if self.spotter(audio):
+            self.open(captured_at)
+            return True
+        return False
+
+    def filter(self, text: str, captured_at: float) -> Optional[str]:
+        """
+        Post-recognition check.
+
+        Args:
+            text: The recognized (lowercase) transcript
+            captured_at: time.monotonic() when the segment was captured
+
+        Returns:
+            The command with the wake word removed ("" if the wake word was
+            said on its own), or None if the gate is closed
+        """
+        match = self._pattern.search(text)
+        if match:
+            self.open(captured_at)
+            return text[match.end():].strip()
+        return text if self.is_open(captured_at) else None